@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,10 +8,137 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
 
+    # Lokale JWT-Prüfung: HS256-Secret (Legacy) oder JWKS (Default: <SUPABASE_URL>/auth/v1/.well-known/jwks.json)
+    SUPABASE_JWT_SECRET: Optional[str] = None
+    SUPABASE_JWKS_URL: Optional[str] = None
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    AUTH_JWT_ALGORITHMS: list = ["HS256", "RS256", "ES256"]
+    AUTH_JWT_LEEWAY_SECS: int = 30
+    AUTH_JWKS_CACHE_SECS: int = 600
+    AUTH_PROFILE_CACHE_MAX_ENTRIES: int = 1024
+    AUTH_PROFILE_CACHE_TTL_SECS: int = 30
+    # HMAC-Secret für Paging-Cursor (Default: aus SUPABASE_KEY abgeleitet)
+    CURSOR_SECRET: Optional[str] = None
+
     # Optionale Konfigurationen
     PROJECT_NAME: str = "Ad Spy API"
     API_V1_STR: str = "/api/v1"
 
+    # Such-Cache: L1 = In-Memory pro Worker, L2 = Supabase (search_cache/ad_results)
+    L1_CACHE_MAX_ENTRIES: int = 256
+    L1_CACHE_TTL_SECS: int = 900
+    # Stale-While-Revalidate pro Plattform: bis FRESH gilt der Cache als frisch,
+    # danach wird er noch STALE Stunden sofort ausgeliefert und im Hintergrund erneuert.
+    CACHE_FRESH_HOURS: dict = {"meta": 24, "tiktok": 24, "default": 24}
+    CACHE_STALE_HOURS: dict = {"meta": 48, "tiktok": 24, "default": 0}
+    CACHE_REFRESH_COOLDOWN_SECS: int = 300
+    CACHE_KEY_STATE_MAX_ENTRIES: int = 4096  # Merker pro Key (Refresh-Cooldown, Delta-Zähler), LRU-begrenzt
+
+    # Single-Flight: "local" (nur dieser Prozess) oder "supabase" (Lease-Zeile, über alle Worker)
+    SCRAPE_LOCK_BACKEND: str = "local"
+    SCRAPE_LEASE_TTL_SECS: int = 300
+    SCRAPE_LEASE_POLL_SECS: float = 3.0
+
+    # Such-Jobs (POST /search/jobs + SSE)
+    SEARCH_JOBS_MAX_CONCURRENT: int = 4
+    SEARCH_JOBS_MAX_JOBS: int = 500
+    SEARCH_JOBS_TTL_SECS: int = 1800
+    SEARCH_JOBS_SSE_PING_SECS: float = 15.0
+
+    # Dataset-Streaming: Seitengröße und Poll-Intervall, während der Actor noch läuft
+    APIFY_DATASET_PAGE_SIZE: int = 50
+    APIFY_DATASET_POLL_SECS: float = 3.0
+
+    # Micro-Batching: verschiedene Meta-Suchen (gleiches Land) teilen sich einen Actor-Run.
+    # Kostet bis zu WINDOW_MS zusätzliche Latenz, spart zu Spitzenzeiten Actor-Starts.
+    APIFY_BATCH_ENABLED: bool = False
+    APIFY_BATCH_WINDOW_MS: int = 250
+    APIFY_BATCH_MAX_URLS: int = 10
+
+    # Adaptive Pool-Größe (Meta): count/maxItems aus Limit x Headroom / Ausbeute (gültige Ads pro Roh-Item),
+    # Run wird abgebrochen, sobald genug Ads da sind
+    ADAPTIVE_POOL_ENABLED: bool = True
+    ADAPTIVE_POOL_HEADROOM: float = 2.0       # Ads im Pool pro angefragter Ad (Folgeseiten, Scoring-Buckets)
+    ADAPTIVE_POOL_MIN_ADS: int = 40
+    ADAPTIVE_POOL_MAX: int = 200
+    ADAPTIVE_POOL_INITIAL_YIELD: float = 0.9
+
+    # Delta-Refresh (Meta): Refreshs scrapen nur Ads ab dem neuesten Starttag im Cache und mischen sie ein.
+    # Jeder (MAX_CONSECUTIVE+1)-te Refresh ist wieder ein voller Scrape (beendete Ads fallen raus).
+    DELTA_REFRESH_ENABLED: bool = True
+    DELTA_MAX_CONSECUTIVE: int = 3
+    DELTA_MAX_POOL_SIZE: int = 200
+
+    # Geteilter Apify Async-Client (Connection-Pool + Retry/Backoff)
+    APIFY_MAX_CONNECTIONS: int = 20
+    APIFY_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    APIFY_KEEPALIVE_EXPIRY_SECS: float = 30.0
+    APIFY_MAX_RETRIES: int = 4
+    APIFY_RETRY_MIN_DELAY_MS: int = 500
+    # Muss deutlich über Apifys 60-s-Long-Poll (waitForFinish in actor().call()) liegen, sonst bricht jeder TikTok-Run ab
+    APIFY_TIMEOUT_SECS: int = 360  # = Default des apify-client
+
+    # Geteilter Supabase-Client (HTTP/2 Keep-Alive Pool)
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    SUPABASE_TIMEOUT_SECS: float = 30.0
+
+    # Fan-Out: Plattformen x Länder parallel, begrenzt über alle Requests eines Workers
+    FANOUT_MAX_CONCURRENT_SCRAPES: int = 8
+    FANOUT_MAX_COUNTRIES: int = 5
+
+    # Admission-Control: Token-Buckets pro User und pro Plan (Zweige einer Suche pro Minute), sonst 429 + Retry-After.
+    # Pläne ohne eigenen Eintrag nutzen "paid" bzw. "free". Burst >= FANOUT_MAX_COUNTRIES + 1 (Meta-Länder + TikTok).
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_USER_RATE_PER_MIN: Dict[str, float] = {"free": 6, "paid": 30}
+    ADMISSION_USER_BURST: Dict[str, float] = {"free": 6, "paid": 20}
+    ADMISSION_PLAN_RATE_PER_MIN: Dict[str, float] = {"free": 120, "paid": 600}
+    ADMISSION_PLAN_BURST: Dict[str, float] = {"free": 40, "paid": 150}
+    ADMISSION_MAX_TRACKED_USERS: int = 10000
+    # Prioritäts-Queue vor den Actor-Runs (Slots = FANOUT_MAX_CONCURRENT_SCRAPES): paid > free > Refresh
+    ADMISSION_QUEUE_MAX: int = 50
+    ADMISSION_QUEUE_TIMEOUT_SECS: float = 60.0
+    ADMISSION_INITIAL_SCRAPE_SECS: float = 30.0   # Startwert der Scrape-Dauer für Retry-After
+
+    # Credits: Kosten pro angefragter Ad (wie im Frontend: limit = Credits), Ledger gebündelt
+    SEARCH_CREDIT_COST_PER_AD: int = 1
+    CREDIT_LEDGER_BATCH_SIZE: int = 100
+    CREDIT_LEDGER_FLUSH_SECS: float = 5.0
+    CREDIT_LEDGER_MAX_BUFFER: int = 10000
+
+    # Prefetch-Scheduler: beliebte Suchen vor Ablauf neu scrapen (kostet Apify-Runs!)
+    PREFETCH_ENABLED: bool = False
+    PREFETCH_INTERVAL_SECS: int = 300
+    PREFETCH_TOP_N: int = 20
+    PREFETCH_MIN_DEMAND: float = 2.0
+    PREFETCH_LOOKBACK_HOURS: int = 24
+    PREFETCH_LEAD_SECS: int = 3600            # so lange vor Ende des Fresh-Fensters erneuern
+    PREFETCH_MAX_RUNS_PER_HOUR: int = 30      # Apify-Budget (Actor-Runs pro Stunde und Worker)
+    PREFETCH_CONCURRENCY: int = 2
+    PREFETCH_BACKOFF_BASE_SECS: int = 300
+    PREFETCH_BACKOFF_MAX_SECS: int = 21600
+    PREFETCH_DEMAND_MAX_KEYS: int = 2000
+    PREFETCH_DEMAND_HALF_LIFE_SECS: int = 21600
+
+    # Observability: Server-Timing-Header mit den Stufen des Requests (GET /metrics ist immer aktiv)
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Kompaktes Cache-Format (search_cache.payload): "auto" = zstd falls installiert, sonst zlib; "off" = nur ad_results
+    CACHE_PAYLOAD_CODEC: str = "auto"
+    CACHE_PAYLOAD_LEVEL: int = 6
+
+    # Lokaler Such-Index über gecachte Ads (In-Prozess für den Hot-Set, sonst Postgres-Volltext)
+    AD_INDEX_MAX_DOCS: int = 10000
+    AD_INDEX_DB_FALLBACK: bool = True
+
+    # Antwort-Kompression (nur wenn der Client Accept-Encoding: gzip schickt; SSE bleibt unkomprimiert)
+    RESPONSE_GZIP_ENABLED: bool = False
+    RESPONSE_GZIP_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 1             # ~2.5x schneller als 5, nur ~15% größer (bench_serialization)
+
+    # Bulk-Writer für ad_results
+    DB_UPSERT_BATCH_SIZE: int = 200
+
     class Config:
         # Der Pfad zur .env Datei (liegt im backend/ Ordner)
         env_file = ".env"
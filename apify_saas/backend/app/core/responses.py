@@ -0,0 +1,32 @@
+import json
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: ohne orjson kompaktes stdlib-json
+    orjson = None
+
+# Schneller JSON-Pfad für große Antworten (100+ Ads, gespeicherte Ads im Profil).
+# Routen geben FastJSONResponse direkt zurück -> FastAPI überspringt jsonable_encoder,
+# der jedes verschachtelte Dict einzeln kopiert. Die Ads sind beim Normalisieren schon
+# in Form gebracht (normalize_meta_ad), eine zweite Validierung pro Response wäre reine Zeitverschwendung.
+
+def _default(value):
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy-Skalare
+        return value.item()
+    return str(value)
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse mit orjson (falls installiert). Inhalt muss nicht vorher durch jsonable_encoder."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
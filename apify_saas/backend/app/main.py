@@ -1,11 +1,38 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
-from app.routers import auth, user, search
+from app.routers import auth, user, search, metrics
+from app.services.apify_client_service import init_apify_client, close_apify_client
+from app.services.supabase_service import init_supabase, close_supabase
+from app.services import background_tasks
+from app.services.credits_service import credit_ledger
+from app.services.auth_service import init_auth
+from app.services.prefetch_service import prefetcher
+from app.services.metrics import request_timings, server_timing_header
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Geteilte Clients einmal pro Prozess aufbauen und sauber schließen
+    await init_apify_client()
+    await init_supabase()
+    await init_auth()
+    credit_ledger.start()
+    if settings.PREFETCH_ENABLED:
+        prefetcher.start()
+    yield
+    await prefetcher.stop()
+    await background_tasks.drain()
+    await credit_ledger.stop()
+    await close_apify_client()
+    await close_supabase()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # --- HIER IST DER FIX ---
@@ -25,10 +52,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.RESPONSE_GZIP_ENABLED:
+    # Such-Antworten mit 100+ Ads schrumpfen auf einen Bruchteil (viele gleiche Keys/URLs)
+    app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MIN_BYTES, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    # Spans des Requests als Server-Timing-Header (sichtbar in den Browser-DevTools)
+    if not settings.SERVER_TIMING_ENABLED:
+        return await call_next(request)
+    timings = []
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    timings.append(("total", time.perf_counter() - start))
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 @app.get("/")
 def root():
     return {"status": "active", "message": "Ad Spy API is running"}
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"])
 app.include_router(user.router, prefix="/api/v1/user", tags=["User"])
-app.include_router(search.router, prefix="/api/v1/search", tags=["Search"])
\ No newline at end of file
+app.include_router(search.router, prefix="/api/v1/search", tags=["Search"])
+app.include_router(metrics.router, tags=["Metrics"])
\ No newline at end of file
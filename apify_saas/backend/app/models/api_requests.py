@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 class SearchQuery(BaseModel):
     # --- PFLICHTFELDER ---
@@ -27,4 +27,22 @@ class SearchQuery(BaseModel):
     # 'relevancy' = Standard Meta
     # 'likes' = Viralität TikTok
     # 'newest' = Frische Ads
-    sort_by: Literal['relevancy', 'likes', 'newest'] = Field("relevancy", example="likes")
\ No newline at end of file
+    sort_by: Literal['relevancy', 'likes', 'newest'] = Field("relevancy", example="likes")
+
+# --- HIER IST DER FIX FÜR DEN 422 FEHLER ---
+class SearchRequest(BaseModel):
+    keyword: str  # Umbenannt von 'query' zu 'keyword', damit es zum Frontend passt!
+    platform: str
+    limit: int = Field(20, ge=1, le=100)  # = Credits pro Zweig, daher nie <= 0
+    country: str = "US" # Default, mehrere Länder kommagetrennt ("US,DE")
+    countries: Optional[List[str]] = None  # Alternative zu country: Fan-Out über mehrere Märkte
+    active_status: str = "active"
+    start_date_min: Optional[str] = None
+    start_date_max: Optional[str] = None
+
+    # Paging über den gecachten Pool (Folgeseiten: GET /search/page?cursor=...)
+    page_size: Optional[int] = Field(None, ge=1, le=200)  # Default: limit
+    sort_by: str = "efficiency_score"  # efficiency_score | viral_factor | newest (Aliase: relevancy, likes)
+    cohort: Optional[str] = None       # LAUNCH | TRENDING | ESTABLISHED | EVERGREEN
+    cluster: Optional[str] = None      # A | B | C
+    platform_filter: Optional[str] = None  # meta | tiktok (nur bei platform=both sinnvoll)
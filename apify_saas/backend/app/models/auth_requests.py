@@ -2,4 +2,7 @@ from pydantic import BaseModel
 
 class UserAuth(BaseModel):
     email: str
-    password: str
\ No newline at end of file
+    password: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from app.services.supabase_service import get_supabase
-from app.models.auth_requests import UserAuth
+from fastapi import APIRouter, HTTPException, Depends
+from supabase import Client
+from app.services.supabase_service import supabase_auth_client
+from app.models.auth_requests import UserAuth, RefreshRequest
 
 router = APIRouter()
 
 # 1. Registrierung
 @router.post("/register")
-def register_user(user: UserAuth):
-    supabase = get_supabase()
+def register_user(user: UserAuth, supabase: Client = Depends(supabase_auth_client)):
     try:
         # Wir erstellen den User in Supabase Auth
         response = supabase.auth.sign_up({
@@ -28,8 +28,7 @@ def register_user(user: UserAuth):
 
 # 2. Login
 @router.post("/login")
-def login_user(user: UserAuth):
-    supabase = get_supabase()
+def login_user(user: UserAuth, supabase: Client = Depends(supabase_auth_client)):
     try:
         # Wir loggen den User ein und holen das Access Token
         response = supabase.auth.sign_in_with_password({
@@ -42,6 +41,8 @@ def login_user(user: UserAuth):
              
         return {
             "access_token": response.session.access_token,
+            "refresh_token": response.session.refresh_token,
+            "expires_in": response.session.expires_in,
             "token_type": "bearer",
             "user": {
                 "id": response.user.id,
@@ -49,4 +50,22 @@ def login_user(user: UserAuth):
             }
         }
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 3. Token erneuern (Access Tokens laufen nach ~1h ab)
+@router.post("/refresh")
+def refresh_token(body: RefreshRequest, supabase: Client = Depends(supabase_auth_client)):
+    try:
+        response = supabase.auth.refresh_session(body.refresh_token)
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    if not response.session:
+        raise HTTPException(status_code=401, detail="Refresh failed")
+
+    return {
+        "access_token": response.session.access_token,
+        "refresh_token": response.session.refresh_token,
+        "expires_in": response.session.expires_in,
+        "token_type": "bearer"
+    }
@@ -1,61 +1,227 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, HTTPException, Header, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional, List, Dict, Any
 # Korrekter Import (das war der ursprüngliche Fix für den Crash)
-from app.services import apify_meta, apify_tiktok
+from app.models.api_requests import SearchRequest
+from app.services.search_service import run_search_pools, search_cost, search_usage, paid_ads, search_branches, request_countries
+from app.services.pagination import build_page, load_page, normalize_sort, normalize_filters
+from app.services.credits_service import credit_hold, reserve_credits, InsufficientCredits
+from app.services.search_jobs import search_jobs
+from app.services.auth_service import AuthUser, get_current_user, get_profile
+from app.services.admission import AdmissionRejected, rate_limiter, plan_priority, scrape_priority
+from app.services.ad_index import search_local
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
-# --- HIER IST DER FIX FÜR DEN 422 FEHLER ---
-class SearchRequest(BaseModel):
-    keyword: str  # Umbenannt von 'query' zu 'keyword', damit es zum Frontend passt!
-    platform: str
-    limit: int = 20
-    country: str = "US" # Default
+def _too_many(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-@router.post("/")
+async def _admit(user: AuthUser, request: SearchRequest) -> str:
+    """Rate-Limit pro User und Plan (429 mit Retry-After). Gibt den Plan zurück."""
+    loop = asyncio.get_event_loop()
+    try:
+        profile = await loop.run_in_executor(None, lambda: get_profile(user.id))
+    except Exception as e:
+        print(f"⚠️ Profil für Admission nicht lesbar, behandle als Free: {e}")
+        profile = {}
+    plan = profile.get("plan") or "free"
+    try:
+        rate_limiter.admit(user.id, plan, cost=search_branches(request))
+    except AdmissionRejected as e:
+        print(f"🚦 429 für {user.id} ({plan}): {e}")
+        raise _too_many(e)
+    return plan
+
+def _validate(request: SearchRequest):
+    """Sortierung, Filter und Länder prüfen (422), bevor Rate-Limit und Credits greifen."""
+    try:
+        return (normalize_sort(request.sort_by),
+                normalize_filters(request.cohort, request.cluster, request.platform_filter),
+                request_countries(request))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.post("/", response_class=FastJSONResponse)
 async def search_ads(
     request: SearchRequest,
-    user_id: str = Query(..., description="User ID")
+    user: AuthUser = Depends(get_current_user)
 ):
     # Logge, was wirklich ankommt (zur Sicherheit)
     print(f"API ROUTER: Received search for '{request.keyword}' in country '{request.country}'")
 
-    results = []
-
-    try:
-        # Meta Search
-        if request.platform == "meta" or request.platform == "both":
-            # Wir rufen den Service auf
-            meta_results = await apify_meta.search_meta_ads(
-                query=request.keyword, # Hier nutzen wir jetzt .keyword
-                country=request.country, 
-                limit=request.limit
-            )
-            # Tagging für Frontend
-            for ad in meta_results:
-                if not ad.get('platform'): ad['publisher_platform'] = ['facebook', 'instagram']
-            
-            results.extend(meta_results)
-
-        # TikTok Search
-        if request.platform == "tiktok" or request.platform == "both":
-            tiktok_results = await apify_tiktok.search_tiktok_ads(
-                query=request.keyword, # Hier nutzen wir jetzt .keyword
-                limit=request.limit
-            )
-            results.extend(tiktok_results)
-        
-        return {
+    sort_by, filters, countries = _validate(request)
+    plan = await _admit(user, request)
+    # Gilt für alle Scrapes dieses Requests (bezahlte Pläne zuerst)
+    scrape_priority.set(plan_priority(plan))
+
+    try:
+        # Credits atomar reservieren; schlägt die Suche fehl, wird zurückgebucht
+        async with credit_hold(user.id, search_cost(request)) as hold:
+            pools, freshness, keys = await run_search_pools(request)
+            # Nur abrechnen, was geliefert wurde; ohne eine einzige Ad geht alles zurück
+            credits_used = search_usage(request, pools)
+            if credits_used: await hold.settle(used=credits_used)
+            else: await hold.release()
+
+        # Erste Seite; der komplette bewertete Pool bleibt im Cache für die Folgeseiten
+        page = build_page(pools, {
+            "user": user.id,
+            "keys": keys,
+            "query": request.keyword,
+            "sort": sort_by,
+            "filters": filters,
+            "offset": 0,
+            "page_size": min(request.page_size or request.limit, request.limit),
+            # Bezahlt sind die gelieferten Ads (höchstens `limit` pro Zweig), mehr liefern auch Folgeseiten nicht
+            "max_items": paid_ads(request, pools),
+        })
+        return FastJSONResponse({
             "status": "success", 
-            "data": results,
+            "data": page["items"],
             "meta": {
-                "count": len(results),
+                "count": len(page["items"]),
+                "total": page["total"],
+                "next_cursor": page["next_cursor"],
+                "sort_by": sort_by,
                 "query": request.keyword,
-                "country": request.country
+                "country": request.country,
+                "countries": countries,
+                "credits_used": credits_used,
+                # 'fresh' | 'stale' (Refresh läuft im Hintergrund) | 'live' pro Zweig (z.B. 'meta:US')
+                "freshness": freshness
             }
-        }
+        })
 
+    except InsufficientCredits as e:
+        # Ohne Credits keine Suche: die Rate-Limit-Tokens nicht verfallen lassen
+        rate_limiter.refund(user.id, plan, cost=search_branches(request))
+        raise HTTPException(status_code=402, detail=str(e))
+    except AdmissionRejected as e:
+        # Scrape-Queue voll oder zu lange gewartet (Credits sind schon zurückgebucht)
+        raise _too_many(e)
     except Exception as e:
         print(f"Router Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/page", response_class=FastJSONResponse)
+async def search_page(
+    cursor: str = Query(..., description="next_cursor aus der vorherigen Antwort"),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Folgeseite einer Suche, direkt aus dem Cache (kostet keine Credits)."""
+    try:
+        page = await load_page(cursor, user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+    state = page["state"]
+    return FastJSONResponse({
+        "status": "success",
+        "data": page["items"],
+        "meta": {
+            "count": len(page["items"]),
+            "total": page["total"],
+            "next_cursor": page["next_cursor"],
+            "sort_by": state["sort"],
+            "query": state.get("query"),
+            "offset": state["offset"]
+        }
+    })
+
+@router.get("/index", response_class=FastJSONResponse)
+async def search_index(
+    q: str = Query(..., min_length=1, description="Suchbegriffe (Text, Page-Name, Kategorien, CTA, Handles)"),
+    platform: Optional[str] = None,
+    country: Optional[str] = None,
+    cohort: Optional[str] = None,
+    cluster: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    user: AuthUser = Depends(get_current_user)
+):
+    """
+    Suche über bereits gescrapte Ads (kein Scrape, keine Credits) inkl. Facetten.
+    `scrape_recommended`: zu wenige Treffer, eine Live-Suche über POST / lohnt sich.
+    """
+    try:
+        filters = normalize_filters(cohort, cluster, platform)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if country: filters["country"] = country.strip().upper()
+
+    result = await search_local(q, filters, limit=limit, offset=offset)
+    return FastJSONResponse({
+        "status": "success",
+        "data": result["items"],
+        "meta": {
+            "count": len(result["items"]),
+            "total": result["total"],
+            "offset": offset,
+            "query": q,
+            "source": result["source"],
+            "facets": result["facets"],
+            "scrape_recommended": result["total"] < limit
+        }
+    })
+
+# --- ASYNCHRONE JOBS (kein minutenlang offener Request mehr) ---
+
+def _get_user_job(job_id: str, user_id: str):
+    job = search_jobs.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs", status_code=202)
+async def create_search_job(
+    request: SearchRequest,
+    user: AuthUser = Depends(get_current_user)
+):
+    print(f"API ROUTER: New search job for '{request.keyword}' in country '{request.country}'")
+    _validate(request)
+    plan = await _admit(user, request)
+    try:
+        hold = await reserve_credits(user.id, search_cost(request))
+    except (InsufficientCredits, ValueError) as e:
+        rate_limiter.refund(user.id, plan, cost=search_branches(request))
+        raise HTTPException(status_code=402 if isinstance(e, InsufficientCredits) else 422, detail=str(e))
+    try:
+        job = search_jobs.submit(user.id, request, hold=hold, priority=plan_priority(plan))
+    except RuntimeError as e:
+        await hold.release()
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/v1/search/jobs/{job.id}",
+        "events_url": f"/api/v1/search/jobs/{job.id}/events"
+    }
+
+@router.get("/jobs/{job_id}", response_class=FastJSONResponse)
+async def get_search_job(
+    job_id: str,
+    user: AuthUser = Depends(get_current_user)
+):
+    job = _get_user_job(job_id, user.id)
+    response = job.summary()
+    if job.status == "done":
+        response["data"] = job.results
+    return FastJSONResponse(response)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_search_job(
+    job_id: str,
+    user: AuthUser = Depends(get_current_user),
+    last_event_id: Optional[int] = Header(None)
+):
+    """Server-Sent Events: `status`, `ads` (sobald Daten da sind), am Ende `status` done/failed."""
+    job = _get_user_job(job_id, user.id)
+    return StreamingResponse(
+        job.stream(last_event_id if last_event_id is not None else -1),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
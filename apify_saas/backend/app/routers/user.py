@@ -1,28 +1,32 @@
-from fastapi import APIRouter, HTTPException, Body
-from app.services.supabase_service import get_user_profile_data, add_saved_ad, delete_saved_ad
+from fastapi import APIRouter, HTTPException, Body, Depends
+from supabase import Client
+from app.services.supabase_service import get_user_profile_data, add_saved_ad, delete_saved_ad, supabase_client
+from app.services.auth_service import AuthUser, get_current_user, get_profile
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
-@router.get("/me")
-def get_my_profile(user_id: str):
+@router.get("/me", response_class=FastJSONResponse)
+def get_my_profile(user: AuthUser = Depends(get_current_user), supabase: Client = Depends(supabase_client)):
     try:
-        return get_user_profile_data(user_id)
+        # profiles-Zeile kommt aus dem kurzlebigen Cache
+        return FastJSONResponse(get_user_profile_data(user.id, supabase, profile=get_profile(user.id)))
     except Exception as e:
         print(f"Profile Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/saved-ads")
-def save_ad(user_id: str = Body(...), type: str = Body(...), data: dict = Body(...)):
+def save_ad(type: str = Body(...), data: dict = Body(...), user: AuthUser = Depends(get_current_user), supabase: Client = Depends(supabase_client)):
     try:
-        add_saved_ad(user_id, data, type)
+        add_saved_ad(user.id, data, type, supabase)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/saved-ads/{ad_id}")
-def remove_ad(ad_id: str, user_id: str):
+def remove_ad(ad_id: str, user: AuthUser = Depends(get_current_user), supabase: Client = Depends(supabase_client)):
     try:
-        delete_saved_ad(user_id, ad_id)
+        delete_saved_ad(user.id, ad_id, supabase)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
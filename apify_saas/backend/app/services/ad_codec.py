@@ -0,0 +1,135 @@
+import base64
+import json
+import zlib
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional: ohne zstandard wird zlib benutzt
+    zstandard = None
+
+# Kompaktes, versioniertes Format für gecachte Pools (search_cache.payload):
+#   "adspy<version>:<codec>:<base64>"
+# Inhalt (JSON): {"pages": [...], "texts": [...], "ads": [...]}
+# - pages: Page-/Advertiser-Felder, die sich über viele Ads wiederholen (ein Eintrag pro Advertiser)
+# - texts: Ad-Texte (Varianten derselben Kampagne haben oft denselben Text)
+# - ads: nur die Felder, die das Frontend braucht; Medien ohne Watermark-Duplikate (SD nur ohne HD)
+
+FORMAT_VERSION = 1
+PREFIX = "adspy"
+
+# Pro Advertiser gleich -> einmal pro Pool speichern
+SHARED_FIELDS = ("page_name", "page_profile_uri", "advertiser_info", "page_categories", "beneficiary_payer", "authorMeta", "musicMeta")
+
+# Medien: nur die URLs, die angezeigt werden (Meta liefert jede Variante mehrfach)
+MEDIA_FIELDS = {
+    "images": ("resized_image_url", "original_image_url"),
+    "videos": ("video_hd_url", "video_sd_url", "video_preview_image_url"),
+    "cards": ("title", "body", "link_url", "cta_text", "original_image_url", "resized_image_url",
+              "video_hd_url", "video_sd_url", "video_preview_image_url"),
+}
+# Varianten, die nur gebraucht werden, wenn die bevorzugte URL fehlt (das Frontend fällt von HD auf SD zurück)
+FALLBACK_FIELDS = {"video_sd_url": "video_hd_url"}
+
+def _project_media(items: list, fields: tuple) -> list:
+    projected = []
+    for item in items or []:
+        if isinstance(item, dict):
+            projected.append({k: item[k] for k in fields
+                              if item.get(k) is not None and not item.get(FALLBACK_FIELDS.get(k, ""))})
+        else:
+            projected.append(item)
+    return projected
+
+def project_ad(ad: dict) -> dict:
+    """Kopie ohne ungenutzte Medien-Varianten (das Original bleibt unverändert)."""
+    snapshot = ad.get("snapshot")
+    if not isinstance(snapshot, dict):
+        return ad
+    snapshot = dict(snapshot)
+    for name, fields in MEDIA_FIELDS.items():
+        if name in snapshot:
+            snapshot[name] = _project_media(snapshot[name], fields)
+    return {**ad, "snapshot": snapshot}
+
+# --- CODECS ---
+
+def _codec() -> str:
+    name = (settings.CACHE_PAYLOAD_CODEC or "auto").lower()
+    if name == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if name == "zstd" and zstandard is None:
+        print("⚠️ zstandard nicht installiert, Cache-Payload wird mit zlib komprimiert.")
+        return "zlib"
+    return name
+
+def _compress(codec: str, raw: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=settings.CACHE_PAYLOAD_LEVEL).compress(raw)
+    if codec == "zlib":
+        return zlib.compress(raw, min(settings.CACHE_PAYLOAD_LEVEL, 9))
+    raise ValueError(f"Unknown payload codec '{codec}'")
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None: raise ValueError("Payload is zstd-compressed, but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown payload codec '{codec}'")
+
+def payload_enabled() -> bool:
+    return (settings.CACHE_PAYLOAD_CODEC or "auto").lower() != "off"
+
+# --- ENCODE / DECODE ---
+
+def encode_pool(ads: list) -> str:
+    pages, page_ids = [], {}
+    texts, text_ids = [], {}
+    rows = []
+    for ad in ads:
+        ad = project_ad(ad)
+        shared = {k: ad[k] for k in SHARED_FIELDS if k in ad}
+        page_key = json.dumps(shared, sort_keys=True, separators=(",", ":"), default=str)
+        if page_key not in page_ids:
+            page_ids[page_key] = len(pages)
+            pages.append(shared)
+        row = {k: v for k, v in ad.items() if k not in SHARED_FIELDS}
+        row["_p"] = page_ids[page_key]
+
+        snapshot = row.get("snapshot")
+        body = snapshot.get("body") if isinstance(snapshot, dict) else None
+        if isinstance(body, dict) and set(body) == {"text"} and isinstance(body["text"], str):
+            text = body["text"]
+            if text not in text_ids:
+                text_ids[text] = len(texts)
+                texts.append(text)
+            row["snapshot"] = {**snapshot, "body": text_ids[text]}
+        rows.append(row)
+
+    raw = json.dumps({"pages": pages, "texts": texts, "ads": rows}, separators=(",", ":"), default=str).encode("utf-8")
+    codec = _codec()
+    return f"{PREFIX}{FORMAT_VERSION}:{codec}:{base64.b64encode(_compress(codec, raw)).decode('ascii')}"
+
+def decode_pool(payload: str) -> list:
+    """
+    Gegenstück zu encode_pool. Geteilte Page-Felder werden nicht kopiert, sondern referenziert.
+    ValueError bei unbekannter Version/Codec (Aufrufer fällt dann auf ad_results zurück).
+    """
+    try:
+        header, codec, data = payload.split(":", 2)
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid cache payload")
+    if header != f"{PREFIX}{FORMAT_VERSION}":
+        raise ValueError(f"Unsupported cache payload version '{header}'")
+    envelope = json.loads(_decompress(codec, base64.b64decode(data)))
+
+    pages, texts = envelope["pages"], envelope["texts"]
+    ads = []
+    for row in envelope["ads"]:
+        ad = {**pages[row.pop("_p")], **row}
+        snapshot = ad.get("snapshot")
+        if isinstance(snapshot, dict) and isinstance(snapshot.get("body"), int):
+            snapshot["body"] = {"text": texts[snapshot["body"]]}
+        ads.append(ad)
+    return ads
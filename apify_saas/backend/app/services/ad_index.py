@@ -0,0 +1,159 @@
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.metrics import span
+from app.services.supabase_service import search_ads_index
+
+# Invertierter Index über die "heißen" Ads im Prozess (alles, was gerade gescrapt oder aus L2 geladen wurde).
+# Beantwortet Keyword-Suchen aus schon bezahlten Daten in Millisekunden, inkl. Facetten.
+# Für den kompletten Bestand gibt es den tsvector/GIN-Index in Postgres (migrations/003_ad_search_index.sql).
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Gewichte wie im Postgres-Index: A (Name/Handles) > B (Text) > C (Kategorien) > D (CTA)
+FIELD_WEIGHTS = {"name": 4.0, "handles": 4.0, "body": 2.0, "categories": 1.0, "cta": 0.5}
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1]
+
+def ad_fields(ad: dict) -> dict:
+    """Durchsuchbare Felder einer Meta-Ad (normalisiert) oder eines TikTok-Items (roh)."""
+    snapshot = ad.get("snapshot") or {}
+    body = snapshot.get("body") or {}
+    advertiser = ad.get("advertiser_info") or {}
+    author = ad.get("authorMeta") or {}
+    categories = ad.get("page_categories") or []
+    return {
+        "name": ad.get("page_name") or author.get("nickName") or "",
+        "handles": " ".join(filter(None, [
+            advertiser.get("facebook_handle"), advertiser.get("instagram_handle"), author.get("name")
+        ])),
+        "body": (body.get("text") if isinstance(body, dict) else "") or ad.get("text") or "",
+        "categories": " ".join(str(c) for c in categories) if isinstance(categories, list) else str(categories),
+        "cta": snapshot.get("cta_text") or "",
+    }
+
+def ad_facets(ad: dict) -> dict:
+    cluster, _, cohort = (ad.get("_bucket") or "").partition("_")
+    return {"cluster": cluster or None, "cohort": cohort or None}
+
+class AdIndex:
+    """
+    Begrenzter invertierter Index (Token -> Doc-IDs) mit Facetten cluster/cohort/country/platform.
+    Älteste Dokumente fliegen zuerst raus. Thread-safe.
+    """
+
+    def __init__(self, max_docs: int):
+        self.max_docs = max_docs
+        self._docs = OrderedDict()   # doc_id -> {"ad", "fields", "weights", "platform", "countries", "cluster", "cohort"}
+        self._postings = {}          # token -> set(doc_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, ads: list, platform: str, country: str = None):
+        with self._lock:
+            for ad in ads:
+                ad_id = ad.get("id") or ad.get("ad_archive_id")
+                if ad_id is None: continue
+                doc_id = f"{platform}:{ad_id}"
+                fields = ad_fields(ad)
+                existing = self._docs.get(doc_id)
+                countries = set(existing["countries"]) if existing else set()
+                if country: countries.add(country.upper())
+                if existing and existing["fields"] == fields:
+                    # Gleicher Text (z.B. erneuter Scrape): Postings bleiben, nur Ad/Facetten aktualisieren
+                    existing.update({"ad": ad, "countries": countries, **ad_facets(ad)})
+                    self._docs.move_to_end(doc_id)
+                    continue
+                if existing: self._remove(doc_id)
+
+                weights = {}
+                for field, text in fields.items():
+                    for token in tokenize(text):
+                        weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+                self._docs[doc_id] = {
+                    "ad": ad, "fields": fields, "weights": weights, "platform": platform,
+                    "countries": countries, **ad_facets(ad)
+                }
+                for token in weights:
+                    self._postings.setdefault(token, set()).add(doc_id)
+
+            while len(self._docs) > self.max_docs:
+                self._remove(next(iter(self._docs)))
+
+    def _remove(self, doc_id: str):
+        doc = self._docs.pop(doc_id)
+        for token in doc["weights"]:
+            postings = self._postings.get(token)
+            if postings is None: continue
+            postings.discard(doc_id)
+            if not postings: del self._postings[token]
+
+    def _facet_match(self, doc: dict, filters: dict) -> bool:
+        if filters.get("cluster") and doc["cluster"] != filters["cluster"]: return False
+        if filters.get("cohort") and doc["cohort"] != filters["cohort"]: return False
+        if filters.get("platform") and doc["platform"] != filters["platform"]: return False
+        if filters.get("country") and filters["country"] not in doc["countries"]: return False
+        return True
+
+    def search(self, query: str, filters: dict = None, limit: int = 20, offset: int = 0) -> dict:
+        """
+        Alle Query-Tokens müssen vorkommen (AND). Ranking: Feldgewichte, dann efficiency_score.
+        Facetten zählen alle Treffer der Query (nur Plattform-Filter), wie search_ads_facets in Postgres.
+        """
+        filters = filters or {}
+        tokens = tokenize(query)
+        if not tokens:
+            return {"items": [], "total": 0, "facets": {}}
+
+        with self._lock:
+            postings = [self._postings.get(token, set()) for token in tokens]
+            postings.sort(key=len)
+            matched = set(postings[0]).intersection(*postings[1:]) if postings[0] else set()
+
+            hits = []
+            facets = {"cluster": {}, "cohort": {}, "country": {}, "platform": {}}
+            for doc_id in matched:
+                doc = self._docs[doc_id]
+                if filters.get("platform") and doc["platform"] != filters["platform"]: continue
+                for name in ("cluster", "cohort", "platform"):
+                    if doc[name]: facets[name][doc[name]] = facets[name].get(doc[name], 0) + 1
+                for country in doc["countries"]:
+                    facets["country"][country] = facets["country"].get(country, 0) + 1
+                if not self._facet_match(doc, filters): continue
+                score = sum(doc["weights"].get(token, 0.0) for token in tokens)
+                hits.append((score, doc["ad"].get("efficiency_score") or 0, doc_id))
+
+            hits.sort(reverse=True)
+            items = [self._docs[doc_id]["ad"] for _, _, doc_id in hits[offset:offset + limit]]
+        return {"items": items, "total": len(hits), "facets": facets}
+
+    def stats(self) -> dict:
+        return {"docs": len(self._docs), "tokens": len(self._postings), "max_docs": self.max_docs}
+
+ad_index = AdIndex(max_docs=settings.AD_INDEX_MAX_DOCS)
+
+async def search_local(query: str, filters: dict = None, limit: int = 20, offset: int = 0) -> dict:
+    """
+    Erst der Hot-Set im Prozess; reicht das nicht für die angefragte Seite, der Postgres-Volltext-Index.
+    Scrapt nie. Gibt {"items", "total", "facets", "source": "memory" | "database"} zurück.
+    """
+    with span("index_lookup"):
+        result = ad_index.search(query, filters, limit=limit, offset=offset)
+    if result["total"] >= offset + limit or not settings.AD_INDEX_DB_FALLBACK:
+        return {**result, "source": "memory"}
+
+    loop = asyncio.get_event_loop()
+    try:
+        with span("index_db"):
+            db_result = await loop.run_in_executor(None, lambda: search_ads_index(query, filters, limit, offset))
+    except Exception as e:
+        print(f"⚠️ Index DB Error (nur lokale Treffer): {e}")
+        db_result = None
+    if db_result and db_result["total"] > result["total"]:
+        return {**db_result, "source": "database"}
+    return {**result, "source": "memory"}
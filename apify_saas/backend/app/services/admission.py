@@ -0,0 +1,251 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from app.core.config import settings
+from app.services.metrics import Gauge, register, admission_rejections, scrape_queue_wait_seconds
+
+# Admission-Control vor den Scrapern:
+# 1. Token-Buckets pro User und pro Plan (Suchen pro Minute) -> sofort 429 mit Retry-After
+# 2. Eine begrenzte Prioritäts-Queue vor den Actor-Runs (FANOUT_MAX_CONCURRENT_SCRAPES Slots):
+#    bezahlte Pläne vor Free, Hintergrund-Refreshs (Stale/Prefetch) zuletzt.
+#    Ist die Queue voll, verdrängt eine wichtigere Suche die unwichtigste wartende.
+
+PRIORITY_PAID = 0
+PRIORITY_FREE = 1
+PRIORITY_REFRESH = 2
+PRIORITY_NAMES = {PRIORITY_PAID: "paid", PRIORITY_FREE: "free", PRIORITY_REFRESH: "refresh"}
+
+# Wird im Request (bzw. Job/Refresh-Task) gesetzt und von den Scrapes darunter gelesen
+scrape_priority: ContextVar = ContextVar("scrape_priority", default=PRIORITY_FREE)
+# Wem ein wartender Scrape gehört (Job-ID), für die Queue-Position im Job-Status
+scrape_owner: ContextVar = ContextVar("scrape_owner", default=None)
+
+class AdmissionRejected(Exception):
+    """Zu viele Suchen (429). `retry_after` in Sekunden als Hinweis für den Client."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+def is_paid(plan: str) -> bool:
+    return bool(plan) and plan != "free"
+
+def plan_priority(plan: str) -> int:
+    return PRIORITY_PAID if is_paid(plan) else PRIORITY_FREE
+
+def _plan_limit(table: dict, plan: str) -> float:
+    """Eigener Eintrag für den Plan, sonst 'paid' bzw. 'free'."""
+    if plan in table: return table[plan]
+    return table.get("paid" if is_paid(plan) else "free", 0)
+
+# --- TOKEN-BUCKETS ---
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, burst: float):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_secs(self, cost: float, now: float) -> float:
+        """0, wenn `cost` Tokens da sind, sonst die Zeit, bis es so weit ist."""
+        self._refill(now)
+        if self.tokens >= cost: return 0.0
+        if self.rate <= 0 or cost > self.burst: return float("inf")
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        self.tokens -= cost
+
+    def give_back(self, cost: float):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+class RateLimiter:
+    """
+    Token-Buckets pro User und pro Plan (alle User eines Plans zusammen), pro Worker-Prozess.
+    Höchstens `max_users` User-Buckets, verdrängt wird der am längsten nicht gesehene (LRU).
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, buckets: dict, key, rate_per_min: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None or bucket.rate != rate_per_min / 60 or bucket.burst != burst:
+            bucket = buckets[key] = TokenBucket(rate_per_min / 60, burst)
+        return bucket
+
+    def _user_bucket(self, user_id: str, plan: str) -> TokenBucket:
+        bucket = self._bucket(self._users, user_id, _plan_limit(settings.ADMISSION_USER_RATE_PER_MIN, plan),
+                              _plan_limit(settings.ADMISSION_USER_BURST, plan))
+        self._users.move_to_end(user_id)
+        # Der am längsten inaktive User hat seinen Bucket meist ohnehin wieder voll (ein neuer startet voll)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return bucket
+
+    def admit(self, user_id: str, plan: str, cost: int = 1):
+        """Bucht `cost` Tokens bei User und Plan ab oder wirft AdmissionRejected (nichts wird abgebucht)."""
+        if not settings.ADMISSION_ENABLED: return
+        now = time.monotonic()
+        with self._lock:
+            user = self._user_bucket(user_id, plan)
+            shared = self._bucket(self._plans, plan or "free", _plan_limit(settings.ADMISSION_PLAN_RATE_PER_MIN, plan),
+                                  _plan_limit(settings.ADMISSION_PLAN_BURST, plan))
+            user_wait = user.wait_secs(cost, now)
+            plan_wait = shared.wait_secs(cost, now)
+            if user_wait == 0.0 and plan_wait == 0.0:
+                user.take(cost)
+                shared.take(cost)
+                return
+        if user_wait >= plan_wait:
+            admission_rejections.inc(reason="user")
+            raise AdmissionRejected("Too many searches, please slow down", min(user_wait, 3600))
+        admission_rejections.inc(reason="plan")
+        raise AdmissionRejected("Too many searches on your plan right now, please retry shortly", min(plan_wait, 3600))
+
+    def refund(self, user_id: str, plan: str, cost: int = 1):
+        """Tokens zurückgeben, wenn die Suche danach doch abgelehnt wurde (z.B. 402 ohne Credits)."""
+        if not settings.ADMISSION_ENABLED: return
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None: user.give_back(cost)
+            shared = self._plans.get(plan or "free")
+            if shared is not None: shared.give_back(cost)
+
+    def stats(self) -> dict:
+        return {"users": len(self._users), "plans": {plan: round(b.tokens, 1) for plan, b in self._plans.items()}}
+
+rate_limiter = RateLimiter(max_users=settings.ADMISSION_MAX_TRACKED_USERS)
+
+# --- PRIORITÄTS-QUEUE ---
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int, owner, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.owner = owner
+        self.future = future
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class ScrapeQueue:
+    """
+    `slots` gleichzeitige Scrapes, dahinter höchstens `max_waiting` wartende (nach Priorität, dann FIFO).
+    Wartende geben nach ADMISSION_QUEUE_TIMEOUT_SECS mit 429 auf, statt den Request beliebig lange offen zu halten.
+    """
+
+    def __init__(self, slots: int, max_waiting: int):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self._active = 0
+        self._waiting = []  # Heap aus _Waiter
+        self._seq = itertools.count()
+        # Gleitende Dauer eines Scrapes (für Retry-After), Startwert grob ein Actor-Run
+        self._avg_hold_secs = settings.ADMISSION_INITIAL_SCRAPE_SECS
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "evicted": 0, "timed_out": 0}
+
+    def depth(self) -> int:
+        return sum(1 for w in self._waiting if not w.future.done())
+
+    def retry_after(self, ahead: int = None) -> float:
+        """Geschätzte Zeit, bis ein neuer Scrape an der Reihe wäre."""
+        ahead = self.depth() if ahead is None else ahead
+        return (ahead // max(self.slots, 1) + 1) * self._avg_hold_secs
+
+    def position(self, owner) -> int:
+        """1-basierte Position des ersten wartenden Scrapes von `owner` (None = wartet nicht)."""
+        if owner is None: return None
+        ranked = sorted(w for w in self._waiting if not w.future.done())
+        return next((i + 1 for i, w in enumerate(ranked) if w.owner == owner), None)
+
+    def _reject(self, reason: str, detail: str):
+        self.stats["rejected"] += 1
+        admission_rejections.inc(reason=reason)
+        raise AdmissionRejected(detail, self.retry_after())
+
+    def _evict_for(self, priority: int) -> bool:
+        """Queue voll: den unwichtigsten (bei Gleichstand jüngsten) Wartenden verdrängen, falls er unwichtiger ist."""
+        live = [w for w in self._waiting if not w.future.done()]
+        if not live: return True
+        worst = max(live)
+        if worst.priority <= priority: return False
+        worst.future.set_exception(AdmissionRejected("Search was pushed out of the scrape queue", self.retry_after()))
+        self.stats["evicted"] += 1
+        admission_rejections.inc(reason="evicted")
+        return True
+
+    async def acquire(self, priority: int, owner=None):
+        if self._active < self.slots and not self.depth():
+            self._active += 1
+            self.stats["admitted"] += 1
+            return
+        if self.depth() >= self.max_waiting and not self._evict_for(priority):
+            self._reject("queue_full", "Scrape queue is full, please retry shortly")
+
+        waiter = _Waiter(priority, next(self._seq), owner, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiting, waiter)
+        self.stats["queued"] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECS)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self.stats["timed_out"] += 1
+                self._reject("queue_timeout", "Scrapers are busy, please retry shortly")
+        except BaseException:
+            # Abgebrochen: einen schon übergebenen Slot weiterreichen
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release()
+            else:
+                waiter.future.cancel()
+            raise
+        finally:
+            scrape_queue_wait_seconds.observe(time.monotonic() - started, priority=PRIORITY_NAMES[priority])
+        waiter.future.result()  # verdrängt -> AdmissionRejected
+        self.stats["admitted"] += 1
+
+    def release(self):
+        # Slot direkt an den nächsten Wartenden übergeben (zählt weiter als aktiv)
+        while self._waiting:
+            waiter = heapq.heappop(self._waiting)
+            if not waiter.future.done():
+                waiter.future.set_result(True)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ein Scrape-Slot mit Priorität/Owner aus dem Kontext (scrape_priority, scrape_owner)."""
+        await self.acquire(scrape_priority.get(), scrape_owner.get())
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold_secs += 0.2 * (time.monotonic() - started - self._avg_hold_secs)
+            self.release()
+
+scrape_queue = ScrapeQueue(slots=settings.FANOUT_MAX_CONCURRENT_SCRAPES, max_waiting=settings.ADMISSION_QUEUE_MAX)
+
+register(Gauge("adspy_scrape_queue_depth", "Auf einen Scrape-Slot wartende Suchen/Refreshs", scrape_queue.depth))
+
+async def as_refresh(coro):
+    """Hintergrund-Arbeit (Stale-Refresh, Prefetch) mit niedrigster Priorität ausführen."""
+    scrape_priority.set(PRIORITY_REFRESH)
+    scrape_owner.set(None)
+    return await coro
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from app.core.config import settings
+from app.services.apify_client_service import get_apify_client
+from app.services.background_tasks import spawn
+from app.services.metrics import span, apify_batch_urls
+
+# Micro-Batching: verschiedene Such-URLs, die kurz nacheinander eintreffen, teilen sich EINEN Actor-Run.
+# Start, Container und Proxy-Warm-up werden so über mehrere Suchen verteilt.
+# Die Dataset-Items werden über ihre Quell-URL (`item["url"]`) an die wartenden Suchen verteilt.
+
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+async def poll_run(run_id: str, dataset_id: str, timeout_secs: float, on_finish=None):
+    """
+    Liest das Dataset WÄHREND der Run läuft (Offset-Polling) und liefert rohe Item-Seiten.
+    `on_finish(item_count)` wird am Ende aufgerufen (z.B. für Metriken).
+    """
+    client = get_apify_client()
+    page_size = settings.APIFY_DATASET_PAGE_SIZE
+    deadline = time.monotonic() + timeout_secs
+    offset = 0
+
+    while True:
+        with span("actor_wait"):
+            run_info = await client.run(run_id).get()
+        finished = not run_info or run_info.get("status") in TERMINAL_STATUSES
+
+        # Alles abholen, was seit dem letzten Poll im Dataset gelandet ist
+        while True:
+            with span("dataset_fetch"):
+                dataset_page = await client.dataset(dataset_id).list_items(
+                    offset=offset, limit=page_size, skip_hidden=True
+                )
+            items = dataset_page.items
+            if not items: break
+            offset += len(items)
+            yield items
+            if len(items) < page_size: break
+
+        if finished:
+            if on_finish: on_finish(offset)
+            return
+        if time.monotonic() > deadline:
+            print(f"⚠️ Run {run_id} antwortet nicht mehr, breche Polling ab.")
+            return
+        with span("actor_wait"):
+            await asyncio.sleep(settings.APIFY_DATASET_POLL_SECS)
+
+class _Batch:
+    def __init__(self):
+        self.subscribers = {}   # match_key -> [(url, Queue)]
+        self.full = asyncio.Event()
+        self.listening = 0      # Suchen, die noch Items haben wollen
+        self.run_id = None
+        self.finished = False
+
+class RunBatcher:
+    """
+    Sammelt Such-URLs mit gleichen Run-Parametern (`group`, z.B. Land + Pool-Größe)
+    APIFY_BATCH_WINDOW_MS lang bzw. bis APIFY_BATCH_MAX_URLS und startet dann einen Run.
+
+    build_input(urls, group) -> run_input, match_key(url) -> Vergleichsschlüssel
+    (die URL im Item muss nicht Zeichen für Zeichen der gesendeten entsprechen).
+    """
+
+    def __init__(self, actor_id: str, build_input, match_key, memory_mbytes: int, timeout_secs: int, on_finish=None, on_abandon=None):
+        self.actor_id = actor_id
+        self.build_input = build_input
+        self.match_key = match_key
+        self.memory_mbytes = memory_mbytes
+        self.timeout_secs = timeout_secs
+        self.on_finish = on_finish
+        self.on_abandon = on_abandon   # async (run_id): Run abbrechen, wenn keine Suche mehr zuhört
+        self._open = {}   # group -> _Batch, das noch URLs annimmt
+        self.stats = {"runs": 0, "urls": 0, "unmatched_items": 0}
+
+    async def stream(self, url: str, group: tuple):
+        """Rohe Item-Seiten für genau diese URL, aus einem (ggf. geteilten) Run."""
+        queue = asyncio.Queue()
+        batch = self._open.get(group)
+        if batch is None:
+            batch = self._open[group] = _Batch()
+            spawn(self._dispatch(group, batch), name=f"apify-batch:{group}")
+        batch.subscribers.setdefault(self.match_key(url), []).append((url, queue))
+        if len(batch.subscribers) >= settings.APIFY_BATCH_MAX_URLS:
+            # Voll: keine weiteren URLs, sofort starten
+            self._open.pop(group, None)
+            batch.full.set()
+
+        batch.listening += 1
+        try:
+            while True:
+                page = await queue.get()
+                if page is None: return
+                if isinstance(page, Exception): raise page
+                yield page
+        finally:
+            batch.listening -= 1
+            # Alle Suchen haben genug (oder wurden abgebrochen): geteilten Run beenden
+            if not batch.listening and batch.run_id and not batch.finished and self.on_abandon:
+                await self.on_abandon(batch.run_id)
+
+    async def _dispatch(self, group: tuple, batch: _Batch):
+        try:
+            await asyncio.wait_for(batch.full.wait(), timeout=settings.APIFY_BATCH_WINDOW_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        if self._open.get(group) is batch:
+            del self._open[group]
+
+        queues = [queue for entries in batch.subscribers.values() for _, queue in entries]
+        try:
+            await self._run(group, batch)
+        except Exception as e:
+            for queue in queues: queue.put_nowait(e)
+            return
+        for queue in queues: queue.put_nowait(None)
+
+    async def _run(self, group: tuple, batch: _Batch):
+        if not batch.listening: return  # alle Suchen schon vor dem Start abgesprungen
+        urls = [entries[0][0] for entries in batch.subscribers.values()]
+        self.stats["runs"] += 1
+        self.stats["urls"] += len(urls)
+        apify_batch_urls.observe(len(urls))
+        if len(urls) > 1:
+            print(f"📦 Apify-Batch: {len(urls)} Suchen in einem Run ({group}).")
+
+        with span("apify_start"):
+            run = await get_apify_client().actor(self.actor_id).start(
+                run_input=self.build_input(urls, group),
+                memory_mbytes=self.memory_mbytes,
+                timeout_secs=self.timeout_secs
+            )
+        if not run or not run.get("defaultDatasetId"): return
+        batch.run_id = run.get("id")
+
+        only = next(iter(batch.subscribers.values())) if len(batch.subscribers) == 1 else None
+        async for items in poll_run(run.get("id"), run["defaultDatasetId"], self.timeout_secs + 30, self.on_finish):
+            pages = {}
+            for item in items:
+                key = self.match_key(item.get("url") or "")
+                if key in batch.subscribers:
+                    pages.setdefault(key, []).append(item)
+                elif only is not None:
+                    # Nur eine Suche im Run: alles gehört ihr, auch ohne passende URL
+                    pages.setdefault(None, []).append(item)
+                else:
+                    self.stats["unmatched_items"] += 1
+            for key, page in pages.items():
+                for _, queue in (batch.subscribers[key] if key is not None else only):
+                    queue.put_nowait(page)
+        batch.finished = True
@@ -0,0 +1,50 @@
+import httpx
+from apify_client import ApifyClientAsync
+from app.core.config import settings
+
+# Ein einziger Async-Client für die ganze App-Laufzeit (statt Client pro Aufruf
+# bzw. Sync-Client im Thread-Pool). Wird im FastAPI-Lifespan angelegt.
+_client = None
+
+def create_apify_client() -> ApifyClientAsync:
+    client = ApifyClientAsync(
+        settings.APIFY_TOKEN,
+        max_retries=settings.APIFY_MAX_RETRIES,
+        min_delay_between_retries_millis=settings.APIFY_RETRY_MIN_DELAY_MS,
+        timeout_secs=settings.APIFY_TIMEOUT_SECS,
+    )
+
+    # Den internen httpx-Client durch einen mit Keep-Alive-Pool und festen Limits ersetzen.
+    # Alle Requests gehen an api.apify.com, die Limits gelten also praktisch pro Host.
+    http = client.http_client
+    default = http.httpx_async_client
+    http.httpx_async_client = httpx.AsyncClient(
+        headers=default.headers,
+        follow_redirects=True,
+        timeout=default.timeout,
+        limits=httpx.Limits(
+            max_connections=settings.APIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.APIFY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.APIFY_KEEPALIVE_EXPIRY_SECS,
+        ),
+    )
+    return client
+
+async def init_apify_client():
+    global _client
+    if _client is None:
+        _client = create_apify_client()
+        print("🔌 Apify Async-Client bereit.")
+
+async def close_apify_client():
+    global _client
+    if _client is not None:
+        await _client.http_client.httpx_async_client.aclose()
+        _client = None
+
+def get_apify_client() -> ApifyClientAsync:
+    """Geteilter Client. Fällt auf Lazy-Init zurück (z.B. in Skripten ohne Lifespan)."""
+    global _client
+    if _client is None:
+        _client = create_apify_client()
+    return _client
@@ -1,8 +1,9 @@
-from apify_client import ApifyClient
-from app.core.config import settings
+import time
+from app.services.apify_client_service import get_apify_client
+from app.services.metrics import span, apify_query_seconds, apify_run_items
 
-def fetch_tiktok_viral_live(keyword: str, limit: int):
-    client = ApifyClient(token=settings.APIFY_TOKEN)
+async def fetch_tiktok_viral_live(keyword: str, limit: int):
+    client = get_apify_client()
 
     # Strategy: Treat keyword as a hashtag
     # Use Actor: Clockworks (clockworks/tiktok-scraper)
@@ -13,8 +14,23 @@ def fetch_tiktok_viral_live(keyword: str, limit: int):
         "shouldDownloadCovers": True
     }
 
-    run = client.actor("clockworks/tiktok-scraper").call(run_input=run_input)
+    started = time.perf_counter()
+    # .call() = Start + Warten auf das Ende des Runs
+    with span("actor_wait"):
+        run = await client.actor("clockworks/tiktok-scraper").call(run_input=run_input)
     
     if run and run.get("defaultDatasetId"):
-        return client.dataset(run["defaultDatasetId"]).list_items().items
+        with span("dataset_fetch"):
+            dataset_page = await client.dataset(run["defaultDatasetId"]).list_items()
+        apify_query_seconds.observe(time.perf_counter() - started, platform="tiktok")
+        apify_run_items.observe(len(dataset_page.items), platform="tiktok")
+        return dataset_page.items
     return []
+
+async def search_tiktok_ads(query: str, limit: int = 20):
+    """Einstieg für den Such-Router (gleiches Fehlerverhalten wie search_meta_ads)."""
+    try:
+        return await fetch_tiktok_viral_live(query, limit)
+    except Exception as e:
+        print(f"❌ Apify TikTok Error: {str(e)}")
+        return []
@@ -0,0 +1,109 @@
+import asyncio
+from dataclasses import dataclass
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.core.config import settings
+from app.services.cache_service import LocalCache
+from app.services.supabase_service import get_supabase
+
+# Supabase-JWTs werden lokal geprüft (kein Request an /auth/v1/user pro Aufruf):
+# - HS256 mit dem Projekt-Secret (SUPABASE_JWT_SECRET), oder
+# - asymmetrische Signing Keys über die JWKS des Projekts (Keys werden gecacht).
+
+@dataclass(slots=True)
+class AuthUser:
+    id: str
+    email: str
+    role: str
+    claims: dict
+
+_jwks_client = None
+
+def get_jwks_client() -> jwt.PyJWKClient:
+    global _jwks_client
+    if _jwks_client is None:
+        url = settings.SUPABASE_JWKS_URL or f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        _jwks_client = jwt.PyJWKClient(
+            url,
+            cache_keys=True,
+            lifespan=settings.AUTH_JWKS_CACHE_SECS,
+            headers={"apikey": settings.SUPABASE_KEY},
+        )
+    return _jwks_client
+
+async def signing_key(token: str):
+    """HS256-Secret oder Public Key aus der JWKS. Ein JWKS-Fetch (Cache leer/abgelaufen) läuft im Thread."""
+    alg = jwt.get_unverified_header(token).get("alg")
+    if alg == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("HS256 token but SUPABASE_JWT_SECRET is not configured")
+        return settings.SUPABASE_JWT_SECRET
+    return (await asyncio.to_thread(get_jwks_client().get_signing_key_from_jwt, token)).key
+
+async def verify_token(token: str) -> dict:
+    """Prüft Signatur, Ablauf und Audience. Wirft jwt.PyJWTError."""
+    return jwt.decode(
+        token,
+        await signing_key(token),
+        algorithms=settings.AUTH_JWT_ALGORITHMS,
+        audience=settings.SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+        leeway=settings.AUTH_JWT_LEEWAY_SECS,
+    )
+
+async def init_auth():
+    """JWKS beim Start vorladen, damit der erste Request nicht auf das Netzwerk wartet."""
+    if settings.SUPABASE_JWT_SECRET:
+        return
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(None, lambda: get_jwks_client().get_jwk_set())
+        print("🔑 JWKS geladen.")
+    except Exception as e:
+        print(f"⚠️ JWKS Prefetch Error: {e}")
+
+# --- FASTAPI DEPENDENCY ---
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) -> AuthUser:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = await verify_token(credentials.credentials)
+    except jwt.PyJWTError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}", headers={"WWW-Authenticate": "Bearer"})
+    return AuthUser(
+        id=claims["sub"],
+        email=claims.get("email", ""),
+        role=claims.get("role", "authenticated"),
+        claims=claims,
+    )
+
+# --- PROFIL-CACHE (credits, plan, ...) ---
+
+# Kurze TTL: heiße Endpunkte sparen sich den profiles-Lookup,
+# Credit-Buchungen aktualisieren den Eintrag direkt (update_cached_credits).
+profile_cache = LocalCache(
+    max_entries=settings.AUTH_PROFILE_CACHE_MAX_ENTRIES,
+    ttl_secs=settings.AUTH_PROFILE_CACHE_TTL_SECS,
+)
+
+def get_profile(user_id: str) -> dict:
+    """profiles-Zeile des Users (gecacht). Leeres Dict, wenn es keine gibt."""
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+    response = get_supabase().table("profiles").select("*").eq("id", user_id).maybe_single().execute()
+    profile = response.data if response and response.data else {}
+    profile_cache.set(user_id, profile)
+    return profile
+
+def update_cached_credits(user_id: str, credits: int):
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        profile_cache.set(user_id, {**profile, "credits": credits})
+
+def invalidate_profile(user_id: str):
+    profile_cache.delete(user_id)
@@ -0,0 +1,34 @@
+import asyncio
+
+# Fire-and-forget Arbeit abseits des Request-Pfads (z.B. DB-Writes).
+# Die Tasks werden gehalten, damit der GC sie nicht vorzeitig einsammelt,
+# und beim Shutdown im Lifespan abgewartet.
+_tasks = set()
+
+def spawn(coro, name: str = None) -> asyncio.Task:
+    task = asyncio.ensure_future(coro)
+    if name: task.set_name(name)
+    _tasks.add(task)
+    task.add_done_callback(_done)
+    return task
+
+def _done(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"⚠️ Background Task {task.get_name()} fehlgeschlagen: {task.exception()}")
+
+def run_in_background(fn, *args, name: str = None) -> asyncio.Task:
+    """Blockierende Funktion (z.B. Supabase-Write) im Thread-Pool, ohne darauf zu warten."""
+    async def call():
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args))
+    return spawn(call(), name=name)
+
+def pending() -> int:
+    return len(_tasks)
+
+async def drain(timeout_secs: float = 30.0):
+    """Beim Shutdown: offene Writes noch zu Ende laufen lassen."""
+    if not _tasks: return
+    print(f"⏳ Warte auf {len(_tasks)} Background Tasks...")
+    await asyncio.wait(list(_tasks), timeout=timeout_secs)
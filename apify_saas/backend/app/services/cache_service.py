@@ -0,0 +1,296 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.supabase_service import get_cached_entry, get_cached_results, get_cache_windows, save_search_results
+from app.services.singleflight import scrape_flight
+from app.services.background_tasks import run_in_background, spawn
+from app.services.admission import as_refresh
+from app.services.metrics import span, cache_requests
+from app.services.ad_index import ad_index
+
+# --- CACHE KEY ---
+
+def make_search_key(platform: str, keyword: str, country: str = "US", active_status: str = "active",
+                    start_date_min: str = None, start_date_max: str = None, limit: int = None) -> str:
+    """
+    Normalisierter Key über die komplette Suchanfrage (gleiche Suche = gleicher Key).
+    limit=None: der Scrape liefert immer den vollen Pool (Meta), das Limit gehört dann nicht in den Key.
+    """
+    return "|".join([
+        (platform or "").lower(),
+        " ".join((keyword or "").lower().split()),
+        (country or "US").upper(),
+        (active_status or "active").lower(),
+        start_date_min or "",
+        start_date_max or "",
+        str(int(limit)) if limit else "*",
+    ])
+
+# --- L1: IN-PROZESS CACHE ---
+
+class LocalCache:
+    """
+    Begrenzter LRU-Cache mit TTL pro Worker-Prozess.
+    Liegt vor Supabase, damit Wiederholungs-Suchen in Millisekunden antworten.
+    """
+
+    def __init__(self, max_entries: int, ttl_secs: float):
+        self.max_entries = max_entries
+        self.ttl_secs = ttl_secs
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Wie get, aber ohne Zähler und ohne LRU-Reihenfolge zu ändern (für Hintergrund-Checks)."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl_secs: float = None):
+        expires_at = time.monotonic() + (ttl_secs if ttl_secs is not None else self.ttl_secs)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+search_cache = LocalCache(settings.L1_CACHE_MAX_ENTRIES, settings.L1_CACHE_TTL_SECS)
+
+def _remember(cache_key: str, platform: str, ads: list, fetched_at: float, min_ads: int = None):
+    """Pool in L1 ablegen und in den lokalen Such-Index aufnehmen (Land steht im Key)."""
+    search_cache.set(cache_key, {"ads": ads, "fetched_at": fetched_at, "min_ads": min_ads})
+    parts = cache_key.split("|")
+    # Tokenisieren kostet bei großen Pools einige ms -> nicht im Event-Loop
+    run_in_background(ad_index.add, ads, platform, parts[2] if len(parts) > 2 else None, name=f"index:{cache_key}")
+
+def covers(ads: list, min_ads: int, parameters: dict) -> bool:
+    """
+    Reicht ein gecachter Pool für diese Suche? Adaptive Pools (siehe apify_meta.plan_pool) sind
+    nur so groß wie für ihr Limit nötig. Weniger Ads als gebraucht sind ok, wenn damals mindestens
+    genauso viele angefragt wurden (mehr gibt die Suche dann nicht her). Alte Einträge = volle Pools.
+    """
+    needed = (parameters or {}).get("min_ads")
+    if not needed or len(ads) >= needed or min_ads is None:
+        return True
+    return min_ads >= needed
+
+# L2-Zähler (Supabase), damit man sieht, wie oft wir bis zur DB durchfallen
+l2_stats = {"hits": 0, "stale_hits": 0, "misses": 0}
+
+# --- NACHFRAGE (für den Prefetch-Scheduler) ---
+
+class DemandTracker:
+    """
+    Zählt Suchen pro Cache-Key mit exponentiellem Zerfall (Halbwertszeit),
+    damit der Prefetcher weiß, welche Suchen gerade gefragt sind - auch bei Cache-Hits,
+    die in search_cache keine Spur hinterlassen.
+    """
+
+    def __init__(self, max_entries: int, half_life_secs: float):
+        self.max_entries = max_entries
+        self.half_life_secs = half_life_secs
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _decayed(self, entry: dict, now: float) -> float:
+        return entry["score"] * 0.5 ** ((now - entry["last_seen"]) / self.half_life_secs)
+
+    def record(self, cache_key: str, platform: str, keyword: str, parameters: dict):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(cache_key, None)
+            score = self._decayed(entry, now) + 1 if entry else 1.0
+            self._entries[cache_key] = {
+                "cache_key": cache_key, "platform": platform, "keyword": keyword,
+                "parameters": parameters, "score": score, "last_seen": now,
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def top(self, n: int) -> list:
+        now = time.time()
+        with self._lock:
+            entries = [{**entry, "score": self._decayed(entry, now)} for entry in self._entries.values()]
+        entries.sort(key=lambda e: e["score"], reverse=True)
+        return entries[:n]
+
+search_demand = DemandTracker(
+    max_entries=settings.PREFETCH_DEMAND_MAX_KEYS,
+    half_life_secs=settings.PREFETCH_DEMAND_HALF_LIFE_SECS,
+)
+
+# Keys im Refresh-Cooldown (damit ein fehlschlagender Scrape nicht bei jedem Hit neu startet)
+_refresh_cooldown = LocalCache(settings.CACHE_KEY_STATE_MAX_ENTRIES, settings.CACHE_REFRESH_COOLDOWN_SECS)
+
+def classify_freshness(fetched_at: float, platform: str):
+    """'fresh', 'stale' oder None (zu alt, muss neu gescrapt werden)."""
+    fresh_secs, stale_secs = get_cache_windows(platform)
+    age = time.time() - fetched_at
+    if age < fresh_secs: return "fresh"
+    if age < fresh_secs + stale_secs: return "stale"
+    return None
+
+# Delta-Refreshs in Folge pro Key (danach wieder ein voller Scrape). Nach Frisch- + Stale-Fenster
+# ist der Pool ohnehin abgelaufen und wird voll gescrapt, länger muss sich niemand den Zähler merken.
+_delta_runs = LocalCache(
+    settings.CACHE_KEY_STATE_MAX_ENTRIES,
+    max(settings.CACHE_FRESH_HOURS.values()) * 3600 + max(settings.CACHE_STALE_HOURS.values()) * 3600,
+)
+
+def _delta_base(cache_key: str, platform: str, cached: list):
+    """Bisheriger Pool, falls der nächste Refresh ein Delta sein darf, sonst None (voller Scrape)."""
+    if not (settings.DELTA_REFRESH_ENABLED and platform == "meta" and cached): return None
+    if (_delta_runs.get(cache_key) or 0) >= settings.DELTA_MAX_CONSECUTIVE:
+        return None
+    return cached
+
+def _revalidate(cache_key: str, fetch_and_store, cached: list = None):
+    """Stale Treffer: im Hintergrund neu scrapen. Der neue search_cache-Eintrag ersetzt den alten atomar."""
+    if scrape_flight.is_inflight(cache_key): return
+    if _refresh_cooldown.get(cache_key): return
+    _refresh_cooldown.set(cache_key, True)
+    print(f"🔄 Stale Cache für '{cache_key}', Refresh läuft im Hintergrund.")
+    spawn(as_refresh(scrape_flight.do(cache_key, lambda: fetch_and_store(cached=cached))), name=f"refresh:{cache_key}")
+
+def _store_fetch(cache_key: str, platform: str, keyword: str, parameters: dict, fetch):
+    """Scrape über `fetch()` (bzw. Delta zu `cached`) + Ergebnis in L1 und (im Hintergrund) L2 ablegen."""
+    async def fetch_and_store(cached: list = None):
+        base = _delta_base(cache_key, platform, cached)
+        results = await (fetch(cached=base) if base else fetch())
+        if base: _delta_runs.set(cache_key, (_delta_runs.get(cache_key) or 0) + 1)
+        else: _delta_runs.delete(cache_key)
+        if results:
+            _remember(cache_key, platform, results, time.time(), parameters.get("min_ads"))
+            # DB-Write läuft im Hintergrund, die Response wartet nicht darauf; die Lease hält bis er fertig ist
+            write = run_in_background(save_search_results, platform, keyword, results, parameters, name=f"save:{cache_key}")
+            scrape_flight.hold_lease(cache_key, write)
+        return results
+    return fetch_and_store
+
+async def refresh_search(cache_key: str, platform: str, keyword: str, parameters: dict, fetch) -> list:
+    """Neu scrapen (Prefetch), als Delta zum vorhandenen Pool, falls erlaubt. Läuft über Single-Flight."""
+    cached = await peek_search(cache_key, platform, keyword)
+    fetch_and_store = _store_fetch(cache_key, platform, keyword, parameters, fetch)
+    results = await scrape_flight.do(cache_key, lambda: fetch_and_store(cached=cached))
+    return list(results or [])
+
+def cached_fetched_at(cache_key: str):
+    """Zeitpunkt des Scrapes im L1-Cache (oder None). Zählt nicht als Lookup."""
+    hit = search_cache.peek(cache_key)
+    return hit["fetched_at"] if hit is not None else None
+
+# --- GESCHICHTETER LOOKUP ---
+
+async def peek_search(cache_key: str, platform: str, keyword: str):
+    """Nur lesen (L1, dann L2 inkl. Stale-Fenster), nie scrapen. None, wenn nichts (mehr) da ist."""
+    hit = search_cache.get(cache_key)
+    if hit is not None:
+        return hit["ads"]
+    fresh_secs, stale_secs = get_cache_windows(platform)
+    loop = asyncio.get_event_loop()
+    entry = await loop.run_in_executor(
+        None, lambda: get_cached_entry(platform, keyword, cache_key, max_age_secs=fresh_secs + stale_secs)
+    )
+    if not entry:
+        return None
+    _remember(cache_key, platform, entry["ads"], entry["last_updated"].timestamp(), entry["parameters"].get("min_ads"))
+    return entry["ads"]
+
+async def cached_search(cache_key: str, platform: str, keyword: str, parameters: dict, fetch):
+    """
+    L1 (Prozess) -> L2 (Supabase) -> Live-Scrape über `fetch()`.
+    Ergebnisse eines Scrapes werden in beide Ebenen geschrieben,
+    identische gleichzeitige Scrapes laufen nur einmal (Single-Flight).
+    Gibt (ads, freshness) zurück: 'fresh', 'stale' (Refresh läuft) oder 'live'.
+    """
+    loop = asyncio.get_event_loop()
+    fetch_and_store = _store_fetch(cache_key, platform, keyword, parameters, fetch)
+    search_demand.record(cache_key, platform, keyword, parameters)
+
+    async def poll_l2():
+        return await loop.run_in_executor(None, lambda: get_cached_results(platform, keyword, cache_key))
+
+    with span("cache_lookup"):
+        hit = search_cache.get(cache_key)
+        freshness = classify_freshness(hit["fetched_at"], platform) if hit is not None else None
+    if freshness and not covers(hit["ads"], hit.get("min_ads"), parameters):
+        print(f"📏 L1 Pool für {keyword} zu klein für limit={parameters.get('limit')}, suche weiter.")
+        cache_requests.inc(layer="l1", result="partial")
+    elif freshness:
+        print(f"⚡ L1 Cache HIT für {keyword} ({freshness})")
+        cache_requests.inc(layer="l1", result="hit" if freshness == "fresh" else "stale")
+        if freshness == "stale": _revalidate(cache_key, fetch_and_store, hit["ads"])
+        return list(hit["ads"]), freshness
+    else:
+        cache_requests.inc(layer="l1", result="miss")
+
+    fresh_secs, stale_secs = get_cache_windows(platform)
+    with span("cache_lookup"):
+        entry = await loop.run_in_executor(
+            None, lambda: get_cached_entry(platform, keyword, cache_key, max_age_secs=fresh_secs + stale_secs)
+        )
+    if entry and not covers(entry["ads"], entry["parameters"].get("min_ads"), parameters):
+        print(f"📏 L2 Pool für {keyword} zu klein für limit={parameters.get('limit')}, scrape neu.")
+        cache_requests.inc(layer="l2", result="partial")
+    elif entry:
+        fetched_at = entry["last_updated"].timestamp()
+        freshness = classify_freshness(fetched_at, platform) or "stale"
+        l2_stats["hits" if freshness == "fresh" else "stale_hits"] += 1
+        cache_requests.inc(layer="l2", result="hit" if freshness == "fresh" else "stale")
+        _remember(cache_key, platform, entry["ads"], fetched_at, entry["parameters"].get("min_ads"))
+        if freshness == "stale": _revalidate(cache_key, fetch_and_store, entry["ads"])
+        return list(entry["ads"]), freshness
+    else:
+        l2_stats["misses"] += 1
+        cache_requests.inc(layer="l2", result="miss")
+
+    # Gleiche Suchen, die gerade laufen, teilen sich einen Scrape (auch über Worker hinweg)
+    results = await scrape_flight.do(cache_key, fetch_and_store, poll=poll_l2)
+    return list(results or []), "live"
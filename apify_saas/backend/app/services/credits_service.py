@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+import threading
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.services.supabase_service import adjust_credits, insert_ledger_entries
+from app.services.auth_service import update_cached_credits
+from app.services.metrics import span
+
+class InsufficientCredits(Exception):
+    pass
+
+# --- LEDGER (Write-Behind) ---
+
+class LedgerBuffer:
+    """
+    Sammelt credit_ledger-Einträge im Prozess und schreibt sie gebündelt
+    (bei voller Batch oder periodisch). Fehlgeschlagene Batches bleiben im Puffer.
+    """
+
+    def __init__(self, batch_size: int, flush_secs: float, max_buffer: int):
+        self.batch_size = batch_size
+        self.flush_secs = flush_secs
+        self.max_buffer = max_buffer
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._task = None
+        self.stats = {"written": 0, "failed_flushes": 0, "dropped": 0}
+
+    def add(self, user_id: str, amount: int, description: str):
+        with self._lock:
+            self._rows.append({
+                "user_id": user_id,
+                "amount": amount,
+                "description": description,
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            })
+            full = len(self._rows) >= self.batch_size
+        if full and self._task is not None:
+            asyncio.ensure_future(self.flush_async())
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def flush(self):
+        """Blockierend (Thread-Pool): schreibt alles, was gerade im Puffer liegt."""
+        with self._flushing:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                try:
+                    insert_ledger_entries(batch)
+                    self.stats["written"] += len(batch)
+                except Exception as e:
+                    print(f"⚠️ Ledger Flush Error: {e}")
+                    self.stats["failed_flushes"] += 1
+                    self._requeue(rows[i:])
+                    return
+
+    def _requeue(self, rows: list):
+        with self._lock:
+            self._rows = rows + self._rows
+            overflow = len(self._rows) - self.max_buffer
+            if overflow > 0:
+                # Lieber alte Ledger-Zeilen verlieren als den Prozess volllaufen lassen
+                print(f"⚠️ Ledger-Puffer voll, verwerfe {overflow} Einträge")
+                self._rows = self._rows[overflow:]
+                self.stats["dropped"] += overflow
+
+    async def flush_async(self):
+        if not self._rows: return
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.flush)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_secs)
+            await self.flush_async()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush_async()
+
+credit_ledger = LedgerBuffer(
+    batch_size=settings.CREDIT_LEDGER_BATCH_SIZE,
+    flush_secs=settings.CREDIT_LEDGER_FLUSH_SECS,
+    max_buffer=settings.CREDIT_LEDGER_MAX_BUFFER,
+)
+
+# --- RESERVIERUNGEN (Holds) ---
+
+# Offene Holds pro User (nur dieser Prozess), z.B. für lange Scrapes/Jobs
+_holds = {}
+
+class CreditHold:
+    """
+    Credits, die beim Start einer Suche atomar abgebucht wurden.
+    settle() behält (einen Teil davon), release() bucht alles zurück.
+    """
+
+    def __init__(self, user_id: str, amount: int, description: str, balance: int):
+        self.user_id = user_id
+        self.amount = amount
+        self.description = description
+        self.balance = balance
+        self.closed = False
+
+    async def settle(self, used: int = None):
+        """Hold abschließen. Nicht verbrauchte Credits gehen zurück."""
+        if self.closed: return
+        used = self.amount if used is None else max(0, min(used, self.amount))
+        if used < self.amount:
+            await _adjust(self.user_id, self.amount - used)
+        if used:
+            credit_ledger.add(self.user_id, -used, self.description)
+        self._close()
+
+    async def release(self):
+        """Suche fehlgeschlagen: alles zurückbuchen, kein Ledger-Eintrag."""
+        if self.closed: return
+        await _adjust(self.user_id, self.amount)
+        self._close()
+
+    def _close(self):
+        self.closed = True
+        _holds[self.user_id] = _holds.get(self.user_id, 0) - self.amount
+        if _holds[self.user_id] <= 0: del _holds[self.user_id]
+
+async def _adjust(user_id: str, delta: int):
+    loop = asyncio.get_event_loop()
+    balance = await loop.run_in_executor(None, lambda: adjust_credits(user_id, delta))
+    # Gecachtes Profil gleich mitziehen, statt es neu zu laden
+    if balance is not None: update_cached_credits(user_id, balance)
+    return balance
+
+async def reserve_credits(user_id: str, amount: int, description: str = "Search API Usage") -> CreditHold:
+    """Ein Round-Trip: prüft und bucht ab. Wirft InsufficientCredits (ValueError bei amount <= 0)."""
+    if amount <= 0:
+        # Negative Beträge würden über adjust_credits Credits gutschreiben
+        raise ValueError(f"Invalid credit amount: {amount}")
+    with span("credit_deduction"):
+        balance = await _adjust(user_id, -amount)
+    if balance is None:
+        raise InsufficientCredits(f"Insufficient credits: {amount} required")
+    _holds[user_id] = _holds.get(user_id, 0) + amount
+    return CreditHold(user_id, amount, description, balance)
+
+def held_credits(user_id: str) -> int:
+    return _holds.get(user_id, 0)
+
+@asynccontextmanager
+async def credit_hold(user_id: str, amount: int, description: str = "Search API Usage"):
+    """Reservieren -> Arbeit -> bei Erfolg abrechnen, bei Fehler zurückbuchen."""
+    hold = await reserve_credits(user_id, amount, description)
+    try:
+        yield hold
+    except BaseException:
+        await hold.release()
+        raise
+    await hold.settle()
@@ -0,0 +1,216 @@
+import datetime
+import time
+
+# --- DEKLARATIVE EXTRAKTIONS-SPEZIFIKATION ---
+# Jeder Pfad wird beim Import EINMAL zu einer Zugriffsfunktion (Closure) gebaut,
+# statt pro Item und Feld generisch durch verschachtelte Dicts zu laufen.
+
+PATHS = {
+    # Reichweite (Fallback-Kette, erster Treffer gewinnt)
+    "eu_reach": ("eu_transparency", "eu_total_reach"),
+    "aaa_reach": ("aaa_info", "eu_total_reach"),
+    "location_reach": ("transparency_by_location", "eu_transparency", "eu_total_reach"),
+    "impressions_index": ("impressions_with_index", "impressions_index"),
+
+    # Advertiser (page_info wird nur noch einmal pro Item aufgelöst)
+    "page_info": ("advertiser", "ad_library_page_info", "page_info"),
+    "about_text": ("advertiser", "page", "about", "text"),
+
+    # Targeting / Transparenz (nur mit scrapeAdDetails)
+    "target_locations": ("aaa_info", "location_audience"),
+    "payer_beneficiary": ("aaa_info", "payer_beneficiary_data"),
+    "demographics": ("aaa_info", "age_country_gender_reach_breakdown"),
+}
+
+def compile_path(path: tuple):
+    """
+    Erzeugt eine spezialisierte Funktion für einen festen Pfad.
+    Gleiche Semantik wie das frühere get_nested_value: kein Dict unterwegs -> None.
+    """
+    first, rest = path[0], path[1:]
+    if not rest:
+        getter = lambda item: item.get(first)
+    else:
+        inner = compile_path(rest)
+        def getter(item):
+            v = item.get(first)
+            return inner(v) if isinstance(v, dict) else None
+    getter.__name__ = "get_" + "_".join(path)
+    return getter
+
+GETTERS = {name: compile_path(path) for name, path in PATHS.items()}
+
+_get_eu_reach = GETTERS["eu_reach"]
+_get_aaa_reach = GETTERS["aaa_reach"]
+_get_location_reach = GETTERS["location_reach"]
+_get_impressions_index = GETTERS["impressions_index"]
+_get_page_info = GETTERS["page_info"]
+_get_about_text = GETTERS["about_text"]
+_get_target_locations = GETTERS["target_locations"]
+_get_payer_beneficiary = GETTERS["payer_beneficiary"]
+_get_demographics = GETTERS["demographics"]
+
+# --- HELPER ---
+
+def get_days_active(start_timestamp):
+    """Berechnet, wie viele Tage die Ad schon läuft (Minimum 0.5 Tage)."""
+    if not start_timestamp:
+        return 1.0
+    try:
+        if isinstance(start_timestamp, str):
+            try:
+                if len(start_timestamp) == 10:
+                    start_date = datetime.datetime.strptime(start_timestamp, "%Y-%m-%d")
+                else:
+                    start_date = datetime.datetime.fromisoformat(start_timestamp.replace('Z', '+00:00'))
+            except:
+                return 1.0
+        else:
+            # Unix-Timestamp (Normalfall beim Actor): ohne datetime-Objekte rechnen
+            return max(0.5, (time.time() - int(start_timestamp)) / 86400)
+
+        now = datetime.datetime.now()
+        delta = now - start_date
+        days = max(0.5, delta.total_seconds() / 86400)
+        return days
+    except:
+        return 1.0
+
+def get_start_epoch(value) -> float:
+    """Startzeitpunkt als Unix-Timestamp (Unix-Zahl, 'YYYY-MM-DD' oder ISO). 0.0, wenn unbekannt."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            if len(value) == 10:
+                parsed = datetime.datetime.strptime(value, "%Y-%m-%d")
+            else:
+                parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if parsed.tzinfo is None: parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return parsed.timestamp()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+# --- NORMALISIERUNG ---
+
+def normalize_meta_ad(item):
+    if not item: return None
+    if "error" in item or "errorMessage" in item: return None
+
+    raw_snapshot = item.get("snapshot") or {}
+    raw_id = item.get("ad_archive_id") or item.get("ad_id")
+    if not raw_id or str(raw_id) == "nan": return None
+
+    # --- REICHWEITE ---
+    reach = _get_eu_reach(item) or _get_aaa_reach(item) or _get_location_reach(item)
+    if not reach:
+        reach_est = item.get('reach_estimate')
+        if isinstance(reach_est, dict): reach = reach_est.get('reach_upper_bound')
+        elif isinstance(reach_est, (int, float)): reach = reach_est
+    if not reach:
+        reach = _get_impressions_index(item)
+        if reach == -1: reach = 0
+    reach = int(reach) if reach else 0
+
+    # --- BASIS METRIKEN (Likes + Follower) ---
+    page_info = _get_page_info(item)
+    if not isinstance(page_info, dict): page_info = {}
+
+    top_likes = item.get("likes", 0) or item.get("page_like_count", 0)
+    likes = top_likes or page_info.get("likes", 0) or 0
+    ig_followers = page_info.get("ig_followers", 0) or 0
+    if not likes: likes = raw_snapshot.get("page_like_count", 0) or 0
+    page_size = int(likes or 0) + int(ig_followers or 0)
+
+    viral_ratio = reach / max(page_size, 1000)
+
+    # --- ZEIT & GESCHWINDIGKEIT ---
+    start_date = item.get("start_date", "")
+    days_active = get_days_active(item.get("start_date"))
+
+    # Meta Infos
+    advertiser_info = {
+        "facebook_handle": page_info.get("page_alias"),
+        "facebook_followers": page_info.get("likes"),
+        "instagram_handle": page_info.get("ig_username"),
+        "instagram_followers": page_info.get("ig_followers"),
+        "about_text": _get_about_text(item),
+        "category": page_info.get("page_category")
+    }
+
+    page_cats = item.get("categories", [])
+    cats = raw_snapshot.get("page_categories")
+    if cats:
+        if isinstance(cats, dict): page_cats = list(cats.values())
+        elif isinstance(cats, list): page_cats = cats
+
+    # Bilder/Videos extrahieren
+    images = raw_snapshot.get("images") or []
+    videos = raw_snapshot.get("videos") or []
+    cards = raw_snapshot.get("cards") or []
+    body = raw_snapshot.get("body")
+    body_text = body.get("text") if isinstance(body, dict) else None
+    if not body_text and cards and isinstance(cards[0], dict):
+        body_text = cards[0].get("body")
+
+    # Mapping für Beneficiary Infos (Wichtig für Frontend!)
+    payer_beneficiary = _get_payer_beneficiary(item)
+    if payer_beneficiary and isinstance(payer_beneficiary, list):
+        beneficiary_payer = {
+            "payer": payer_beneficiary[0].get("payer"),
+            "beneficiary": payer_beneficiary[0].get("beneficiary")
+        }
+    else:
+        beneficiary_payer = None
+
+    ad_library_url = item.get("ad_library_url", "#")
+
+    return {
+        "id": str(raw_id),
+        "publisher_platform": item.get("publisher_platform", ["facebook"]),
+        "start_date": start_date,
+        "page_name": item.get("page_name", "Unknown Page"),
+        "page_profile_uri": item.get("page_profile_uri", "#"),
+        "ad_library_url": ad_library_url,
+        "likes": top_likes,
+
+        "reach_estimate": reach, 
+        "impressions": reach,
+        "spend": item.get("spend", 0),
+        "page_size": page_size,
+
+        "viral_ratio": viral_ratio, 
+        "days_active": days_active,
+        "viral_velocity": viral_ratio / days_active,
+
+        "efficiency_score": 0, 
+        "viral_factor": 0,     
+
+        "demographics": _get_demographics(item) or [],
+        "target_locations": _get_target_locations(item) or [],
+        "advertiser_info": advertiser_info,
+        "beneficiary_payer": beneficiary_payer,
+        "page_categories": page_cats,
+
+        "snapshot": {
+            "cta_text": raw_snapshot.get("cta_text", "Learn More"),
+            "link_url": raw_snapshot.get("link_url") or ad_library_url,
+            "body": {"text": body_text or ""},
+            "images": images,
+            "videos": videos,
+            "cards": cards 
+        }
+    }
+
+def normalize_page(dataset_items: list) -> list:
+    """Rohe Dataset-Seite -> gültige normalisierte Ads (ohne Dedup)."""
+    page = []
+    for item in dataset_items:
+        try:
+            norm = normalize_meta_ad(item)
+        except Exception:
+            continue
+        if norm and isinstance(norm, dict) and norm.get('id'):
+            page.append(norm)
+    return page
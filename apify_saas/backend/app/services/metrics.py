@@ -0,0 +1,158 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prometheus-kompatible Metriken ohne Zusatz-Dependency (Text-Format 0.0.4).
+# Werte gelten pro Worker-Prozess; Prometheus summiert über die Targets.
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(l, "") for l in self.labels), 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_num(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labels = labels
+        # key -> [Zähler pro Bucket (nicht kumuliert) + Overflow, Summe, Anzahl]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+class Gauge:
+    """Wird erst beim Scrape berechnet (z.B. Hit-Ratio aus den Cache-Zählern)."""
+
+    def __init__(self, name: str, help: str, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_num(self.fn())}"]
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names: return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# --- REGISTRY ---
+
+_registry = []
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ITEM_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+stage_seconds = register(Histogram(
+    "adspy_stage_seconds", "Dauer einzelner Stufen im Such-Pfad", SECONDS_BUCKETS, labels=("stage",)
+))
+cache_requests = register(Counter(
+    "adspy_cache_requests_total", "Cache-Lookups nach Ebene und Ergebnis", labels=("layer", "result")
+))
+apify_query_seconds = register(Histogram(
+    "adspy_apify_query_seconds", "Apify-Zeit pro Suche (Start bis letztes Item)", SECONDS_BUCKETS, labels=("platform",)
+))
+apify_run_items = register(Histogram(
+    "adspy_apify_run_items", "Items pro Actor-Run", ITEM_BUCKETS, labels=("platform",)
+))
+apify_aborts = register(Counter(
+    "adspy_apify_aborts_total", "Vorzeitig beendete Actor-Runs (genug Ads im Dataset)", labels=("platform",)
+))
+apify_batch_urls = register(Histogram(
+    "adspy_apify_batch_urls", "Such-URLs pro Actor-Run (Micro-Batching)", (1, 2, 3, 5, 10, 20)
+))
+admission_rejections = register(Counter(
+    "adspy_admission_rejections_total", "Mit 429 abgelehnte Suchen/Scrapes nach Grund", labels=("reason",)
+))
+scrape_queue_wait_seconds = register(Histogram(
+    "adspy_scrape_queue_wait_seconds", "Wartezeit auf einen Scrape-Slot nach Priorität", SECONDS_BUCKETS, labels=("priority",)
+))
+
+def _hit_ratio() -> float:
+    # Jede Suche geht genau einmal durch L1, daher ist L1 die Basis
+    values = cache_requests._values
+    hits = sum(v for (layer, result), v in values.items() if result in ("hit", "stale"))
+    total = sum(v for (layer, result), v in values.items() if layer == "l1")
+    return hits / total if total else 0.0
+
+register(Gauge("adspy_cache_hit_ratio", "Anteil der Suchen ohne Scrape (L1 + L2, inkl. stale)", _hit_ratio))
+
+# --- SPANS ---
+
+# Pro Request gesammelte Spans für den Server-Timing-Header (None = nicht sammeln)
+request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+@contextmanager
+def span(stage: str):
+    """Misst eine Stufe: Histogramm + (falls aktiv) Server-Timing des aktuellen Requests."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+def server_timing_header(timings: list) -> str:
+    """Gleiche Stufen werden aufsummiert (z.B. mehrere Dataset-Seiten)."""
+    totals = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
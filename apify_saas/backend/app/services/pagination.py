@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import hmac
+import json
+from app.core.config import settings
+from app.services.cache_service import peek_search
+from app.services.search_service import branch_platform, merge_pools
+from app.services.meta_extract import get_start_epoch
+
+# Cursor-Paging über den gecachten, bereits bewerteten Pool einer Suche.
+# Folgeseiten werden nur aus L1/L2 gelesen: kein Re-Scoring, kein Scrape, keine Credits.
+# Der Cursor ist signiert (HMAC) und an User + Cache-Keys gebunden, enthält pro Zweig eine
+# Pool-Version (ändert sich der Pool, gibt es 410 statt verschobener Seiten) und das bezahlte Maximum.
+
+SORT_ALIASES = {"relevancy": "efficiency_score", "likes": "viral_factor"}
+COHORTS = {"LAUNCH", "TRENDING", "ESTABLISHED", "EVERGREEN"}
+CLUSTERS = {"A", "B", "C"}
+
+def _start_epoch(ad: dict) -> float:
+    """Startzeitpunkt als Unix-Timestamp (Meta: start_date, TikTok: createTime)."""
+    return get_start_epoch(ad.get("start_date") or ad.get("createTime"))
+
+SORT_KEYS = {
+    "efficiency_score": lambda ad: ad.get("efficiency_score") or 0,
+    "viral_factor": lambda ad: ad.get("viral_factor") or 0,
+    "newest": _start_epoch,
+}
+
+def normalize_sort(sort_by: str) -> str:
+    sort_by = SORT_ALIASES.get(sort_by or "efficiency_score", sort_by)
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort_by '{sort_by}' (allowed: {', '.join(SORT_KEYS)})")
+    return sort_by
+
+def normalize_filters(cohort: str = None, cluster: str = None, platform: str = None) -> dict:
+    filters = {}
+    if cohort:
+        if cohort.upper() not in COHORTS: raise ValueError(f"Unknown cohort '{cohort}'")
+        filters["cohort"] = cohort.upper()
+    if cluster:
+        if cluster.upper() not in CLUSTERS: raise ValueError(f"Unknown cluster '{cluster}'")
+        filters["cluster"] = cluster.upper()
+    if platform:
+        if platform.lower() not in ("meta", "tiktok"): raise ValueError(f"Unknown platform filter '{platform}'")
+        filters["platform"] = platform.lower()
+    return filters
+
+# --- CURSOR ---
+
+def _cursor_key() -> bytes:
+    # Ohne eigenes Secret aus dem Service-Key abgeleitet (der verlässt das Backend nie)
+    secret = settings.CURSOR_SECRET or "cursor:" + settings.SUPABASE_KEY
+    return hashlib.sha256(secret.encode("utf-8")).digest()
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def encode_cursor(state: dict) -> str:
+    payload = _b64(json.dumps(state, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    signature = hmac.new(_cursor_key(), payload.encode("ascii"), hashlib.sha256).digest()
+    return f"{payload}.{_b64(signature)}"
+
+def decode_cursor(cursor: str, user_id: str) -> dict:
+    """Prüft Signatur und Besitzer; ValueError bei manipulierten oder fremden Cursorn."""
+    payload, _, signature = cursor.partition(".")
+    try:
+        expected = hmac.new(_cursor_key(), payload.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _unb64(signature)):
+            raise ValueError
+        state = json.loads(_unb64(payload))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict) or state.get("user") != user_id:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state.get("keys"), dict) or not isinstance(state.get("versions"), dict):
+        raise ValueError("Invalid cursor")
+    offset, page_size, max_items = state.get("offset"), state.get("page_size"), state.get("max_items")
+    if not isinstance(offset, int) or offset < 0 or not isinstance(page_size, int) or not 1 <= page_size <= 200:
+        raise ValueError("Invalid cursor")
+    if not isinstance(max_items, int) or max_items < 1:
+        raise ValueError("Invalid cursor")
+    state["sort"] = normalize_sort(state.get("sort"))
+    filters = state.get("filters") or {}
+    if not isinstance(filters, dict) or set(filters) - {"cohort", "cluster", "platform"}:
+        raise ValueError("Invalid cursor")
+    state["filters"] = normalize_filters(**filters)
+    return state
+
+# --- SEITEN ---
+
+def _matches(ad: dict, filters: dict) -> bool:
+    # TikTok-Ads haben keinen _bucket: Kohorten-/Cluster-Filter gelten nur für Meta
+    bucket = ad.get("_bucket")
+    if not bucket: return True
+    cluster, _, cohort = bucket.partition("_")
+    if "cohort" in filters and cohort != filters["cohort"]: return False
+    if "cluster" in filters and cluster != filters["cluster"]: return False
+    return True
+
+def pool_version(ads: list) -> str:
+    """Fingerabdruck der Ad-IDs in Pool-Reihenfolge; ändert sich bei jedem Refresh mit anderem Ergebnis."""
+    ids = "\n".join(str(ad.get("id") or ad.get("ad_archive_id") or "") for ad in ads)
+    return hashlib.sha1(ids.encode("utf-8")).hexdigest()[:12]
+
+def select_page(pools: dict, sort_by: str, filters: dict, offset: int, page_size: int, max_items: int = None):
+    """
+    pools: Zweig (z.B. 'meta:US', 'tiktok') -> Liste bewerteter Ads.
+    Gibt (Seite, Anzahl nach Filtern, Offset der nächsten Seite oder None) zurück.
+    Mehr als `max_items` (bezahlt) werden über alle Seiten nicht ausgeliefert.
+    """
+    view = [ad for ad in merge_pools(pools, filters.get("platform")) if _matches(ad, filters)]
+    # sorted() ist stabil: bei Gleichstand bleibt die Score-Reihenfolge des Pools
+    view = sorted(view, key=SORT_KEYS[sort_by], reverse=True)
+    if max_items is not None: view = view[:max_items]
+    page = view[offset:offset + page_size]
+    next_offset = offset + page_size if offset + page_size < len(view) else None
+    return page, len(view), next_offset
+
+def build_page(pools: dict, state: dict) -> dict:
+    """Eine Seite + Cursor für die nächste (state = Inhalt des Cursors)."""
+    state.setdefault("versions", {branch_id: pool_version(ads) for branch_id, ads in pools.items()})
+    page, total, next_offset = select_page(pools, state["sort"], state["filters"], state["offset"],
+                                           state["page_size"], state["max_items"])
+    next_cursor = encode_cursor({**state, "offset": next_offset}) if next_offset is not None else None
+    return {"items": page, "total": total, "next_cursor": next_cursor}
+
+async def load_page(cursor: str, user_id: str) -> dict:
+    """Folgeseite nur aus dem Cache. LookupError, wenn der Pool inzwischen verdrängt oder erneuert ist."""
+    state = decode_cursor(cursor, user_id)
+    pools = {}
+    for branch_id, cache_key in state["keys"].items():
+        ads = await peek_search(cache_key, branch_platform(branch_id), state.get("query", ""))
+        if ads is None:
+            raise LookupError("Search results expired, please search again")
+        if pool_version(ads) != state["versions"].get(branch_id):
+            raise LookupError("Search results were refreshed, please search again")
+        pools[branch_id] = ads
+    return {**build_page(pools, state), "state": state}
@@ -0,0 +1,150 @@
+import asyncio
+import datetime
+import time
+from collections import deque
+from app.core.config import settings
+from app.services.cache_service import search_demand, refresh_search, cached_fetched_at
+from app.services.supabase_service import get_cache_windows, get_recent_searches
+from app.services.search_service import search_specs, request_from_parameters
+from app.services.singleflight import scrape_flight
+from app.services.admission import as_refresh
+
+# Hält die gefragtesten Suchen warm: Nachfrage aus search_cache (alle Worker) + lokalen Treffern,
+# Refresh kurz vor Ablauf des Fresh-Fensters, begrenzt durch ein Apify-Budget pro Stunde.
+
+class PrefetchScheduler:
+
+    def __init__(self):
+        self._task = None
+        self._runs = deque()       # Zeitpunkte der Actor-Runs der letzten Stunde (Budget)
+        self._failures = {}        # cache_key -> (Anzahl Fehlschläge, nicht vor)
+        self._paused_until = 0.0   # globaler Backoff, wenn Apify generell streikt
+        self._consecutive_failures = 0
+        self.stats = {"rounds": 0, "refreshed": 0, "failed": 0, "skipped_budget": 0}
+
+    # --- KANDIDATEN ---
+
+    def _candidates(self, recent_rows: list) -> list:
+        """Suchen nach Nachfrage sortiert, inkl. Zeitpunkt des letzten Scrapes."""
+        candidates = {}
+        for entry in search_demand.top(settings.PREFETCH_TOP_N * 5):
+            candidates[entry["cache_key"]] = {**entry, "fetched_at": None}
+
+        for row in recent_rows:
+            parameters = row.get("parameters") or {}
+            cache_key = parameters.get("cache_key")
+            if not cache_key: continue
+            last_updated = datetime.datetime.fromisoformat(row["last_updated"].replace('Z', '+00:00')).timestamp()
+            entry = candidates.setdefault(cache_key, {
+                "cache_key": cache_key, "platform": row["platform"], "keyword": row["query"],
+                "parameters": parameters, "score": 0.0, "fetched_at": None,
+            })
+            # Jeder Scrape in der Lookback-Zeit zählt als Nachfrage
+            entry["score"] += 1
+            entry["fetched_at"] = max(entry["fetched_at"] or 0, last_updated)
+
+        for entry in candidates.values():
+            local = cached_fetched_at(entry["cache_key"])
+            if local: entry["fetched_at"] = max(entry["fetched_at"] or 0, local)
+
+        ranked = [e for e in candidates.values() if e["score"] >= settings.PREFETCH_MIN_DEMAND]
+        ranked.sort(key=lambda e: e["score"], reverse=True)
+        return ranked[:settings.PREFETCH_TOP_N]
+
+    def _is_due(self, entry: dict, now: float) -> bool:
+        fresh_secs, _ = get_cache_windows(entry["platform"])
+        if entry["fetched_at"] and now - entry["fetched_at"] < fresh_secs - settings.PREFETCH_LEAD_SECS:
+            return False
+        failures, not_before = self._failures.get(entry["cache_key"], (0, 0.0))
+        if now < not_before: return False
+        return not scrape_flight.is_inflight(entry["cache_key"])
+
+    # --- BUDGET & BACKOFF ---
+
+    def _budget_left(self, now: float) -> int:
+        while self._runs and now - self._runs[0] > 3600:
+            self._runs.popleft()
+        return settings.PREFETCH_MAX_RUNS_PER_HOUR - len(self._runs)
+
+    def _backoff(self, failures: int) -> float:
+        return min(settings.PREFETCH_BACKOFF_BASE_SECS * 2 ** (failures - 1), settings.PREFETCH_BACKOFF_MAX_SECS)
+
+    def _record_result(self, cache_key: str, ok: bool):
+        now = time.time()
+        if ok:
+            self._failures.pop(cache_key, None)
+            self._consecutive_failures = 0
+            self.stats["refreshed"] += 1
+            return
+        failures = self._failures.get(cache_key, (0, 0.0))[0] + 1
+        self._failures[cache_key] = (failures, now + self._backoff(failures))
+        self._consecutive_failures += 1
+        self.stats["failed"] += 1
+        # Mehrere Fehlschläge hintereinander: eher Apify/Proxy als die Suche -> ganz pausieren
+        if self._consecutive_failures >= 3:
+            self._paused_until = now + self._backoff(self._consecutive_failures - 2)
+            print(f"⏸️ Prefetch pausiert für {int(self._paused_until - now)}s ({self._consecutive_failures} Fehlschläge in Folge)")
+
+    # --- LAUF ---
+
+    async def _refresh(self, entry: dict, slots: asyncio.Semaphore):
+        async with slots:
+            request = request_from_parameters(entry["platform"], entry["keyword"], entry["parameters"])
+            # Einzelne Plattform + ein Land -> genau ein Zweig
+            cache_key, parameters, fetch = next(iter(search_specs(request).values()))
+            try:
+                # Leere Ergebnisse zählen als Fehlschlag (die Scraper fangen ihre Fehler selbst ab)
+                # Niedrigste Priorität: wartende User-Suchen bekommen Scrape-Slots zuerst
+                results = await as_refresh(refresh_search(cache_key, entry["platform"], entry["keyword"], parameters, fetch))
+                ok = bool(results)
+            except Exception as e:
+                print(f"⚠️ Prefetch Error für '{cache_key}': {e}")
+                ok = False
+            self._record_result(cache_key, ok)
+
+    async def run_once(self):
+        """Eine Runde: Kandidaten bestimmen und im Rahmen des Budgets erneuern."""
+        now = time.time()
+        self.stats["rounds"] += 1
+        if now < self._paused_until:
+            return
+
+        loop = asyncio.get_event_loop()
+        try:
+            recent = await loop.run_in_executor(None, lambda: get_recent_searches(settings.PREFETCH_LOOKBACK_HOURS))
+        except Exception as e:
+            print(f"⚠️ Prefetch: search_cache nicht lesbar ({e}), nur lokale Nachfrage")
+            recent = []
+
+        due = [entry for entry in self._candidates(recent) if self._is_due(entry, now)]
+        budget = self._budget_left(now)
+        if len(due) > budget:
+            self.stats["skipped_budget"] += len(due) - max(budget, 0)
+            due = due[:max(budget, 0)]
+        if not due: return
+
+        print(f"🔥 Prefetch: {len(due)} Suchen werden vorgewärmt ({budget} Runs Budget übrig).")
+        for _ in due:
+            self._runs.append(now)
+        slots = asyncio.Semaphore(settings.PREFETCH_CONCURRENCY)
+        await asyncio.gather(*(self._refresh(entry, slots) for entry in due))
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠️ Prefetch Runde fehlgeschlagen: {e}")
+            await asyncio.sleep(settings.PREFETCH_INTERVAL_SECS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+            print("🔥 Prefetch-Scheduler gestartet.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+prefetcher = PrefetchScheduler()
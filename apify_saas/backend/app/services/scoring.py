@@ -0,0 +1,134 @@
+import math
+import re
+from functools import lru_cache
+import numpy as np
+
+# --- KLASSIFIZIERUNG ---
+
+CLUSTERS = ['A', 'B', 'C']           # A (E-Comm), B (Service), C (Viral)
+COHORTS = ['LAUNCH', 'TRENDING', 'ESTABLISHED', 'EVERGREEN']
+COHORT_LIMITS = [3, 14, 30]          # Obergrenzen (inklusive) in Tagen
+
+# Fallback-Normierung, wenn ein Bucket weniger als 3 Ads hat (Index = Cluster-Code)
+CLUSTER_FALLBACK = np.array([1.0, 3.0, 0.5])
+
+# CLUSTER B (Service / B2B)
+SERVICE_KEYWORDS = [
+    'medical', 'doctor', 'software', 'real estate', 'consulting',
+    'education', 'lawyer', 'dentist', 'service', 'health/beauty',
+    'employment', 'job', 'karriere', 'b2b', 'agency', 'business'
+]
+SERVICE_CTAS = {'book now', 'contact us', 'apply now'}
+
+# CLUSTER C (Viral / Entertainment)
+VIRAL_KEYWORDS = [
+    'media', 'news', 'blog', 'creator', 'comedian', 'gamer',
+    'just for fun', 'entertainment', 'meme'
+]
+VIRAL_CTAS = {'watch more', 'like page'}
+
+_SERVICE_RE = re.compile("|".join(re.escape(k) for k in SERVICE_KEYWORDS))
+_VIRAL_RE = re.compile("|".join(re.escape(k) for k in VIRAL_KEYWORDS))
+
+def get_time_cohort(days):
+    """Ordnet die Ad einer Zeit-Phase zu."""
+    if days <= 3: return "LAUNCH"      # 0-3 Tage
+    if days <= 14: return "TRENDING"   # 4-14 Tage
+    if days <= 30: return "ESTABLISHED"# 15-30 Tage
+    return "EVERGREEN"                 # 30+ Tage
+
+@lru_cache(maxsize=4096)
+def _cluster_code(cats_str: str, cta: str) -> int:
+    # Viele Ads teilen sich Kategorie + CTA, daher gecacht
+    if _SERVICE_RE.search(cats_str) or cta in SERVICE_CTAS:
+        return 1
+    if _VIRAL_RE.search(cats_str) or cta in VIRAL_CTAS:
+        return 2
+    return 0
+
+def get_ad_cluster_code(ad) -> int:
+    cats = ad.get("page_categories", [])
+    if not cats: cats = []
+    snapshot = ad.get("snapshot") or {}
+    cta = snapshot.get("cta_text")
+    if not cta: cta = ""
+    return _cluster_code(str(cats).lower(), str(cta).lower())
+
+def get_ad_cluster(ad):
+    """
+    Kategorie-Cluster: A (E-Comm), B (Service), C (Viral)
+    """
+    return CLUSTERS[get_ad_cluster_code(ad)]
+
+def calculate_log_score(value):
+    """Logarithmische Skalierung auf 0-100."""
+    if value <= 0: return 0
+    score = 18 * math.log2(1 + value)
+    return round(min(score, 100), 1)
+
+# --- BATCH SCORING (spaltenweise mit NumPy) ---
+
+def extract_columns(ads: list) -> dict:
+    """Holt die Scoring-Felder einmal aus den Ad-Dicts in NumPy-Spalten."""
+    n = len(ads)
+    velocity = np.fromiter((ad['viral_velocity'] for ad in ads), dtype=np.float64, count=n)
+    ratio = np.fromiter((ad['viral_ratio'] for ad in ads), dtype=np.float64, count=n)
+    days = np.fromiter((ad['days_active'] for ad in ads), dtype=np.float64, count=n)
+    clusters = np.fromiter((get_ad_cluster_code(ad) for ad in ads), dtype=np.int64, count=n)
+    return {"velocity": velocity, "ratio": ratio, "days": days, "clusters": clusters}
+
+def cohort_codes(days: np.ndarray) -> np.ndarray:
+    """0=LAUNCH (<=3), 1=TRENDING (<=14), 2=ESTABLISHED (<=30), 3=EVERGREEN."""
+    return np.digitize(days, COHORT_LIMITS, right=True)
+
+def score_columns(velocity: np.ndarray, ratio: np.ndarray, clusters: np.ndarray, cohorts: np.ndarray):
+    """
+    Gleiche Formeln wie das alte Dict-Scoring, nur im Batch:
+    Bucket = Cluster x Kohorte, Benchmark = Bucket-Mittel der Velocity,
+    Score = 18 * log2(1 + velocity * norm * 5), gedeckelt auf 100.
+    Gibt (ungerundeten Score, ungerundeten Viral-Faktor, Bucket-Codes) zurück.
+    """
+    n = len(velocity)
+    n_buckets = len(CLUSTERS) * len(COHORTS)
+    buckets = clusters * len(COHORTS) + cohorts
+
+    counts = np.bincount(buckets, minlength=n_buckets)
+    sums = np.bincount(buckets, weights=velocity, minlength=n_buckets)
+    means = sums / np.maximum(counts, 1)
+
+    benchmark = np.maximum(means[buckets], 0.05)
+    norm_factor = np.where(counts[buckets] >= 3, 2.0 / benchmark, CLUSTER_FALLBACK[clusters])
+    norm_factor = np.minimum(norm_factor, 10.0)
+
+    adjusted = velocity * norm_factor * 5
+    with np.errstate(invalid="ignore"):
+        raw_score = np.where(adjusted > 0, np.minimum(18 * np.log2(1 + np.maximum(adjusted, 0)), 100), 0.0)
+
+    # cumsum statt np.sum: gleiche Summierreihenfolge wie das alte sum()
+    global_ratio_avg = np.cumsum(ratio)[-1] / n if n else 1.0
+    if global_ratio_avg < 0.1: global_ratio_avg = 0.1
+    viral_factor = ratio / global_ratio_avg
+
+    return raw_score, viral_factor, buckets
+
+def score_ads(ads: list, sort: bool = True) -> list:
+    """
+    Bewertet eine Liste normalisierter Ads (schreibt efficiency_score, viral_factor, _bucket).
+    Reicht auch zum Neu-Bewerten gecachter Ads, ohne neu zu scrapen.
+    """
+    if not ads: return ads
+
+    cols = extract_columns(ads)
+    cohorts = cohort_codes(cols["days"])
+    raw_score, viral_factor, buckets = score_columns(cols["velocity"], cols["ratio"], cols["clusters"], cohorts)
+
+    bucket_names = [f"{c}_{t}" for c in CLUSTERS for t in COHORTS]
+    # Runden mit Python-round(), damit die Werte exakt den bisherigen entsprechen
+    for ad, score, factor, bucket in zip(ads, raw_score.tolist(), viral_factor.tolist(), buckets.tolist()):
+        ad['_bucket'] = bucket_names[bucket]
+        ad['efficiency_score'] = round(score, 1) if score > 0 else 0
+        ad['viral_factor'] = round(factor, 1)
+
+    if sort:
+        ads.sort(key=lambda x: (x.get('efficiency_score') or 0), reverse=True)
+    return ads
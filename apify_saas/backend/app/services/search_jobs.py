@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+import uuid
+from app.core.config import settings
+from app.models.api_requests import SearchRequest
+from app.services.search_service import run_search_pools, merge_pools, paid_pools, search_usage, search_branches
+from app.services.admission import AdmissionRejected, PRIORITY_FREE, scrape_priority, scrape_owner, scrape_queue
+
+# Hinweis: Die Registry lebt pro Worker-Prozess. Bei mehreren uvicorn-Workern
+# muss der Load Balancer Job-Anfragen an denselben Worker schicken (Sticky Sessions).
+
+class SearchJob:
+    """Eine laufende oder fertige Suche inkl. Event-Log für Polling und SSE."""
+
+    def __init__(self, user_id: str, request: SearchRequest, hold=None, priority: int = PRIORITY_FREE):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.request = request
+        self.priority = priority
+        # Reservierte Credits (CreditHold), werden am Ende abgerechnet oder zurückgebucht
+        self.hold = hold
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.results = []
+        self.error = None
+        self.freshness = {}
+        self.events = []
+        self._seen_ids = set()
+        # Bezahlt sind `limit` Ads pro Zweig, mehr wird auch live nicht gestreamt
+        self.max_items = request.limit * search_branches(request)
+        self._changed = asyncio.Condition()
+
+    # --- EVENTS ---
+
+    def _emit(self, event: str, data: dict):
+        self.events.append((event, data))
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    def publish_items(self, items: list):
+        """Neue normalisierte Ads an alle Zuhörer schicken (Duplikate werden verworfen, höchstens max_items)."""
+        fresh = []
+        for ad in items:
+            if len(self._seen_ids) >= self.max_items: break
+            ad_id = ad.get('id')
+            if ad_id in self._seen_ids: continue
+            self._seen_ids.add(ad_id)
+            fresh.append(dict(ad))
+        if fresh:
+            self._emit("ads", {"items": fresh, "streamed": len(self._seen_ids)})
+
+    def set_status(self, status: str, **extra):
+        self.status = status
+        self._emit("status", {"status": status, **extra})
+
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "query": self.request.keyword,
+            "platform": self.request.platform,
+            "country": self.request.country,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "count": len(self.results) if self.status == "done" else len(self._seen_ids),
+            "error": self.error,
+            "freshness": self.freshness,
+            # Wartet der Job auf einen Scrape-Slot: Position in der Queue (1 = als Nächstes), sonst None
+            "queue_position": scrape_queue.position(self.id) if self.status == "running" else None,
+        }
+
+    async def stream(self, last_event_id: int = -1):
+        """Server-Sent Events ab `last_event_id` (Reconnect setzt dort fort)."""
+        index = last_event_id + 1
+        while True:
+            while index < len(self.events):
+                event, data = self.events[index]
+                yield f"id: {index}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                index += 1
+            if self.is_finished():
+                return
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: len(self.events) > index),
+                        timeout=settings.SEARCH_JOBS_SSE_PING_SECS
+                    )
+                except asyncio.TimeoutError:
+                    # Kommentar-Zeile hält Proxies/Load Balancer bei langen Scrapes offen
+                    yield ": ping\n\n"
+
+class JobRegistry:
+    """Asyncio-Registry für Such-Jobs mit begrenzter Parallelität."""
+
+    def __init__(self, max_concurrent: int, ttl_secs: int, max_jobs: int):
+        self.ttl_secs = ttl_secs
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._tasks = set()
+        self._slots = None
+        self._max_concurrent = max_concurrent
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Lazy, damit das Semaphore am laufenden Event Loop hängt
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_concurrent)
+        return self._slots
+
+    def _cleanup(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.is_finished() and now - (job.finished_at or now) > self.ttl_secs:
+                del self._jobs[job_id]
+
+    def submit(self, user_id: str, request: SearchRequest, hold=None, priority: int = PRIORITY_FREE) -> SearchJob:
+        self._cleanup()
+        if len(self._jobs) >= self.max_jobs:
+            raise RuntimeError("Too many search jobs, please retry later")
+        job = SearchJob(user_id, request, hold=hold, priority=priority)
+        self._jobs[job.id] = job
+        job.set_status("queued")
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: SearchJob):
+        # Gilt für alle Scrapes dieses Jobs (Priorität nach Plan, Queue-Position über die Job-ID)
+        scrape_priority.set(job.priority)
+        scrape_owner.set(job.id)
+        async with self._semaphore():
+            job.started_at = time.time()
+            job.set_status("running")
+            try:
+                pools, job.freshness, _ = await run_search_pools(job.request, on_items=job.publish_items)
+                # Wie die synchrone Suche: pro Zweig nur die bezahlten `limit` Ads, abgerechnet wird das Gelieferte
+                results = merge_pools(paid_pools(job.request, pools))
+                # Cache-Treffer / gekoppelte Scrapes liefern alles erst am Ende
+                job.publish_items(results)
+                job.results = results
+                job.finished_at = time.time()
+                if job.hold:
+                    credits_used = search_usage(job.request, pools)
+                    if credits_used: await job.hold.settle(used=credits_used)
+                    else: await job.hold.release()
+                job.set_status("done", count=len(results), freshness=job.freshness, scores=[
+                    {"id": ad.get('id'), "efficiency_score": ad.get('efficiency_score'), "viral_factor": ad.get('viral_factor')}
+                    for ad in results
+                ])
+            except Exception as e:
+                print(f"❌ Job {job.id} Error: {e}")
+                job.error = str(e)
+                job.finished_at = time.time()
+                if job.hold: await job.hold.release()
+                # Scrape-Queue voll: Client kann nach retry_after Sekunden neu starten
+                extra = {"retry_after": e.retry_after} if isinstance(e, AdmissionRejected) else {}
+                job.set_status("failed", error=job.error, **extra)
+
+search_jobs = JobRegistry(
+    max_concurrent=settings.SEARCH_JOBS_MAX_CONCURRENT,
+    ttl_secs=settings.SEARCH_JOBS_TTL_SECS,
+    max_jobs=settings.SEARCH_JOBS_MAX_JOBS,
+)
@@ -0,0 +1,179 @@
+import asyncio
+from app.core.config import settings
+from app.models.api_requests import SearchRequest
+from app.services import apify_meta, apify_tiktok
+from app.services.cache_service import make_search_key, cached_search
+from app.services.admission import scrape_queue
+
+def _cache_parameters(cache_key: str, request: SearchRequest, country: str, **extra) -> dict:
+    """Parameter, die zusammen mit dem Cache-Eintrag in Supabase landen."""
+    return {
+        "cache_key": cache_key,
+        "country": country,
+        "active_status": request.active_status,
+        "start_date_min": request.start_date_min,
+        "start_date_max": request.start_date_max,
+        "limit": request.limit,
+        **extra,
+    }
+
+def request_countries(request: SearchRequest) -> list:
+    """Länder der Suche: `countries` oder kommagetrennt in `country` ("US,DE"). Reihenfolge bleibt erhalten."""
+    raw = request.countries or (request.country or "US").split(",")
+    countries = []
+    for code in raw:
+        code = code.strip().upper()
+        if code and code not in countries: countries.append(code)
+    if len(countries) > settings.FANOUT_MAX_COUNTRIES:
+        raise ValueError(f"Too many countries (max {settings.FANOUT_MAX_COUNTRIES})")
+    return countries or ["US"]
+
+def search_branches(request: SearchRequest) -> int:
+    """Zweige einer Suche (Meta pro Land, TikTok einmal) = mögliche Actor-Runs."""
+    branches = 0
+    if request.platform in ("meta", "both"): branches += len(request_countries(request))
+    if request.platform in ("tiktok", "both"): branches += 1
+    return branches
+
+def search_cost(request: SearchRequest) -> int:
+    """Credits pro Suche: limit pro Zweig."""
+    return request.limit * search_branches(request) * settings.SEARCH_CREDIT_COST_PER_AD
+
+def paid_ads(request: SearchRequest, pools: dict) -> int:
+    """Gelieferte Ads: pro Zweig höchstens limit (fehlgeschlagene Scrapes liefern [])."""
+    return sum(min(len(ads), request.limit) for ads in pools.values())
+
+def search_usage(request: SearchRequest, pools: dict) -> int:
+    """Tatsächlich verbrauchte Credits (search_cost ist die Reservierung vorab)."""
+    return paid_ads(request, pools) * settings.SEARCH_CREDIT_COST_PER_AD
+
+def paid_pools(request: SearchRequest, pools: dict) -> dict:
+    """Pro Zweig nur die bezahlten `limit` besten Ads (Pools sind nach Score sortiert)."""
+    return {branch_id: ads[:request.limit] for branch_id, ads in pools.items()}
+
+# --- FAN-OUT ---
+
+def _limited(fetch):
+    # Prozessweites Limit für gleichzeitige Actor-Runs (über alle Requests hinweg), Reihenfolge nach Priorität
+    async def run(**kwargs):
+        async with scrape_queue.slot():
+            return await fetch(**kwargs)
+    return run
+
+def branch_platform(branch_id: str) -> str:
+    """'meta:DE' -> 'meta'"""
+    return branch_id.split(":", 1)[0]
+
+def search_specs(request: SearchRequest, on_items=None) -> dict:
+    """
+    Ein Zweig pro Plattform und Land: branch_id -> (cache_key, parameters, fetch).
+    `fetch()` scrapt ohne Cache, `fetch(cached=ads)` nur das Delta zum bisherigen Pool (Meta; TikTok ignoriert es).
+    Wird von run_search_pools und vom Prefetch-Scheduler benutzt.
+    """
+    specs = {}
+    countries = request_countries(request)
+    if request.platform == "meta" or request.platform == "both":
+        # Pool-Größe aus Limit + bisheriger Ausbeute; landet in den Parametern (Cache-Abdeckung)
+        pool_size, enough = apify_meta.plan_pool(request.limit)
+        for country in countries:
+            # Ohne Limit im Key: ob ein Pool für ein Limit reicht, prüft der Cache über pool_size/min_ads
+            meta_key = make_search_key(
+                "meta", request.keyword, country, request.active_status,
+                request.start_date_min, request.start_date_max
+            )
+            parameters = _cache_parameters(meta_key, request, country, pool_size=pool_size, min_ads=enough)
+            specs[f"meta:{country}"] = (meta_key, parameters, _limited(
+                lambda cached=None, country=country: apify_meta.search_meta_ads(
+                    query=request.keyword, # Hier nutzen wir jetzt .keyword
+                    country=country,
+                    start_date_min=request.start_date_min,
+                    start_date_max=request.start_date_max,
+                    active_status=request.active_status,
+                    limit=request.limit,
+                    on_items=on_items,
+                    cached=cached,
+                    pool_size=pool_size,
+                    enough=enough
+                )
+            ))
+    if request.platform == "tiktok" or request.platform == "both":
+        # Der TikTok-Actor kennt kein Land -> ein Zweig
+        tiktok_key = make_search_key("tiktok", request.keyword, countries[0], limit=request.limit)
+        specs["tiktok"] = (tiktok_key, _cache_parameters(tiktok_key, request, countries[0]), _limited(
+            lambda cached=None: apify_tiktok.search_tiktok_ads(
+                query=request.keyword, # Hier nutzen wir jetzt .keyword
+                limit=request.limit
+            )
+        ))
+    return specs
+
+def request_from_parameters(platform: str, keyword: str, parameters: dict) -> SearchRequest:
+    """Gegenstück zu _cache_parameters: baut die Suche aus einem Cache-Eintrag wieder auf."""
+    parameters = parameters or {}
+    return SearchRequest(
+        keyword=keyword,
+        platform=platform,
+        country=parameters.get("country") or "US",
+        active_status=parameters.get("active_status") or "active",
+        start_date_min=parameters.get("start_date_min"),
+        start_date_max=parameters.get("start_date_max"),
+        limit=parameters.get("limit") or 20,
+    )
+
+def merge_pools(pools: dict, platform: str = None) -> list:
+    """Zweige zusammenführen, gleiche Ad (ad_archive_id bzw. id) nur einmal - der erste Zweig gewinnt."""
+    merged, seen = [], set()
+    for branch_id, ads in pools.items():
+        if platform and branch_platform(branch_id) != platform: continue
+        for ad in ads:
+            ad_id = ad.get('id') or ad.get('ad_archive_id')
+            if ad_id is not None:
+                if ad_id in seen: continue
+                seen.add(ad_id)
+            merged.append(ad)
+    return merged
+
+async def run_search(request: SearchRequest, on_items=None):
+    """
+    Komplette Suche (Cache -> Scrape) für Meta und/oder TikTok.
+    `on_items` bekommt normalisierte Ads, sobald sie vorliegen (für Jobs/SSE).
+    Gibt (results, freshness) zurück, freshness pro Zweig: 'fresh' | 'stale' | 'live'.
+    """
+    pools, freshness, _ = await run_search_pools(request, on_items)
+    return merge_pools(pools), freshness
+
+async def run_search_pools(request: SearchRequest, on_items=None):
+    """
+    Alle Zweige (Plattform x Land) laufen parallel; die Wall-Clock-Zeit ist die des langsamsten Zweigs.
+    Gibt (pools, freshness, cache_keys) pro Zweig zurück, in fester Zweig-Reihenfolge.
+    Der Meta-Pool wird immer komplett bewertet und gecacht, geblättert wird danach nur noch im Cache.
+    """
+    specs = search_specs(request, on_items)
+
+    async def run_branch(branch_id: str, cache_key: str, parameters: dict, fetch):
+        # Erst L1/L2 Cache, nur bei Miss der teure Scrape
+        ads, freshness = await cached_search(
+            cache_key, branch_platform(branch_id), request.keyword, parameters=parameters, fetch=fetch
+        )
+        if branch_id.startswith("meta"):
+            # Tagging für Frontend
+            for ad in ads:
+                if not ad.get('platform'): ad['publisher_platform'] = ['facebook', 'instagram']
+        return branch_id, ads, freshness
+
+    tasks = [asyncio.ensure_future(run_branch(branch_id, *spec)) for branch_id, spec in specs.items()]
+    done = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            branch_id, ads, freshness = await next_done
+            done[branch_id] = (ads, freshness)
+            # Teilergebnisse sofort weiterreichen (Cache-Treffer streamen sonst erst am Ende)
+            if on_items and ads: on_items(ads)
+    except BaseException:
+        for task in tasks: task.cancel()
+        raise
+
+    pools = {branch_id: done[branch_id][0] for branch_id in specs}
+    freshness = {branch_id: done[branch_id][1] for branch_id in specs}
+    keys = {branch_id: spec[0] for branch_id, spec in specs.items()}
+    return pools, freshness, keys
@@ -0,0 +1,170 @@
+import asyncio
+import datetime
+import os
+import socket
+import time
+import uuid
+from postgrest.exceptions import APIError
+from app.core.config import settings
+from app.services.background_tasks import spawn
+from app.services.supabase_service import get_supabase
+
+# --- LOCK BACKENDS ---
+
+class LocalLockBackend:
+    """Nur In-Prozess: das Zusammenlegen passiert schon über die Futures im SingleFlight."""
+
+    async def acquire(self, key: str, ttl_secs: int) -> bool:
+        return True
+
+    async def release(self, key: str):
+        pass
+
+class SupabaseLeaseBackend:
+    """
+    Lease-Zeile in `scrape_leases` (siehe migrations/001_scrape_leases.sql).
+    Wer die Zeile einfügen kann, scrapt - alle anderen Worker warten auf den Cache.
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _acquire_sync(self, key: str, ttl_secs: int) -> bool:
+        supabase = get_supabase()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            # Abgelaufene Leases (z.B. abgestürzter Worker) zuerst wegräumen
+            supabase.table("scrape_leases").delete().eq("key", key).lt("expires_at", now.isoformat()).execute()
+            supabase.table("scrape_leases").insert({
+                "key": key,
+                "owner": self.owner,
+                "expires_at": (now + datetime.timedelta(seconds=ttl_secs)).isoformat()
+            }).execute()
+            return True
+        except APIError as e:
+            if e.code == "23505":  # unique_violation -> jemand anderes scrapt gerade
+                return False
+            print(f"⚠️ Lease Error (fail-open): {e}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Lease Error (fail-open): {e}")
+            return True
+
+    def _release_sync(self, key: str):
+        try:
+            get_supabase().table("scrape_leases").delete().eq("key", key).eq("owner", self.owner).execute()
+        except Exception as e:
+            print(f"⚠️ Lease Release Error: {e}")
+
+    async def acquire(self, key: str, ttl_secs: int) -> bool:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: self._acquire_sync(key, ttl_secs))
+
+    async def release(self, key: str):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, lambda: self._release_sync(key))
+
+LOCK_BACKENDS = {
+    "local": LocalLockBackend,
+    "supabase": SupabaseLeaseBackend,
+}
+
+# --- SINGLE FLIGHT ---
+
+class SingleFlight:
+    """
+    Gleiche Anfragen, die gleichzeitig laufen, teilen sich EINEN Scrape.
+    Der Scrape läuft als eigener Task, damit ein abgebrochener Request
+    die wartenden anderen Requests nicht mitreißt.
+    """
+
+    def __init__(self, backend, lease_ttl_secs: int, poll_interval_secs: float):
+        self.backend = backend
+        self.lease_ttl_secs = lease_ttl_secs
+        self.poll_interval_secs = poll_interval_secs
+        self._inflight = {}
+        self._pending_writes = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn, poll=None):
+        """
+        `fn` startet die eigentliche Arbeit, `poll` (optional) schaut nach,
+        ob ein anderer Worker das Ergebnis schon in den Cache geschrieben hat.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(self._run(key, fn, poll))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            print(f"🔗 Coalesced: warte auf laufenden Scrape für '{key}'")
+        return await asyncio.shield(task)
+
+    def hold_lease(self, key: str, write: asyncio.Future):
+        """Lease erst freigeben, wenn `write` (z.B. der L2-Write im Hintergrund) fertig ist."""
+        self._pending_writes[key] = write
+
+    def is_inflight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def _forget(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Exception abholen, auch wenn niemand mehr wartet (sonst Warnung im Log)
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, key: str, fn, poll):
+        deadline = time.monotonic() + self.lease_ttl_secs
+        waited = False
+        while True:
+            if await self.backend.acquire(key, self.lease_ttl_secs):
+                try:
+                    # Lease gerade von einem anderen Worker übernommen: sein Ergebnis liegt meist schon in L2
+                    if waited and poll:
+                        result = await poll()
+                        if result:
+                            return result
+                    return await fn()
+                finally:
+                    await self._release(key)
+
+            # Ein anderer Worker hält die Lease -> auf sein Ergebnis warten
+            waited = True
+            if poll:
+                result = await poll()
+                if result:
+                    return result
+            if time.monotonic() > deadline:
+                print(f"⚠️ Lease für '{key}' abgelaufen, scrape selbst.")
+                try:
+                    return await fn()
+                finally:
+                    self._pending_writes.pop(key, None)
+            await asyncio.sleep(self.poll_interval_secs)
+
+    async def _release(self, key: str):
+        write = self._pending_writes.pop(key, None)
+        if write is None or write.done():
+            await self.backend.release(key)
+            return
+
+        async def release_after_write():
+            # Wartende Worker pollen L2; gäben wir die Lease vor dem Write frei, scrapte der nächste nochmal
+            try:
+                await asyncio.wait([write])
+            finally:
+                await self.backend.release(key)
+        spawn(release_after_write(), name=f"lease:{key}")
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
+
+scrape_flight = SingleFlight(
+    LOCK_BACKENDS[settings.SCRAPE_LOCK_BACKEND](),
+    lease_ttl_secs=settings.SCRAPE_LEASE_TTL_SECS,
+    poll_interval_secs=settings.SCRAPE_LEASE_POLL_SECS,
+)
@@ -1,54 +1,134 @@
 import datetime
-from supabase import create_client, Client
+import hashlib
+import json
+import threading
+import httpx
+from postgrest.exceptions import APIError
+from supabase import create_client, Client, ClientOptions
 from app.core.config import settings
+from app.services.metrics import span
+from app.services.ad_codec import encode_pool, decode_pool, project_ad, payload_enabled
+
+# --- CLIENTS (einmal pro Prozess, Keep-Alive + HTTP/2) ---
+
+_lock = threading.Lock()
+_http = None
+_client = None
+_auth_client = None
+
+def _http_options() -> dict:
+    return {
+        "http2": True,
+        "follow_redirects": True,
+        "timeout": settings.SUPABASE_TIMEOUT_SECS,
+        "limits": httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    }
+
+def _create_client(http: httpx.Client) -> Client:
+    # Keine Session im Client halten: der Client wird von allen Requests geteilt
+    options = ClientOptions(httpx_client=http, persist_session=False, auto_refresh_token=False)
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY, options)
 
 def get_supabase() -> Client:
-    url = settings.SUPABASE_URL
-    key = settings.SUPABASE_KEY
-    return create_client(url, key)
+    """Prozessweiter Daten-Client statt neuem Client (und neuer TLS-Session) pro Aufruf."""
+    global _http, _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _http = _http or httpx.Client(**_http_options())
+                _client = _create_client(_http)
+    return _client
+
+def get_supabase_auth() -> Client:
+    """
+    Eigener Client nur für sign_up/sign_in.
+    Ein Login setzt das User-Token im Client - das darf nie im Daten-Client landen.
+    """
+    global _http, _auth_client
+    if _auth_client is None:
+        with _lock:
+            if _auth_client is None:
+                _http = _http or httpx.Client(**_http_options())
+                _auth_client = _create_client(_http)
+    return _auth_client
+
+async def init_supabase():
+    # Alle Queries laufen über den Sync-Client im Executor -> nur diesen vorab aufbauen
+    get_supabase()
+    print("🔌 Supabase Client bereit.")
+
+async def close_supabase():
+    global _http, _client, _auth_client
+    with _lock:
+        if _http is not None:
+            _http.close()
+        _http, _client, _auth_client = None, None, None
+
+# --- FASTAPI DEPENDENCIES ---
+
+def supabase_client() -> Client:
+    return get_supabase()
+
+def supabase_auth_client() -> Client:
+    return get_supabase_auth()
 
 # --- USER & CREDITS ---
 
-def check_user_credits(user_id: str, required_credits: int) -> bool:
+def adjust_credits(user_id: str, delta: int):
+    """
+    Ändert den Kontostand atomar um `delta` (negativ = abbuchen).
+    Gibt den neuen Stand zurück, oder None wenn das Guthaben nicht reicht.
+    """
     supabase = get_supabase()
     try:
-        response = supabase.table("profiles").select("credits").eq("id", user_id).maybe_single().execute()
-        # FIX: Prüfen, ob response existiert, bevor wir .data lesen
-        if response and hasattr(response, 'data') and response.data:
-            return response.data.get('credits', 0) >= required_credits
-    except Exception as e:
-        print(f"⚠️ Credit Check Error: {e}")
-    return False
+        response = supabase.rpc("adjust_credits", {"p_user_id": user_id, "p_delta": delta}).execute()
+        return response.data
+    except APIError as e:
+        # PGRST202 = Funktion fehlt (migrations/002_credits.sql noch nicht eingespielt)
+        if e.code != "PGRST202": raise
 
-def deduct_credits(user_id: str, amount: int):
-    supabase = get_supabase()
-    try:
+    # Fallback: bedingtes Update (Compare-and-Swap auf den gelesenen Stand)
+    for _ in range(5):
         response = supabase.table("profiles").select("credits").eq("id", user_id).maybe_single().execute()
-        if response and hasattr(response, 'data') and response.data:
-            current = response.data.get('credits', 0)
-            new_balance = max(0, current - amount)
-            supabase.table("profiles").update({"credits": new_balance}).eq("id", user_id).execute()
-            
-            try:
-                supabase.table("credit_ledger").insert({
-                    "user_id": user_id, 
-                    "amount": -amount, 
-                    "description": "Search API Usage"
-                }).execute()
-            except:
-                pass
-    except Exception as e:
-        print(f"⚠️ Deduct Error: {e}")
+        if not response or not response.data:
+            return None
+        current = response.data.get('credits', 0) or 0
+        if current + delta < 0:
+            return None
+        updated = supabase.table("profiles").update({"credits": current + delta})\
+            .eq("id", user_id).eq("credits", current).execute()
+        if updated.data:
+            return current + delta
+    raise RuntimeError("Credit update conflict, please retry")
+
+def insert_ledger_entries(rows: list):
+    """Bulk-Insert für gepufferte credit_ledger-Einträge."""
+    if not rows: return
+    get_supabase().table("credit_ledger").insert(rows).execute()
 
 # --- SEARCH CACHE ---
 
-def get_cached_results(platform: str, keyword: str):
+def get_cache_windows(platform: str):
+    """(fresh, stale) in Sekunden. Stale = zusätzliche Zeit NACH Ablauf des Fresh-Fensters."""
+    fresh_hours = settings.CACHE_FRESH_HOURS.get(platform, settings.CACHE_FRESH_HOURS.get("default", 24))
+    stale_hours = settings.CACHE_STALE_HOURS.get(platform, settings.CACHE_STALE_HOURS.get("default", 0))
+    return fresh_hours * 3600, stale_hours * 3600
+
+def get_cached_entry(platform: str, keyword: str, cache_key: str = None, max_age_secs: float = None):
+    """Neuester Cache-Eintrag inkl. Zeitstempel (oder None, wenn älter als max_age_secs)."""
     supabase = get_supabase()
     try:
-        response = supabase.table("search_cache")\
-            .select("id, last_updated")\
+        query = supabase.table("search_cache")\
+            .select("id, last_updated, parameters")\
             .eq("platform", platform)\
-            .eq("query", keyword)\
+            .eq("query", keyword)
+        # Voller Such-Key (Land, Status, Zeitraum, Limit) statt nur Keyword
+        if cache_key:
+            query = query.eq("parameters->>cache_key", cache_key)
+        response = query\
             .order("last_updated", desc=True)\
             .limit(1)\
             .execute()
@@ -62,36 +142,175 @@ def get_cached_results(platform: str, keyword: str):
         last_updated_str = cache_entry['last_updated'].replace('Z', '+00:00')
         last_updated = datetime.datetime.fromisoformat(last_updated_str)
         
-        if (datetime.datetime.now(datetime.timezone.utc) - last_updated).days >= 1:
-            return None
+        if max_age_secs is not None:
+            if datetime.datetime.now(datetime.timezone.utc) - last_updated >= datetime.timedelta(seconds=max_age_secs):
+                return None
 
         print(f"✅ Cache HIT für {keyword}")
         
-        # Ergebnisse laden
-        ads_res = supabase.table("ad_results").select("data").eq("search_ref", cache_entry['id']).execute()
-        if ads_res and ads_res.data:
-            return [row['data'] for row in ads_res.data]
+        # Ergebnisse laden: kompakter Blob (eine Zeile), sonst wie früher alle ad_results-Zeilen
+        ads = _load_payload(supabase, cache_entry['id'])
+        if ads is None:
+            ads_res = supabase.table("ad_results").select("data").eq("search_ref", cache_entry['id']).execute()
+            ads = [row['data'] for row in ads_res.data] if ads_res and ads_res.data else None
+        if ads:
+            return {
+                "search_id": cache_entry['id'],
+                "last_updated": last_updated,
+                "parameters": cache_entry.get('parameters') or {},
+                "ads": ads
+            }
             
     except Exception as e:
         print(f"⚠️ Cache Error: {e}")
         
     return None
 
-def save_search_results(platform: str, keyword: str, results: list):
+# False, sobald klar ist, dass search_cache.payload fehlt (migrations/004_cache_payload.sql nicht eingespielt)
+_payload_column = True
+
+def _load_payload(supabase: Client, search_id):
+    """Pool aus search_cache.payload, oder None (kein Payload / alte Zeile / unbekanntes Format)."""
+    global _payload_column
+    if not (_payload_column and payload_enabled()): return None
+    try:
+        res = supabase.table("search_cache").select("payload").eq("id", search_id).maybe_single().execute()
+    except APIError as e:
+        # 42703 = Spalte existiert nicht
+        if e.code != "42703": raise
+        _payload_column = False
+        print("⚠️ search_cache.payload fehlt, Cache wird aus ad_results gelesen.")
+        return None
+    payload = res.data.get("payload") if res and res.data else None
+    if not payload: return None
+    try:
+        with span("cache_decode"):
+            return decode_pool(payload)
+    except ValueError as e:
+        print(f"⚠️ Cache-Payload nicht lesbar ({e}), Fallback auf ad_results.")
+        return None
+
+def get_cached_results(platform: str, keyword: str, cache_key: str = None):
+    """Nur frische Ergebnisse (innerhalb des Fresh-Fensters der Plattform)."""
+    fresh_secs, _ = get_cache_windows(platform)
+    entry = get_cached_entry(platform, keyword, cache_key, max_age_secs=fresh_secs)
+    return entry["ads"] if entry else None
+
+def get_recent_searches(since_hours: float, limit: int = 1000) -> list:
+    """Veröffentlichte search_cache-Einträge der letzten Stunden (neueste zuerst)."""
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=since_hours)
+    response = get_supabase().table("search_cache")\
+        .select("platform, query, parameters, last_updated")\
+        .gte("last_updated", since.isoformat())\
+        .order("last_updated", desc=True)\
+        .limit(limit)\
+        .execute()
+    return response.data if response and response.data else []
+
+def search_ads_index(query: str, filters: dict = None, limit: int = 20, offset: int = 0):
+    """
+    Volltext-Suche über alle gespeicherten Ads (migrations/003_ad_search_index.sql).
+    {"items", "total", "facets"} oder None, wenn die Funktionen noch nicht eingespielt sind.
+    """
+    filters = filters or {}
+    supabase = get_supabase()
+    try:
+        hits = supabase.rpc("search_ads", {
+            "p_query": query, "p_platform": filters.get("platform"), "p_cluster": filters.get("cluster"),
+            "p_cohort": filters.get("cohort"), "p_country": filters.get("country"),
+            "p_limit": limit, "p_offset": offset,
+        }).execute()
+        facet_rows = supabase.rpc("search_ads_facets", {"p_query": query, "p_platform": filters.get("platform")}).execute()
+    except APIError as e:
+        if e.code != "PGRST202": raise
+        return None
+
+    rows = hits.data or []
+    facets = {"cluster": {}, "cohort": {}, "country": {}, "platform": {}}
+    for row in facet_rows.data or []:
+        facets.setdefault(row["facet"], {})[row["value"]] = row["hits"]
+    return {"items": [row["data"] for row in rows], "total": rows[0]["total"] if rows else 0, "facets": facets}
+
+# Platzhalter-Zeitstempel: Der Cache-Eintrag gilt als abgelaufen, bis alle Ads geschrieben sind
+UNPUBLISHED_TIMESTAMP = "1970-01-01T00:00:00+00:00"
+
+def _creative_url(ad: dict) -> str:
+    snapshot = ad.get("snapshot") or {}
+    for name, field in (("videos", "video_hd_url"), ("videos", "video_sd_url"), ("images", "original_image_url"),
+                        ("images", "resized_image_url"), ("cards", "original_image_url")):
+        for media in snapshot.get(name) or []:
+            if isinstance(media, dict) and media.get(field):
+                return media[field]
+    return ad.get("webVideoUrl") or ad.get("videoUrl") or ""
+
+def stable_ad_id(ad: dict) -> str:
+    """
+    Fallback-ID aus den Identitätsfeldern (Page/Autor, Creative, Text, Starttag).
+    Metriken wie days_active, Scores oder Play-Counts ändern sich zwischen Scrapes und zählen nicht mit.
+    """
+    snapshot = ad.get("snapshot") or {}
+    author = ad.get("authorMeta") or {}
+    body = snapshot.get("body")
+    identity = [
+        ad.get("page_id") or author.get("id") or ad.get("page_profile_uri") or ad.get("page_name") or author.get("name"),
+        # Signierte CDN-Parameter (?oh=..&oe=..) wechseln pro Scrape
+        _creative_url(ad).split("?", 1)[0],
+        (body.get("text") if isinstance(body, dict) else body) or ad.get("text") or ad.get("desc"),
+        ad.get("start_date") or ad.get("createTime"),
+    ]
+    payload = json.dumps(identity, default=str, separators=(",", ":"))
+    return f"gen_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]}"
+
+def build_ad_rows(platform: str, search_id, results: list) -> list:
+    """Eine Zeile pro (platform, platform_id) - Duplikate im Pool werden vorher verworfen."""
+    rows = {}
+    for ad in results:
+        raw_id = ad.get('id') or ad.get('ad_archive_id') or ad.get('item_id')
+        pid = str(raw_id) if raw_id else stable_ad_id(ad)
+        if pid in rows: continue
+        rows[pid] = {
+            "platform": platform,
+            "platform_id": pid,
+            "search_ref": search_id,
+            "data": project_ad(ad)
+        }
+    return list(rows.values())
+
+def _insert_search_entry(supabase: Client, search_entry: dict, results: list):
+    """search_cache-Zeile inkl. kompaktem Payload; ohne payload-Spalte wie bisher."""
+    global _payload_column
+    if _payload_column and payload_enabled():
+        try:
+            with span("cache_encode"):
+                payload = encode_pool(results)
+            return supabase.table("search_cache").insert({**search_entry, "payload": payload}).execute()
+        except APIError as e:
+            # PGRST204 = Spalte nicht im Schema-Cache
+            if e.code not in ("PGRST204", "42703"): raise
+            _payload_column = False
+            print("⚠️ search_cache.payload fehlt, Cache-Eintrag wird ohne Payload geschrieben.")
+    return supabase.table("search_cache").insert(search_entry).execute()
+
+def save_search_results(platform: str, keyword: str, results: list, parameters: dict = None):
     if not results: return
+    with span("db_save"):
+        _save_search_results(platform, keyword, results, parameters)
+
+def _save_search_results(platform: str, keyword: str, results: list, parameters: dict = None):
     supabase = get_supabase()
     
     print(f"💾 Speichere {len(results)} Ergebnisse in DB...")
     
+    search_id = None
     try:
-        # 1. Cache Eintrag
+        # 1. Cache Eintrag (erst unsichtbar, siehe UNPUBLISHED_TIMESTAMP)
         search_entry = {
             "platform": platform, 
             "query": keyword, 
-            "parameters": {}, 
-            "last_updated": datetime.datetime.now(datetime.timezone.utc).isoformat()
+            "parameters": parameters or {}, 
+            "last_updated": UNPUBLISHED_TIMESTAMP
         }
-        res = supabase.table("search_cache").insert(search_entry).execute()
+        res = _insert_search_entry(supabase, search_entry, results)
         
         # FIX: Prüfen auf NoneType bevor wir weitermachen!
         if not res or not hasattr(res, 'data') or not res.data:
@@ -100,35 +319,41 @@ def save_search_results(platform: str, keyword: str, results: list):
         
         search_id = res.data[0]['id']
         
-        # 2. Ads speichern
-        ad_rows = []
-        for ad in results:
-            raw_id = ad.get('id') or ad.get('ad_archive_id') or ad.get('item_id')
-            pid = str(raw_id) if raw_id else f"gen_{datetime.datetime.now().timestamp()}_{results.index(ad)}"
-            
-            ad_rows.append({
-                "platform": platform,
-                "platform_id": pid,
-                "search_ref": search_id,
-                "data": ad
-            })
-        
-        if ad_rows:
-            supabase.table("ad_results").upsert(ad_rows, on_conflict="platform, platform_id").execute()
-            print("✅ Speichern erfolgreich.")
+        # 2. Ads in Batches speichern (kein unbegrenzter Upsert mehr)
+        ad_rows = build_ad_rows(platform, search_id, results)
+        batch_size = max(1, settings.DB_UPSERT_BATCH_SIZE)
+        for start in range(0, len(ad_rows), batch_size):
+            supabase.table("ad_results").upsert(ad_rows[start:start + batch_size], on_conflict="platform, platform_id").execute()
+
+        # 3. Erst jetzt sichtbar machen -> Leser sehen nie einen halb geschriebenen Cache
+        supabase.table("search_cache").update({
+            "last_updated": datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }).eq("id", search_id).execute()
+        print(f"✅ Speichern erfolgreich ({len(ad_rows)} Ads).")
             
     except Exception as e:
         print(f"❌ DB Save Error (Ignoriert): {e}")
         # Wir fangen den Fehler ab, damit das Programm NICHT abstürzt.
         # Der User sieht die Ergebnisse trotzdem!
+        if search_id is not None:
+            _drop_unpublished_entry(supabase, search_id)
+
+def _drop_unpublished_entry(supabase: Client, search_id):
+    """Halb geschriebenen Cache-Eintrag (noch UNPUBLISHED_TIMESTAMP) wieder entfernen."""
+    try:
+        supabase.table("search_cache").delete().eq("id", search_id).eq("last_updated", UNPUBLISHED_TIMESTAMP).execute()
+    except Exception as e:
+        print(f"⚠️ Unveröffentlichter Cache-Eintrag {search_id} bleibt liegen: {e}")
 
 # --- PROFIL ---
 
-def get_user_profile_data(user_id: str):
-    supabase = get_supabase()
+def get_user_profile_data(user_id: str, supabase: Client = None, profile: dict = None):
+    """Profil + gespeicherte Ads. `profile` = bereits geladene profiles-Zeile (z.B. aus dem Cache)."""
+    supabase = supabase or get_supabase()
     try:
-        p_res = supabase.table("profiles").select("*").eq("id", user_id).maybe_single().execute()
-        profile = p_res.data if p_res and p_res.data else {}
+        if profile is None:
+            p_res = supabase.table("profiles").select("*").eq("id", user_id).maybe_single().execute()
+            profile = p_res.data if p_res and p_res.data else {}
         
         s_res = supabase.table("saved_ads").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
         saved_ads = []
@@ -151,10 +376,10 @@ def get_user_profile_data(user_id: str):
         # Fallback Profil statt Absturz
         return {"id": user_id, "credits": 0, "savedAds": [], "searchHistory": []}
 
-def add_saved_ad(user_id: str, ad_data: dict, ad_type: str):
-    supabase = get_supabase()
+def add_saved_ad(user_id: str, ad_data: dict, ad_type: str, supabase: Client = None):
+    supabase = supabase or get_supabase()
     return supabase.table("saved_ads").insert({"user_id": user_id, "type": ad_type, "data": ad_data}).execute()
 
-def delete_saved_ad(user_id: str, ad_id: str):
-    supabase = get_supabase()
+def delete_saved_ad(user_id: str, ad_id: str, supabase: Client = None):
+    supabase = supabase or get_supabase()
     return supabase.table("saved_ads").delete().eq("id", ad_id).eq("user_id", user_id).execute()
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Micro-Benchmark: normalize_meta_ad (kompilierter Extraktionsplan) gegen den alten Stand.
+
+Aufruf aus dem backend/ Ordner:
+    python -m benchmarks.bench_normalize [--repeat 50]
+"""
+import argparse
+import copy
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import load_meta_fixture
+from benchmarks import legacy_normalize
+from app.services import meta_extract
+
+# Zeitabhängige Felder (now() pro Aufruf) werden nur ungefähr verglichen
+TIME_FIELDS = {"days_active", "viral_velocity"}
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    for key in a:
+        if key in TIME_FIELDS:
+            if not math.isclose(a[key], b[key], rel_tol=1e-3): return False
+        elif a[key] != b.get(key):
+            return False
+    return set(a) == set(b)
+
+def with_detail_fields(items: list) -> list:
+    """
+    Die Notebook-Daten wurden ohne scrapeAdDetails aufgenommen. Für den realistischen Fall
+    ergänzen wir synthetisch die Detail-Blöcke (advertiser / aaa_info), die der Live-Actor liefert.
+    """
+    enriched = []
+    for i, item in enumerate(items):
+        item = copy.deepcopy(item)
+        item["advertiser"] = {
+            "ad_library_page_info": {"page_info": {
+                "page_alias": f"page{i}", "likes": 1000 + i * 37, "ig_username": f"ig{i}",
+                "ig_followers": 500 + i * 11, "page_category": "Shopping & retail"
+            }},
+            "page": {"about": {"text": "About this page"}}
+        }
+        item["aaa_info"] = {
+            "eu_total_reach": (i * 977) % 50000,
+            "location_audience": [{"name": "Germany", "type": "countries"}],
+            "payer_beneficiary_data": [{"payer": "Payer GmbH", "beneficiary": "Brand"}],
+            "age_country_gender_reach_breakdown": [{"country": "DE", "age_gender_breakdowns": []}]
+        }
+        enriched.append(item)
+    return enriched
+
+def time_it(fn, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    raw_items = load_meta_fixture()
+    print(f"📦 {len(raw_items)} Meta-Items aus dem Notebook geladen.")
+
+    for label, items in [("Notebook-Rohdaten", raw_items), ("mit Detail-Feldern", with_detail_fields(raw_items))]:
+        mismatches = sum(
+            1 for item in items
+            if not _same(legacy_normalize.normalize_meta_ad(item), meta_extract.normalize_meta_ad(item))
+        )
+        legacy = time_it(legacy_normalize.normalize_meta_ad, items, args.repeat)
+        compiled = time_it(meta_extract.normalize_meta_ad, items, args.repeat)
+
+        per_item = lambda secs: secs / len(items) * 1e6
+        print(f"\n--- {label} (Abweichungen: {mismatches}) ---")
+        print(f"   legacy   : {per_item(legacy):7.2f} µs/Item")
+        print(f"   compiled : {per_item(compiled):7.2f} µs/Item  (x{legacy / compiled:.2f})")
+
+if __name__ == "__main__":
+    main()
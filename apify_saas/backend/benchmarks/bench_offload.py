@@ -0,0 +1,139 @@
+"""
+Event-Loop-Stall-Benchmark der Normalisierung im echten Seitenfluss (stream_meta_ads) plus Scoring.
+
+Ein Ticker-Task schläft in 1-ms-Schritten und misst, wie lange er jeweils zu spät aufwacht,
+während ein Run mit N rohen Meta-Items (mit Detail-Feldern) normalisiert und bewertet wird:
+- `page`:  wie in stream_meta_ads, Seite für Seite à APIFY_DATASET_PAGE_SIZE Items, zwischen den Seiten
+           wartet der Stream auf den nächsten Dataset-Fetch (hier ein asyncio.sleep(0))
+- `batch`: der ganze Run am Stück (Obergrenze, falls je ein Run ohne Streaming normalisiert würde)
+- `pool`:  der ganze Run in einem Prozess-Pool (Pickling + IPC), nur zum Vergleich
+Der größte Stall ist die Zeit, in der kein anderer Request auf diesem Worker bedient wurde.
+`score_pickle_ms` = Pickle-Hin-und-Rückweg des bewerteten Pools (was ein Offload des Scorings mindestens kostete).
+
+Aufruf aus dem backend/ Ordner:
+    python -m benchmarks.bench_offload [--sizes 50,100,200,500,1000] [--repeat 5] [--out benchmarks/results/offload.json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("APIFY_TOKEN", "bench")
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from benchmarks.bench_normalize import with_detail_fields
+from benchmarks.bench_search import git_revision
+from benchmarks.fixtures import load_meta_fixture
+from app.core.config import settings
+from app.services.apify_meta import normalize_items
+from app.services.meta_extract import normalize_page
+from app.services.scoring import score_ads
+
+TICK_SECS = 0.001
+MODES = ("page", "batch", "pool")
+
+async def ticker(stalls: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECS)
+        stalls.append(max(time.perf_counter() - start - TICK_SECS, 0.0))
+
+async def normalize_run(items: list, mode: str, executor) -> list:
+    if mode == "pool":
+        return await asyncio.get_running_loop().run_in_executor(executor, normalize_page, items)
+    if mode == "batch":
+        return normalize_items(items, set())
+    ads, seen_ids, size = [], set(), settings.APIFY_DATASET_PAGE_SIZE
+    for i in range(0, len(items), size):
+        ads.extend(normalize_items(items[i:i + size], seen_ids))
+        await asyncio.sleep(0)  # nächster Dataset-Fetch
+    return ads
+
+async def measure(items: list, mode: str, executor) -> dict:
+    stalls, stop = [], asyncio.Event()
+    tick = asyncio.ensure_future(ticker(stalls, stop))
+    await asyncio.sleep(TICK_SECS * 5)
+    stalls.clear()
+
+    start = time.perf_counter()
+    ads = await normalize_run(items, mode, executor)
+    normalized = time.perf_counter()
+    normalize_stall = max(stalls, default=normalized - start)
+    ads = score_ads(ads)
+    scored = time.perf_counter()
+
+    stop.set()
+    await tick
+    assert ads and ads[0]["efficiency_score"] >= ads[-1]["efficiency_score"]
+    return {
+        "normalize_ms": (normalized - start) * 1000,
+        "normalize_stall_ms": normalize_stall * 1000,
+        "score_ms": (scored - normalized) * 1000,
+        "score_pickle_ms": pickle_roundtrip(ads) * 1000,
+    }
+
+def pickle_roundtrip(ads: list) -> float:
+    start = time.perf_counter()
+    pickle.loads(pickle.dumps(ads, pickle.HIGHEST_PROTOCOL))
+    return time.perf_counter() - start
+
+async def run_benchmark(args) -> dict:
+    base = with_detail_fields(load_meta_fixture())
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    # Worker vorab starten, der Import zählt nicht mit
+    await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(executor, normalize_page, base[:1])
+                           for _ in range(args.workers)))
+
+    results = {}
+    try:
+        for size in args.sizes:
+            # Eindeutige IDs, sonst verwirft der Dedupe im Seitenfluss die Wiederholungen
+            items = [{**item, "ad_archive_id": f"{item.get('ad_archive_id')}-{i}"}
+                     for i, item in enumerate((base * (size // len(base) + 1))[:size])]
+            results[size] = {}
+            for mode in MODES:
+                runs = [await measure(items, mode, executor) for _ in range(args.repeat)]
+                results[size][mode] = {key: round(min(r[key] for r in runs), 2) for key in runs[0]}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[50, 100, 200, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--out", default="benchmarks/results/offload.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    report = {
+        "benchmark": "bench_offload",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "config": {**vars(args), "page_size": settings.APIFY_DATASET_PAGE_SIZE},
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    for size, r in results.items():
+        stages = " | ".join(f"{mode}: Stall {r[mode]['normalize_stall_ms']:6.2f} ms ({r[mode]['normalize_ms']:6.2f} ms)" for mode in MODES)
+        print(f"🧮 {size:5d} Items | Normalisieren {stages} | "
+              f"Scoring {r['page']['score_ms']:5.2f} ms, Pickle {r['page']['score_pickle_ms']:5.2f} ms")
+    if args.out:
+        print(f"💾 Ergebnisse: {args.out}")
+
+if __name__ == "__main__":
+    main()
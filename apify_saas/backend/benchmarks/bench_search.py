@@ -0,0 +1,243 @@
+"""
+End-to-End Benchmark für POST /api/v1/search/ gegen Fake-Apify und Fake-Supabase.
+
+Spielt die aufgezeichneten Datasets aus lib_py/ ab (Meta-Notebook, TikTok-Mock) und misst:
+- Durchsatz und Latenz (p50/p95/p99) für kalte Suchen (Scrape) und warme Suchen (Cache),
+- Normalisierungs- und Scoring-Durchsatz,
+- Speicher pro Request (tracemalloc-Peak).
+Die Ergebnisse landen als JSON in --out, damit man Regressionen vergleichen kann.
+
+Aufruf aus dem backend/ Ordner:
+    python -m benchmarks.bench_search [--requests 200] [--concurrency 20] [--out benchmarks/results/latest.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Die App braucht ihre Pflicht-Settings, auch wenn nichts davon benutzt wird
+os.environ.setdefault("APIFY_TOKEN", "bench")
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+
+import httpx
+import jwt
+
+from benchmarks.fakes import FakeApify, FakeSupabase
+from benchmarks.fixtures import load_meta_fixture, load_tiktok_fixture
+from app.core.config import settings
+from app.main import app
+from app.services import apify_client_service, apify_meta, auth_service, background_tasks, cache_service, supabase_service
+from app.services.credits_service import credit_ledger
+from app.services.meta_extract import normalize_meta_ad
+from app.services.scoring import score_ads
+
+TIKTOK_ACTOR_ID = "clockworks/tiktok-scraper"
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-Rank-Perzentil auf einer sortierten Liste."""
+    if not sorted_values: return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: list, wall_secs: float, errors: int) -> dict:
+    values = sorted(latencies)
+    ms = lambda secs: round(secs * 1000, 2)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "wall_secs": round(wall_secs, 3),
+        "throughput_rps": round(len(values) / wall_secs, 2) if wall_secs else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+            "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)),
+            "p99": ms(percentile(values, 99)),
+            "max": ms(values[-1]) if values else 0.0,
+        },
+    }
+
+# --- SETUP ---
+
+def make_token(user_id: str) -> str:
+    claims = {"sub": user_id, "aud": settings.SUPABASE_JWT_AUDIENCE, "exp": int(time.time()) + 3600, "email": f"{user_id}@bench"}
+    return jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+def install_fakes(args, meta_items: list, tiktok_items: list):
+    apify = FakeApify(
+        {apify_meta.ACTOR_ID: meta_items, TIKTOK_ACTOR_ID: tiktok_items},
+        latency_ms=args.apify_latency_ms,
+        actor_secs=args.actor_secs,
+    )
+    db = FakeSupabase(latency_ms=args.db_latency_ms)
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    for user_id in users:
+        db.add_profile(user_id, credits=10**12, email=f"{user_id}@bench")
+
+    apify_client_service._client = apify
+    supabase_service._client = db
+    settings.APIFY_DATASET_POLL_SECS = args.poll_secs
+    # Per-User-Buckets würden die wenigen Bench-User sofort drosseln (Queue und Slots bleiben aktiv)
+    settings.ADMISSION_ENABLED = getattr(args, "admission", False)
+    return apify, db, [make_token(user_id) for user_id in users]
+
+def reset_caches():
+    cache_service.search_cache.clear()
+    auth_service.profile_cache.clear()
+
+# --- PHASEN ---
+
+async def run_load(client: httpx.AsyncClient, tokens: list, keywords: list, args) -> dict:
+    """Schickt len(keywords) Suchen mit begrenzter Parallelität."""
+    latencies, errors = [], 0
+    queue = list(enumerate(keywords))
+    queue.reverse()
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            i, keyword = queue.pop()
+            body = {"keyword": keyword, "platform": args.platform, "limit": args.limit, "country": "US"}
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/search/", json=body,
+                headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            )
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200: errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+async def measure_memory(client: httpx.AsyncClient, tokens: list, keywords: list, args) -> dict:
+    """Sequenziell: tracemalloc-Peak je Request (alles, was während des Requests lebt)."""
+    peaks = []
+    for i, keyword in enumerate(keywords):
+        body = {"keyword": keyword, "platform": args.platform, "limit": args.limit, "country": "US"}
+        tracemalloc.start()
+        await client.post("/api/v1/search/", json=body, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    peaks.sort()
+    kib = lambda b: round(b / 1024, 1)
+    return {"requests": len(peaks), "peak_kib": {"p50": kib(percentile(peaks, 50)), "max": kib(peaks[-1]) if peaks else 0.0}}
+
+def bench_pipeline(meta_items: list, repeat: int) -> dict:
+    """Normalisierung + Scoring ohne HTTP/IO, Bestwert aus `repeat` Läufen."""
+    best_norm, best_score = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ads = [ad for ad in map(normalize_meta_ad, meta_items) if ad]
+        best_norm = min(best_norm, time.perf_counter() - start)
+        start = time.perf_counter()
+        score_ads(ads)
+        best_score = min(best_score, time.perf_counter() - start)
+    return {
+        "items": len(meta_items),
+        "normalize_items_per_sec": round(len(meta_items) / best_norm),
+        "score_items_per_sec": round(len(ads) / best_score) if ads else 0,
+    }
+
+async def run_benchmark(args) -> dict:
+    meta_items = load_meta_fixture()
+    tiktok_items = load_tiktok_fixture()
+    apify, db, tokens = install_fakes(args, meta_items, tiktok_items)
+    results = {"pipeline": bench_pipeline(meta_items, args.repeat)}
+
+    transport = httpx.ASGITransport(app=app)
+    credit_ledger.start()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Kalt: jede Suche ist neu -> Scrape über Fake-Apify
+        reset_caches()
+        results["search_cold"] = await run_load(client, tokens, [f"cold {i}" for i in range(args.requests)], args)
+        results["search_cold"]["apify_runs"] = apify.stats["runs"]
+        await background_tasks.drain()
+
+        # Warm: wenige Keywords, erst vorwärmen, dann nur noch Cache-Treffer
+        reset_caches()
+        hot = [f"warm {i}" for i in range(args.hot_keywords)]
+        await run_load(client, tokens, hot, args)
+        await background_tasks.drain()
+        results["search_warm"] = await run_load(client, tokens, [hot[i % len(hot)] for i in range(args.requests)], args)
+        results["search_warm"]["l1"] = cache_service.search_cache.stats()
+
+        # Warm über L2: L1 leer, Daten nur in (Fake-)Supabase
+        cache_service.search_cache.clear()
+        results["search_l2"] = await run_load(client, tokens, hot, args)
+
+        reset_caches()
+        results["memory_cold"] = await measure_memory(client, tokens, [f"mem {i}" for i in range(args.memory_requests)], args)
+        results["memory_warm"] = await measure_memory(client, tokens, [f"mem {i}" for i in range(args.memory_requests)], args)
+
+        await background_tasks.drain()
+    await credit_ledger.stop()
+    results["fake_backends"] = {"apify": dict(apify.stats), "supabase": dict(db.stats)}
+    return results
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--platform", default="meta", choices=["meta", "tiktok", "both"])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--hot-keywords", type=int, default=10)
+    parser.add_argument("--memory-requests", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20, help="Läufe für den Pipeline-Benchmark")
+    parser.add_argument("--apify-latency-ms", type=float, default=20.0, help="Latenz pro Apify-API-Call")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Latenz pro Supabase execute()")
+    parser.add_argument("--actor-secs", type=float, default=0.5, help="Laufzeit eines Actor-Runs")
+    parser.add_argument("--poll-secs", type=float, default=0.05, help="APIFY_DATASET_POLL_SECS während des Benchmarks")
+    parser.add_argument("--admission", action="store_true", help="Rate-Limits pro User/Plan aktiv lassen (429 zählen als Fehler)")
+    parser.add_argument("--out", default="benchmarks/results/latest.json")
+    parser.add_argument("--verbose", action="store_true", help="print()-Logs der App nicht unterdrücken")
+    args = parser.parse_args()
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+        results = asyncio.run(run_benchmark(args))
+
+    report = {
+        "benchmark": "bench_search",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    pipeline = results["pipeline"]
+    print(f"📦 Pipeline: {pipeline['normalize_items_per_sec']} Items/s normalisieren, {pipeline['score_items_per_sec']} Items/s scoren")
+    for name in ("search_cold", "search_warm", "search_l2"):
+        phase = results[name]
+        lat = phase["latency_ms"]
+        print(f"🚀 {name:12s}: {phase['throughput_rps']:8.1f} req/s | p50 {lat['p50']:8.1f} ms | p95 {lat['p95']:8.1f} ms | p99 {lat['p99']:8.1f} ms | Fehler {phase['errors']}")
+    for name in ("memory_cold", "memory_warm"):
+        print(f"🧠 {name:12s}: Peak p50 {results[name]['peak_kib']['p50']} KiB, max {results[name]['peak_kib']['max']} KiB")
+    if args.out:
+        print(f"💾 Ergebnisse: {args.out}")
+
+if __name__ == "__main__":
+    main()
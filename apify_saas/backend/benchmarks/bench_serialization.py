@@ -0,0 +1,104 @@
+"""
+Serialisierungs-Benchmark: FastAPI-Standardpfad (jsonable_encoder + JSONResponse)
+gegen FastJSONResponse (orjson, ohne jsonable_encoder), plus gzip-Kosten und -Größe.
+
+Payloads wie in der App: Such-Antwort mit N bewerteten Meta-Ads und /user/me mit M gespeicherten Ads.
+
+Aufruf aus dem backend/ Ordner:
+    python -m benchmarks.bench_serialization [--ads 100] [--saved 50] [--repeat 50] [--out benchmarks/results/serialization.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("APIFY_TOKEN", "bench")
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_search import git_revision
+from benchmarks.fixtures import load_meta_fixture
+from app.core import responses
+from app.core.responses import FastJSONResponse
+from app.services.meta_extract import normalize_meta_ad
+from app.services.scoring import score_ads
+
+def build_payloads(n_ads: int, n_saved: int) -> dict:
+    ads = score_ads([ad for ad in map(normalize_meta_ad, load_meta_fixture()) if ad])
+    ads = (ads * (n_ads // len(ads) + 1))[:n_ads]
+    search = {
+        "status": "success",
+        "data": ads,
+        "meta": {"count": len(ads), "total": len(ads), "next_cursor": None, "sort_by": "efficiency_score",
+                 "query": "fitness", "country": "US", "countries": ["US"], "freshness": {"meta:US": "fresh"}},
+    }
+    saved = [{"id": i, "type": "meta", "data": ads[i % len(ads)], "savedAt": "2024-05-01T12:00:00+00:00"} for i in range(n_saved)]
+    profile = {"id": "bench-user", "email": "bench@example.com", "credits": 100, "plan": "pro", "savedAds": saved}
+    return {"search": search, "profile": profile}
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_payload(content: dict, repeat: int, gzip_level: int) -> dict:
+    default_body = JSONResponse(jsonable_encoder(content)).body
+    fast_body = FastJSONResponse(content).body
+    assert json.loads(default_body) == json.loads(fast_body), "Beide Pfade müssen dasselbe JSON liefern"
+
+    default_secs = best_of(lambda: JSONResponse(jsonable_encoder(content)), repeat)
+    fast_secs = best_of(lambda: FastJSONResponse(content), repeat)
+    gzip_secs = best_of(lambda: gzip.compress(fast_body, gzip_level), repeat)
+    ms = lambda secs: round(secs * 1000, 3)
+    return {
+        "bytes": len(fast_body),
+        "gzip_bytes": len(gzip.compress(fast_body, gzip_level)),
+        "default_ms": ms(default_secs),
+        "fast_ms": ms(fast_secs),
+        "saved_ms": ms(default_secs - fast_secs),
+        "speedup": round(default_secs / fast_secs, 1) if fast_secs else None,
+        "gzip_ms": ms(gzip_secs),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=100, help="Ads in der Such-Antwort")
+    parser.add_argument("--saved", type=int, default=50, help="Gespeicherte Ads im Profil")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--gzip-level", type=int, default=1)
+    parser.add_argument("--out", default="benchmarks/results/serialization.json")
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.ads, args.saved)
+    results = {name: bench_payload(content, args.repeat, args.gzip_level) for name, content in payloads.items()}
+    report = {
+        "benchmark": "bench_serialization",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "json_backend": "orjson" if responses.orjson is not None else "json",
+        "config": vars(args),
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        print(f"🧾 {name:8s}: {r['bytes'] / 1024:8.1f} KiB (gzip {r['gzip_bytes'] / 1024:7.1f} KiB, {r['gzip_ms']} ms) | "
+              f"Standard {r['default_ms']} ms -> schnell {r['fast_ms']} ms (x{r['speedup']}, {r['saved_ms']} ms gespart)")
+    if args.out:
+        print(f"💾 Ergebnisse: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Stand-ins für Apify und Supabase, damit die Benchmarks offline laufen.
+Beide spielen aufgezeichnete Datasets ab und simulieren Latenz pro Aufruf.
+"""
+import asyncio
+import copy
+import datetime
+import itertools
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+# --- APIFY ---
+
+class FakeDatasetPage:
+    def __init__(self, items: list):
+        self.items = items
+        self.count = len(items)
+        self.total = len(items)
+
+class FakeApify:
+    """
+    Async-Client mit der Oberfläche von ApifyClientAsync (nur das, was die App benutzt).
+    Ein Run liefert seine Items linear über `actor_secs` verteilt, wie ein echter Actor.
+    """
+
+    def __init__(self, datasets: dict, latency_ms: float = 0.0, actor_secs: float = 0.0):
+        # datasets: Actor-ID -> Liste roher Items
+        self.datasets = datasets
+        self.latency = latency_ms / 1000
+        self.actor_secs = actor_secs
+        self.runs = {}
+        self.stats = {"calls": 0, "runs": 0, "aborts": 0}
+        self._ids = itertools.count()
+
+    async def _call(self):
+        self.stats["calls"] += 1
+        if self.latency: await asyncio.sleep(self.latency)
+
+    def _available(self, run_id: str) -> int:
+        run = self.runs[run_id]
+        if run["aborted"]: return run["aborted_at"]
+        if self.actor_secs <= 0: return run["total"]
+        elapsed = time.monotonic() - run["started"]
+        return min(run["total"], int(run["total"] * elapsed / self.actor_secs))
+
+    def _info(self, run_id: str) -> dict:
+        run = self.runs[run_id]
+        if run["aborted"]: status = "ABORTED"
+        elif self._available(run_id) >= run["total"]: status = "SUCCEEDED"
+        else: status = "RUNNING"
+        return {"id": run_id, "status": status, "defaultDatasetId": run_id}
+
+    def actor(self, actor_id: str):
+        return _FakeActor(self, actor_id)
+
+    def run(self, run_id: str):
+        return _FakeRun(self, run_id)
+
+    def dataset(self, dataset_id: str):
+        return _FakeDataset(self, dataset_id)
+
+def _start_date_min(url: str):
+    """start_date[min] aus einer Ad-Library-URL als Unix-Timestamp (oder None)."""
+    value = dict(parse_qsl(urlsplit(url).query)).get("start_date[min]")
+    if not value: return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc).timestamp()
+
+class _FakeActor:
+    def __init__(self, apify: FakeApify, actor_id: str):
+        self.apify = apify
+        self.actor_id = actor_id
+
+    async def start(self, run_input: dict = None, **kwargs) -> dict:
+        await self.apify._call()
+        run_input = run_input or {}
+        items = self.apify.datasets.get(self.actor_id, [])
+        urls = [entry["url"] for entry in run_input.get("urls") or []]
+        since = _start_date_min(urls[0]) if len(urls) == 1 else None
+        if since is not None:
+            # Meta-Datumsfilter (Delta-Refresh): nur Ads, die ab diesem Tag gestartet sind
+            items = [item for item in items if (item.get("start_date") or 0) >= since]
+        if len(urls) > 1:
+            # Multi-URL-Run (Meta): pro URL `count` Items, nacheinander, mit der Quell-URL im Item
+            per_url = items[:run_input.get("count") or len(items)]
+            items = [{**item, "url": url} for url in urls for item in per_url]
+        limit = run_input.get("maxItems") or run_input.get("resultsPerPage")
+        if limit: items = items[:limit]
+        run_id = f"run{next(self.apify._ids)}"
+        self.apify.runs[run_id] = {
+            "items": items, "total": len(items), "started": time.monotonic(),
+            "aborted": False, "aborted_at": 0, "input": run_input,
+        }
+        self.apify.stats["runs"] += 1
+        return self.apify._info(run_id)
+
+    async def call(self, run_input: dict = None, **kwargs) -> dict:
+        run = await self.start(run_input=run_input, **kwargs)
+        return await _FakeRun(self.apify, run["id"]).wait_for_finish()
+
+class _FakeRun:
+    def __init__(self, apify: FakeApify, run_id: str):
+        self.apify = apify
+        self.run_id = run_id
+
+    async def get(self) -> dict:
+        await self.apify._call()
+        return self.apify._info(self.run_id)
+
+    async def wait_for_finish(self, wait_secs: float = None) -> dict:
+        run = self.apify.runs[self.run_id]
+        remaining = run["started"] + self.apify.actor_secs - time.monotonic()
+        if remaining > 0: await asyncio.sleep(remaining)
+        return await self.get()
+
+    async def abort(self, gracefully: bool = None) -> dict:
+        await self.apify._call()
+        run = self.apify.runs[self.run_id]
+        run["aborted_at"] = self.apify._available(self.run_id)
+        run["aborted"] = True
+        self.apify.stats["aborts"] += 1
+        return self.apify._info(self.run_id)
+
+class _FakeDataset:
+    def __init__(self, apify: FakeApify, dataset_id: str):
+        self.apify = apify
+        self.dataset_id = dataset_id
+
+    async def list_items(self, offset: int = 0, limit: int = None, **kwargs) -> FakeDatasetPage:
+        await self.apify._call()
+        run = self.apify.runs[self.dataset_id]
+        end = self.apify._available(self.dataset_id)
+        if limit: end = min(end, offset + limit)
+        # Kopien: die App verändert Items nicht, aber ein echter Client liefert auch frische Objekte
+        return FakeDatasetPage(copy.deepcopy(run["items"][offset:end]))
+
+# --- SUPABASE ---
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.count = len(data) if isinstance(data, list) else None
+
+def _column(row: dict, column: str):
+    # Unterstützt JSON-Pfade wie "parameters->>cache_key"
+    if "->>" in column:
+        base, key = column.split("->>", 1)
+        value = row.get(base) or {}
+        value = value.get(key) if isinstance(value, dict) else None
+        return None if value is None else str(value)
+    return row.get(column)
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.order_by = None
+        self.limit_n = None
+        self.single = False
+
+    # Operationen
+    def select(self, *args, **kwargs):
+        self.op = "select"; return self
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = "insert", payload; return self
+    def upsert(self, payload, on_conflict: str = None, **kwargs):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict; return self
+    def update(self, payload, **kwargs):
+        self.op, self.payload = "update", payload; return self
+    def delete(self, **kwargs):
+        self.op = "delete"; return self
+
+    # Filter / Modifier
+    def eq(self, column, value):
+        self.filters.append(lambda row: _column(row, column) == value); return self
+    def gte(self, column, value):
+        self.filters.append(lambda row: _column(row, column) is not None and _column(row, column) >= value); return self
+    def lt(self, column, value):
+        self.filters.append(lambda row: _column(row, column) is not None and _column(row, column) < value); return self
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: _column(row, column) in values); return self
+    def order(self, column, desc: bool = False):
+        self.order_by = (column, desc); return self
+    def limit(self, n: int):
+        self.limit_n = n; return self
+    def maybe_single(self):
+        self.single = True; return self
+
+    def _match(self, row: dict) -> bool:
+        return all(f(row) for f in self.filters)
+
+    def execute(self) -> FakeResponse:
+        self.db._latency()
+        with self.db.lock:
+            self.db.stats[self.op] = self.db.stats.get(self.op, 0) + 1
+            rows = self.db.tables.setdefault(self.table, [])
+            if self.op == "select":
+                data = [row for row in rows if self._match(row)]
+                if self.order_by:
+                    column, desc = self.order_by
+                    data.sort(key=lambda row: _column(row, column) or "", reverse=desc)
+                if self.limit_n is not None: data = data[:self.limit_n]
+                if self.single: return FakeResponse(dict(data[0]) if data else None)
+                return FakeResponse([dict(row) for row in data])
+            if self.op == "insert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for row in payload:
+                    row = {"id": next(self.db._ids), **row}
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return FakeResponse(inserted)
+            if self.op == "upsert":
+                keys = [k.strip() for k in (self.on_conflict or "id").split(",")]
+                index = {tuple(row.get(k) for k in keys): i for i, row in enumerate(rows)}
+                for row in self.payload if isinstance(self.payload, list) else [self.payload]:
+                    key = tuple(row.get(k) for k in keys)
+                    if key in index: rows[index[key]].update(row)
+                    else:
+                        rows.append({"id": next(self.db._ids), **row})
+                        index[key] = len(rows) - 1
+                return FakeResponse([])
+            if self.op == "update":
+                updated = []
+                for row in rows:
+                    if self._match(row):
+                        row.update(self.payload)
+                        updated.append(dict(row))
+                return FakeResponse(updated)
+            if self.op == "delete":
+                self.db.tables[self.table] = [row for row in rows if not self._match(row)]
+                return FakeResponse([])
+        raise ValueError(f"Unbekannte Operation {self.op}")
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", fn: str, params: dict):
+        self.db = db
+        self.fn = fn
+        self.params = params or {}
+
+    def execute(self) -> FakeResponse:
+        self.db._latency()
+        with self.db.lock:
+            self.db.stats["rpc"] = self.db.stats.get("rpc", 0) + 1
+            if self.fn == "adjust_credits":
+                for row in self.db.tables.setdefault("profiles", []):
+                    if row.get("id") == self.params["p_user_id"]:
+                        if row.get("credits", 0) + self.params["p_delta"] < 0:
+                            return FakeResponse(None)
+                        row["credits"] = row.get("credits", 0) + self.params["p_delta"]
+                        return FakeResponse(row["credits"])
+                return FakeResponse(None)
+        raise ValueError(f"Unbekannte RPC {self.fn}")
+
+class FakeSupabase:
+    """
+    Sync-Client mit In-Memory-Tabellen und fester Latenz pro execute().
+    Thread-safe, weil die App Supabase-Calls im Thread-Pool macht.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.tables = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _latency(self):
+        if self.latency: time.sleep(self.latency)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: dict = None) -> FakeRpc:
+        return FakeRpc(self, fn, params)
+
+    def add_profile(self, user_id: str, credits: int, **fields):
+        self.tables.setdefault("profiles", []).append({"id": user_id, "credits": credits, **fields})
@@ -0,0 +1,26 @@
+import ast
+import json
+import os
+
+# Aufgezeichnete Actor-Datasets aus lib_py/ (Notebook-Ausgaben + TikTok Mock)
+LIB_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib_py")
+
+def load_meta_fixture() -> list:
+    """
+    Die 220 Meta-Ads aus fb_ads_library_scraper.ipynb.
+    Das Notebook zeigt `test_data` als Python-Repr an, daher literal_eval statt json.
+    """
+    with open(os.path.join(LIB_PY, "fb_ads_library_scraper.ipynb"), encoding="utf-8") as f:
+        notebook = json.load(f)
+
+    largest = ""
+    for cell in notebook["cells"]:
+        for output in cell.get("outputs", []):
+            text = "".join(output.get("data", {}).get("text/plain", []))
+            if len(text) > len(largest):
+                largest = text
+    return ast.literal_eval(largest)
+
+def load_tiktok_fixture() -> list:
+    with open(os.path.join(LIB_PY, "mock_data_tiktok_hashtag.json"), encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,164 @@
+# Stand von normalize_meta_ad VOR dem kompilierten Extraktionsplan (nur für Benchmarks).
+# get_demographics war im Original referenziert, aber nie definiert - hier ergänzt,
+# damit der Vergleich überhaupt Ergebnisse liefert.
+import datetime
+
+def get_demographics(item):
+    return get_nested_value(item, ['aaa_info', 'age_country_gender_reach_breakdown']) or []
+
+def get_nested_value(ad, path_list):
+    current = ad
+    for key in path_list:
+        if isinstance(current, dict):
+            current = current.get(key)
+        else:
+            return None
+    return current
+
+def get_page_size(item):
+    """Ermittelt die Macht des Profils (Likes + Follower)."""
+    likes = item.get("likes", 0) or item.get("page_like_count", 0)
+    advertiser = item.get("advertiser", {})
+    page_info = advertiser.get("ad_library_page_info", {}).get("page_info", {})
+    
+    if not likes: likes = page_info.get("likes", 0) or 0
+    ig_followers = page_info.get("ig_followers", 0) or 0
+    if not likes: likes = item.get("snapshot", {}).get("page_like_count", 0) or 0
+
+    return (int(likes or 0) + int(ig_followers or 0))
+
+def get_advertiser_info(item):
+    page_info = item.get("advertiser", {}).get("ad_library_page_info", {}).get("page_info", {})
+    about_text = item.get("advertiser", {}).get("page", {}).get("about", {}).get("text")
+    return {
+        "facebook_handle": page_info.get("page_alias"),
+        "facebook_followers": page_info.get("likes"),
+        "instagram_handle": page_info.get("ig_username"),
+        "instagram_followers": page_info.get("ig_followers"),
+        "about_text": about_text,
+        "category": page_info.get("page_category")
+    }
+
+def get_days_active(start_timestamp):
+    """Berechnet, wie viele Tage die Ad schon läuft (Minimum 0.5 Tage)."""
+    if not start_timestamp:
+        return 1.0
+    try:
+        if isinstance(start_timestamp, str):
+            try:
+                if len(start_timestamp) == 10:
+                    start_date = datetime.datetime.strptime(start_timestamp, "%Y-%m-%d")
+                else:
+                    start_date = datetime.datetime.fromisoformat(start_timestamp.replace('Z', '+00:00'))
+            except:
+                return 1.0
+        else:
+            start_date = datetime.datetime.fromtimestamp(int(start_timestamp))
+            
+        now = datetime.datetime.now()
+        delta = now - start_date
+        days = max(0.5, delta.total_seconds() / 86400)
+        return days
+    except:
+        return 1.0
+
+def normalize_meta_ad(item):
+    if not item: return None
+    if "error" in item or "errorMessage" in item: return None
+
+    raw_snapshot = item.get("snapshot") or {}
+    raw_id = item.get("ad_archive_id") or item.get("ad_id")
+    if not raw_id or str(raw_id) == "nan": return None 
+    safe_id = str(raw_id)
+
+    # --- REICHWEITE ---
+    reach = 0
+    reach = get_nested_value(item, ['eu_transparency', 'eu_total_reach'])
+    if not reach: reach = get_nested_value(item, ['aaa_info', 'eu_total_reach'])
+    if not reach: reach = get_nested_value(item, ['transparency_by_location', 'eu_transparency', 'eu_total_reach'])
+    if not reach:
+        reach_est = item.get('reach_estimate')
+        if isinstance(reach_est, dict): reach = reach_est.get('reach_upper_bound')
+        elif isinstance(reach_est, (int, float)): reach = reach_est
+    if not reach:
+        reach = get_nested_value(item, ['impressions_with_index', 'impressions_index'])
+        if reach == -1: reach = 0
+        
+    reach = int(reach) if reach else 0
+
+    # --- BASIS METRIKEN ---
+    page_size = get_page_size(item)
+    safe_audience = max(page_size, 1000) 
+    viral_ratio = reach / safe_audience
+    
+    # --- ZEIT & GESCHWINDIGKEIT ---
+    start_date_ts = item.get("start_date") 
+    days_active = get_days_active(start_date_ts)
+    viral_velocity = viral_ratio / days_active 
+    
+    # Meta Infos
+    advertiser_info = get_advertiser_info(item)
+    demographics_raw = get_demographics(item)
+    target_locations = get_nested_value(item, ['aaa_info', 'location_audience']) or []
+    
+    page_cats = item.get("categories", [])
+    if raw_snapshot.get("page_categories"):
+        cats = raw_snapshot.get("page_categories")
+        if isinstance(cats, dict): page_cats = list(cats.values())
+        elif isinstance(cats, list): page_cats = cats
+
+    # Bilder/Videos extrahieren
+    images = raw_snapshot.get("images") or []
+    videos = raw_snapshot.get("videos") or []
+    cards = raw_snapshot.get("cards") or []
+    body_text = raw_snapshot.get("body", {}).get("text")
+    if not body_text and cards and isinstance(cards[0], dict):
+        body_text = cards[0].get("body")
+
+    # Mapping für Beneficiary Infos (Wichtig für Frontend!)
+    payer_beneficiary = get_nested_value(item, ['aaa_info', 'payer_beneficiary_data'])
+    if payer_beneficiary and isinstance(payer_beneficiary, list) and len(payer_beneficiary) > 0:
+        beneficiary_payer = {
+            "payer": payer_beneficiary[0].get("payer"),
+            "beneficiary": payer_beneficiary[0].get("beneficiary")
+        }
+    else:
+        beneficiary_payer = None
+
+    return {
+        "id": safe_id,
+        "publisher_platform": item.get("publisher_platform", ["facebook"]),
+        "start_date": item.get("start_date", ""),
+        "page_name": item.get("page_name", "Unknown Page"),
+        "page_profile_uri": item.get("page_profile_uri", "#"),
+        "ad_library_url": item.get("ad_library_url", "#"),
+        "likes": item.get("likes", 0) or item.get("page_like_count", 0),
+        
+        "reach_estimate": reach, 
+        "impressions": reach,
+        "spend": item.get("spend", 0),
+        "page_size": page_size,
+        
+        "viral_ratio": viral_ratio, 
+        "days_active": days_active,
+        "viral_velocity": viral_velocity,
+        
+        "efficiency_score": 0, 
+        "viral_factor": 0,     
+        
+        "demographics": demographics_raw,
+        "target_locations": target_locations,
+        "advertiser_info": advertiser_info,
+        "beneficiary_payer": beneficiary_payer,
+        "page_categories": page_cats,
+        
+        "snapshot": {
+            "cta_text": raw_snapshot.get("cta_text", "Learn More"),
+            "link_url": raw_snapshot.get("link_url") or item.get("ad_library_url", "#"),
+            "body": {"text": body_text or ""},
+            "images": images,
+            "videos": videos,
+            "cards": cards 
+        }
+    }
+
@@ -0,0 +1,10 @@
+-- Lease-Tabelle für Single-Flight über mehrere uvicorn-Worker
+-- (aktiv mit SCRAPE_LOCK_BACKEND=supabase)
+create table if not exists public.scrape_leases (
+    key text primary key,
+    owner text not null,
+    expires_at timestamptz not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists scrape_leases_expires_at_idx on public.scrape_leases (expires_at);
@@ -0,0 +1,27 @@
+-- Atomare Credit-Buchung: Prüfen + Abziehen in EINEM Statement (kein Read-Modify-Write)
+-- Rückgabe: neuer Kontostand, oder NULL wenn der User nicht genug Credits hat.
+create or replace function public.adjust_credits(p_user_id uuid, p_delta integer)
+returns integer
+language sql
+as $$
+    update public.profiles
+       set credits = credits + p_delta
+     where id = p_user_id
+       and credits + p_delta >= 0
+    returning credits;
+$$;
+
+-- Nur das Backend (service_role) darf buchen; sonst könnte jeder User über rpc/adjust_credits gutschreiben
+revoke execute on function public.adjust_credits(uuid, integer) from public, anon, authenticated;
+grant execute on function public.adjust_credits(uuid, integer) to service_role;
+
+-- Ledger wird gebündelt geschrieben (Write-Behind), daher nur noch Bulk-Inserts
+create table if not exists public.credit_ledger (
+    id bigint generated by default as identity primary key,
+    user_id uuid not null,
+    amount integer not null,
+    description text,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists credit_ledger_user_id_idx on public.credit_ledger (user_id, created_at desc);
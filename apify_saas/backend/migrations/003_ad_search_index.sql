@@ -0,0 +1,85 @@
+-- Volltext + Facetten über alle gespeicherten Ads (nicht nur über exakte search_cache.query-Treffer).
+-- Gewichte: A = Page-Name/Handles, B = Ad-Text, C = Kategorien, D = CTA (wie app/services/ad_index.py).
+-- 'simple' statt einer Sprach-Config: die Ads sind mehrsprachig, Stemming würde nur für eine Sprache passen.
+
+alter table public.ad_results
+    add column if not exists search_tsv tsvector generated always as (
+        setweight(to_tsvector('simple',
+            coalesce(data->>'page_name', '') || ' ' ||
+            coalesce(data->'advertiser_info'->>'facebook_handle', '') || ' ' ||
+            coalesce(data->'advertiser_info'->>'instagram_handle', '') || ' ' ||
+            coalesce(data->'authorMeta'->>'nickName', '') || ' ' ||
+            coalesce(data->'authorMeta'->>'name', '')), 'A') ||
+        setweight(to_tsvector('simple',
+            coalesce(data->'snapshot'->'body'->>'text', '') || ' ' ||
+            coalesce(data->>'text', '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(data->>'page_categories', '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(data->'snapshot'->>'cta_text', '')), 'D')
+    ) stored;
+
+-- Facetten aus dem Scoring-Bucket ("A_TRENDING" -> Cluster A, Kohorte TRENDING)
+alter table public.ad_results
+    add column if not exists cluster text generated always as (split_part(data->>'_bucket', '_', 1)) stored;
+alter table public.ad_results
+    add column if not exists cohort text generated always as (split_part(data->>'_bucket', '_', 2)) stored;
+
+create index if not exists ad_results_search_tsv_idx on public.ad_results using gin (search_tsv);
+create index if not exists ad_results_facets_idx on public.ad_results (platform, cluster, cohort);
+
+-- Land kommt aus der Suche, die die Ad zuletzt geliefert hat (ad_results.search_ref)
+create index if not exists search_cache_country_idx on public.search_cache ((parameters->>'country'));
+
+-- Treffer-Seite, sortiert nach ts_rank und efficiency_score. total = Anzahl aller Treffer (für Paging).
+create or replace function public.search_ads(
+    p_query text,
+    p_platform text default null,
+    p_cluster text default null,
+    p_cohort text default null,
+    p_country text default null,
+    p_limit integer default 20,
+    p_offset integer default 0
+)
+returns table (platform text, country text, rank real, data jsonb, total bigint)
+language sql
+stable
+as $$
+    with q as (select websearch_to_tsquery('simple', p_query) as tsq),
+    hits as (
+        select r.platform, s.parameters->>'country' as country,
+               ts_rank(r.search_tsv, q.tsq) as rank, r.data
+          from public.ad_results r
+          cross join q
+          left join public.search_cache s on s.id = r.search_ref
+         where r.search_tsv @@ q.tsq
+           and (p_platform is null or r.platform = p_platform)
+           and (p_cluster is null or r.cluster = p_cluster)
+           and (p_cohort is null or r.cohort = p_cohort)
+           and (p_country is null or s.parameters->>'country' = p_country)
+    )
+    select h.platform, h.country, h.rank, h.data, count(*) over () as total
+      from hits h
+     order by h.rank desc, coalesce((h.data->>'efficiency_score')::numeric, 0) desc
+     limit p_limit offset p_offset;
+$$;
+
+-- Facetten-Zähler für dieselbe Suche (ohne Facetten-Filter, damit alle Optionen sichtbar bleiben)
+create or replace function public.search_ads_facets(p_query text, p_platform text default null)
+returns table (facet text, value text, hits bigint)
+language sql
+stable
+as $$
+    with hits as (
+        select r.platform, r.cluster, r.cohort, s.parameters->>'country' as country
+          from public.ad_results r
+          left join public.search_cache s on s.id = r.search_ref
+         where r.search_tsv @@ websearch_to_tsquery('simple', p_query)
+           and (p_platform is null or r.platform = p_platform)
+    )
+    select 'cluster', cluster, count(*) from hits where cluster <> '' group by cluster
+    union all
+    select 'cohort', cohort, count(*) from hits where cohort <> '' group by cohort
+    union all
+    select 'country', country, count(*) from hits where country is not null group by country
+    union all
+    select 'platform', platform, count(*) from hits group by platform;
+$$;
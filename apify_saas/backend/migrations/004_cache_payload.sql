@@ -0,0 +1,7 @@
+-- Kompakter, komprimierter Pool pro Suche (app/services/ad_codec.py, Format "adspy<version>:<codec>:<base64>").
+-- Cache-Hits lesen nur noch diese eine Zeile statt aller ad_results-Zeilen der Suche.
+-- Ältere Einträge ohne payload werden weiterhin aus ad_results gelesen.
+alter table public.search_cache add column if not exists payload text;
+
+-- Große Werte liegen ohnehin im TOAST; bereits komprimiert -> nicht noch einmal mit pglz komprimieren
+alter table public.search_cache alter column payload set storage external;
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests laufen aus dem backend/ Ordner, ohne .env und ohne echte Supabase/Apify-Zugänge
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("APIFY_TOKEN", "test")
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test")
@@ -0,0 +1,63 @@
+import pytest
+from app.core.config import settings
+from app.services import ad_codec
+from app.services.ad_codec import decode_pool, encode_pool, project_ad
+
+def _ads():
+    advertiser = {"page_name": "Brand", "page_profile_uri": "https://fb.com/brand", "advertiser_info": {"category": "Shop"}}
+    return [
+        {
+            "id": f"m{i}",
+            **advertiser,
+            "efficiency_score": 10.5 - i,
+            "_bucket": "A_EVERGREEN",
+            "snapshot": {
+                "body": {"text": "Same copy for every variant"},
+                "images": [{"resized_image_url": f"https://img/{i}.jpg", "watermarked_resized_image_url": "dup"}],
+                "videos": [],
+                "cards": [],
+            },
+        }
+        for i in range(5)
+    ] + [{"id": "t0", "desc": "tiktok", "authorMeta": {"name": "creator"}, "playCount": 7}]
+
+@pytest.mark.parametrize("codec", [
+    "zlib",
+    pytest.param("zstd", marks=pytest.mark.skipif(ad_codec.zstandard is None, reason="zstandard not installed")),
+])
+def test_roundtrip(monkeypatch, codec):
+    monkeypatch.setattr(settings, "CACHE_PAYLOAD_CODEC", codec)
+    ads = _ads()
+    payload = encode_pool(ads)
+    assert payload.startswith(f"adspy{ad_codec.FORMAT_VERSION}:{codec}:")
+    assert decode_pool(payload) == [project_ad(ad) for ad in ads]
+
+def test_roundtrip_keeps_displayed_media(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_PAYLOAD_CODEC", "zlib")
+    ad = {"id": "m9", "snapshot": {
+        "videos": [{"video_hd_url": "", "video_sd_url": "https://v/sd.mp4", "video_preview_image_url": "https://v/p.jpg"},
+                   {"video_hd_url": "https://v/hd.mp4", "video_sd_url": "https://v/sd2.mp4"}],
+        "cards": [{"original_image_url": "https://c/0.jpg", "resized_image_url": "https://c/0s.jpg",
+                   "watermarked_resized_image_url": "dup"}],
+    }}
+    snapshot = decode_pool(encode_pool([ad]))[0]["snapshot"]
+    # SD nur, wenn HD fehlt; Karten behalten das Originalbild
+    assert snapshot["videos"][0]["video_sd_url"] == "https://v/sd.mp4"
+    assert snapshot["videos"][1] == {"video_hd_url": "https://v/hd.mp4"}
+    assert snapshot["cards"][0] == {"original_image_url": "https://c/0.jpg", "resized_image_url": "https://c/0s.jpg"}
+
+def test_shared_fields_are_stored_once(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_PAYLOAD_CODEC", "zlib")
+    one, many = encode_pool(_ads()[:1]), encode_pool(_ads()[:5])
+    # Fünf Varianten desselben Advertisers kosten kaum mehr als eine
+    assert len(many) < 2 * len(one)
+
+def test_zstd_payload_without_zstandard(monkeypatch):
+    monkeypatch.setattr(ad_codec, "zstandard", None)
+    with pytest.raises(ValueError):
+        decode_pool("adspy1:zstd:AAAA")
+
+@pytest.mark.parametrize("payload", ["", "adspy1", "adspy0:zlib:AAAA", "adspy1:lz4:AAAA"])
+def test_invalid_payload(payload):
+    with pytest.raises(ValueError):
+        decode_pool(payload)
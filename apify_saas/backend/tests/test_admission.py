@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.admission import (
+    PRIORITY_FREE, PRIORITY_PAID, PRIORITY_REFRESH, AdmissionRejected, RateLimiter, ScrapeQueue,
+    scrape_owner, scrape_priority,
+)
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_USER_RATE_PER_MIN", {"free": 6, "paid": 30})
+    monkeypatch.setattr(settings, "ADMISSION_USER_BURST", {"free": 3, "paid": 10})
+    monkeypatch.setattr(settings, "ADMISSION_PLAN_RATE_PER_MIN", {"free": 120, "paid": 600})
+    monkeypatch.setattr(settings, "ADMISSION_PLAN_BURST", {"free": 100, "paid": 100})
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SECS", 5.0)
+
+# --- RATE-LIMIT ---
+
+def test_user_burst_then_429_with_retry_after():
+    limiter = RateLimiter(max_users=10)
+    for _ in range(3):
+        limiter.admit("u1", "free")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.admit("u1", "free")
+    assert rejected.value.retry_after == 10  # 1 Token bei 6/min
+    limiter.admit("u2", "free")  # andere User sind nicht betroffen
+    limiter.admit("u1", "pro")  # bezahlter Plan: eigener, größerer Bucket
+
+def test_refund_restores_tokens():
+    limiter = RateLimiter(max_users=10)
+    for _ in range(3):
+        limiter.admit("u1", "free")
+    limiter.refund("u1", "free")
+    limiter.admit("u1", "free")
+
+def test_least_recently_seen_user_is_evicted():
+    limiter = RateLimiter(max_users=2)
+    limiter.admit("a", "free")
+    limiter.admit("b", "free")
+    limiter.admit("a", "free")
+    limiter.admit("c", "free")
+    assert limiter.stats()["users"] == 2
+    assert list(limiter._users) == ["a", "c"]
+
+# --- QUEUE ---
+
+async def _scrape(queue: ScrapeQueue, name: str, priority: int, order: list, hold: float = 0.01):
+    scrape_priority.set(priority)
+    scrape_owner.set(name)
+    try:
+        async with queue.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+    except AdmissionRejected:
+        order.append(f"{name}:429")
+
+def test_queue_serves_paid_then_free_then_refresh():
+    async def run():
+        queue, order = ScrapeQueue(slots=1, max_waiting=10), []
+        first = asyncio.ensure_future(_scrape(queue, "first", PRIORITY_FREE, order, hold=0.05))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.ensure_future(_scrape(queue, name, priority, order))
+            for name, priority in [("refresh", PRIORITY_REFRESH), ("free1", PRIORITY_FREE),
+                                   ("paid", PRIORITY_PAID), ("free2", PRIORITY_FREE)]
+        ]
+        await asyncio.sleep(0.01)
+        assert queue.depth() == 4
+        assert queue.position("paid") == 1 and queue.position("refresh") == 4
+        await asyncio.gather(first, *waiting)
+        return order, queue
+
+    order, queue = asyncio.run(run())
+    assert order == ["first", "paid", "free1", "free2", "refresh"]
+    assert queue._active == 0 and queue.depth() == 0
+
+def test_full_queue_evicts_lower_priority_or_rejects():
+    async def run():
+        queue, order = ScrapeQueue(slots=1, max_waiting=1), []
+        first = asyncio.ensure_future(_scrape(queue, "first", PRIORITY_FREE, order, hold=0.05))
+        await asyncio.sleep(0)
+        refresh = asyncio.ensure_future(_scrape(queue, "refresh", PRIORITY_REFRESH, order))
+        await asyncio.sleep(0)
+        paid = asyncio.ensure_future(_scrape(queue, "paid", PRIORITY_PAID, order))  # verdrängt den Refresh
+        await asyncio.sleep(0)
+        free = asyncio.ensure_future(_scrape(queue, "free", PRIORITY_FREE, order))  # nichts Unwichtigeres da
+        await asyncio.gather(first, refresh, paid, free)
+        return order, queue
+
+    order, queue = asyncio.run(run())
+    assert order[0] == "first" and order[-1] == "paid"
+    assert set(order[1:-1]) == {"refresh:429", "free:429"}
+    assert queue.stats["evicted"] == 1 and queue.stats["rejected"] == 1
+    assert queue._active == 0
+
+def test_cancelled_waiter_frees_its_place():
+    async def run():
+        queue, order = ScrapeQueue(slots=1, max_waiting=5), []
+        first = asyncio.ensure_future(_scrape(queue, "first", PRIORITY_FREE, order, hold=0.03))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(_scrape(queue, "cancelled", PRIORITY_FREE, order))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(first, waiting, return_exceptions=True)
+        return order, queue
+
+    order, queue = asyncio.run(run())
+    assert order == ["first"]
+    assert queue._active == 0 and queue.depth() == 0
@@ -0,0 +1,37 @@
+import asyncio
+import time
+from app.services import cache_service
+from app.services.metrics import cache_requests
+
+class NoScrape:
+    async def do(self, key, fn, poll=None):
+        return []
+
+def test_partial_l1_hit_is_not_also_a_miss(monkeypatch):
+    monkeypatch.setattr(cache_service, "get_cached_entry", lambda *args, **kwargs: None)
+    monkeypatch.setattr(cache_service, "scrape_flight", NoScrape())
+    key = "meta|shoes|US|partial-test"
+    cache_service.search_cache.set(key, {"ads": [{"id": "a"}], "fetched_at": time.time(), "min_ads": 1})
+    before = {result: cache_requests.value(layer="l1", result=result) for result in ("partial", "miss")}
+
+    async def fetch():
+        return []
+    asyncio.run(cache_service.cached_search(key, "meta", "shoes", {"min_ads": 10}, fetch))
+
+    assert cache_requests.value(layer="l1", result="partial") == before["partial"] + 1
+    assert cache_requests.value(layer="l1", result="miss") == before["miss"]
+    cache_service.search_cache.delete(key)
+
+def test_peek_has_no_side_effects():
+    cache = cache_service.LocalCache(max_entries=2, ttl_secs=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1 and cache.peek("missing") is None
+    assert cache.hits == 0 and cache.misses == 0
+    cache.set("c", 3)  # "a" bleibt der älteste Eintrag und fliegt raus
+    assert cache.peek("a") is None and cache.peek("b") == 2
+
+def test_peek_respects_ttl():
+    cache = cache_service.LocalCache(max_entries=2, ttl_secs=60)
+    cache.set("a", 1, ttl_secs=-1)
+    assert cache.peek("a") is None
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from pydantic import ValidationError
+from app.models.api_requests import SearchRequest
+from app.services import credits_service
+from app.services.credits_service import InsufficientCredits, credit_hold, held_credits, reserve_credits
+from app.services.search_service import search_cost, search_usage
+
+@pytest.fixture
+def bank(monkeypatch):
+    """Kontostände im Speicher statt adjust_credits-RPC; Ledger-Beträge werden mitgeschrieben."""
+    bank = SimpleNamespace(balances={"u1": 100}, ledger=[])
+
+    def adjust(user_id, delta):
+        if bank.balances.get(user_id, 0) + delta < 0: return None
+        bank.balances[user_id] = bank.balances.get(user_id, 0) + delta
+        return bank.balances[user_id]
+
+    monkeypatch.setattr(credits_service, "adjust_credits", adjust)
+    monkeypatch.setattr(credits_service.credit_ledger, "add", lambda user_id, amount, description: bank.ledger.append(amount))
+    return bank
+
+def test_reserve_and_settle_keeps_used_credits(bank):
+    async def run():
+        hold = await reserve_credits("u1", 30)
+        assert bank.balances["u1"] == 70 and held_credits("u1") == 30
+        await hold.settle(used=10)
+        await hold.settle()  # zweites Abschließen ist ein No-Op
+
+    asyncio.run(run())
+    assert bank.balances["u1"] == 90
+    assert bank.ledger == [-10]
+    assert held_credits("u1") == 0
+
+def test_release_refunds_everything(bank):
+    async def run():
+        hold = await reserve_credits("u1", 40)
+        await hold.release()
+
+    asyncio.run(run())
+    assert bank.balances["u1"] == 100
+    assert bank.ledger == []
+
+def test_credit_hold_releases_on_error(bank):
+    async def run():
+        async with credit_hold("u1", 25):
+            raise RuntimeError("scrape failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert bank.balances["u1"] == 100
+    assert held_credits("u1") == 0
+
+def test_credit_hold_settles_on_success(bank):
+    async def run():
+        async with credit_hold("u1", 25):
+            pass
+
+    asyncio.run(run())
+    assert bank.balances["u1"] == 75
+    assert bank.ledger == [-25]
+
+def test_insufficient_credits(bank):
+    with pytest.raises(InsufficientCredits):
+        asyncio.run(reserve_credits("u1", 101))
+    assert bank.balances["u1"] == 100
+    assert held_credits("u1") == 0
+
+@pytest.mark.parametrize("amount", [0, -5])
+def test_non_positive_amount_never_credits(bank, amount):
+    with pytest.raises(ValueError):
+        asyncio.run(reserve_credits("u1", amount))
+    assert bank.balances["u1"] == 100
+
+@pytest.mark.parametrize("limit", [0, -1, 101])
+def test_search_limit_is_bounded(limit):
+    with pytest.raises(ValidationError):
+        SearchRequest(keyword="shoes", platform="meta", limit=limit)
+
+def test_usage_counts_only_delivered_ads():
+    request = SearchRequest(keyword="shoes", platform="both", limit=20, country="US,DE")
+    pools = {"meta:US": [{"id": i} for i in range(50)], "meta:DE": [{"id": i} for i in range(5)], "tiktok": []}
+    assert search_cost(request) == 60
+    # US voll bezahlt, DE nur 5, TikTok (Scrape fehlgeschlagen) gar nicht
+    assert search_usage(request, pools) == 25
+    assert search_usage(request, {branch: [] for branch in pools}) == 0
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from app.services import pagination
+from app.services.pagination import build_page, decode_cursor, encode_cursor, load_page, select_page
+
+def _meta(i, bucket="A_EVERGREEN"):
+    return {"id": f"m{i}", "efficiency_score": 100 - i, "_bucket": bucket}
+
+def _tiktok(i):
+    return {"id": f"t{i}", "efficiency_score": 50 - i}
+
+POOLS = {"meta:US": [_meta(i) for i in range(10)], "tiktok": [_tiktok(i) for i in range(10)]}
+
+def _state(**overrides):
+    state = {
+        "user": "u1",
+        "keys": {"meta:US": "key-meta", "tiktok": "key-tiktok"},
+        "query": "shoes",
+        "sort": "efficiency_score",
+        "filters": {},
+        "offset": 0,
+        "page_size": 5,
+        "max_items": 20,
+    }
+    return {**state, **overrides}
+
+def test_cursor_roundtrip():
+    cursor = build_page(POOLS, _state())["next_cursor"]
+    state = decode_cursor(cursor, "u1")
+    assert state["offset"] == 5
+    assert state["keys"] == {"meta:US": "key-meta", "tiktok": "key-tiktok"}
+    assert set(state["versions"]) == {"meta:US", "tiktok"}
+
+def test_cursor_rejects_other_user():
+    cursor = build_page(POOLS, _state())["next_cursor"]
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "u2")
+
+@pytest.mark.parametrize("tamper", [
+    lambda c: c.replace(".", "x.", 1),  # Payload verändert
+    lambda c: c.replace(".", ".A" if ".A" not in c else ".B", 1),  # Signatur verändert
+    lambda c: c.split(".")[0],  # Signatur fehlt
+    lambda c: "garbage",
+])
+def test_cursor_rejects_tampering(tamper):
+    cursor = build_page(POOLS, _state())["next_cursor"]
+    with pytest.raises(ValueError):
+        decode_cursor(tamper(cursor), "u1")
+
+def test_cursor_rejects_forged_offset():
+    # Selbst gebauter Cursor mit gültigem Inhalt, aber ohne unser Secret
+    forged = encode_cursor({**_state(), "versions": {}, "offset": 5}).split(".")[0] + ".c2lnbmF0dXJl"
+    with pytest.raises(ValueError):
+        decode_cursor(forged, "u1")
+
+def test_paging_stops_at_paid_limit():
+    served = []
+    page = build_page(POOLS, _state(max_items=12))
+    served += page["items"]
+    while page["next_cursor"]:
+        state = decode_cursor(page["next_cursor"], "u1")
+        page = build_page(POOLS, state)
+        served += page["items"]
+    assert len(served) == 12
+    assert len({ad["id"] for ad in served}) == 12
+    assert page["total"] == 12
+
+def test_tiktok_ads_pass_meta_only_filters():
+    pools = {"meta:US": [_meta(0, "A_EVERGREEN"), _meta(1, "B_LAUNCH")], "tiktok": [_tiktok(0)]}
+    page, total, _ = select_page(pools, "efficiency_score", {"cohort": "EVERGREEN"}, 0, 10)
+    assert [ad["id"] for ad in page] == ["m0", "t0"]
+    assert total == 2
+
+def test_load_page_returns_410_when_pool_changed(monkeypatch):
+    pools = {branch: list(ads) for branch, ads in POOLS.items()}
+    keys = _state()["keys"]
+
+    async def peek(cache_key, platform, query):
+        branch = next(b for b, k in keys.items() if k == cache_key)
+        return pools[branch]
+
+    monkeypatch.setattr(pagination, "peek_search", peek)
+    cursor = build_page(pools, _state())["next_cursor"]
+
+    page = asyncio.run(load_page(cursor, "u1"))
+    assert [ad["id"] for ad in page["items"]] == ["m5", "m6", "m7", "m8", "m9"]
+
+    # Refresh im Hintergrund: eine neue Ad oben im Pool würde alle Offsets verschieben
+    pools["meta:US"] = [_meta(-1)] + pools["meta:US"]
+    with pytest.raises(LookupError):
+        asyncio.run(load_page(cursor, "u1"))
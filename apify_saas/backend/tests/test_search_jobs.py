@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services.auth_service import AuthUser
+from app.models.api_requests import SearchRequest
+from app.routers import search as search_router
+from app.services.search_jobs import SearchJob
+
+def test_streamed_items_are_capped_at_paid_limit():
+    async def run():
+        job = SearchJob("u1", SearchRequest(keyword="shoes", platform="meta", limit=2, country="US,DE"))
+        job.publish_items([{"id": f"a{i}"} for i in range(3)])
+        job.publish_items([{"id": "a0"}, {"id": "b0"}, {"id": "b1"}])
+        return job
+
+    job = asyncio.run(run())
+    streamed = [ad["id"] for event, data in job.events if event == "ads" for ad in data["items"]]
+    assert streamed == ["a0", "a1", "a2", "b0"]  # 2 Länder x limit 2
+
+@pytest.mark.parametrize("changes", [
+    {"country": ",".join(f"C{i}" for i in range(settings.FANOUT_MAX_COUNTRIES + 1))},
+    {"sort_by": "nonsense"},
+    {"cohort": "NOPE"},
+    {"cluster": "Z"},
+])
+def test_job_rejects_invalid_request_before_admission(monkeypatch, changes):
+    async def admit(user, request):
+        raise AssertionError("Admission vor der Validierung")
+    monkeypatch.setattr(search_router, "_admit", admit)
+    request = SearchRequest(keyword="shoes", platform="meta", **changes)
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(search_router.create_search_job(request, user=AuthUser(id="u1", email="u1@example.com", role="authenticated", claims={})))
+    assert rejected.value.status_code == 422
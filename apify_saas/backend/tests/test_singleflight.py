@@ -0,0 +1,50 @@
+import asyncio
+from app.services.singleflight import SingleFlight
+
+class SharedLeases:
+    """Lease-Tabelle, die sich zwei 'Worker' (SingleFlight-Instanzen) teilen."""
+
+    def __init__(self):
+        self.held = set()
+
+    async def acquire(self, key, ttl_secs):
+        if key in self.held: return False
+        self.held.add(key)
+        return True
+
+    async def release(self, key):
+        self.held.discard(key)
+
+def test_second_worker_reads_l2_instead_of_scraping_again():
+    leases, l2, scrapes = SharedLeases(), {}, []
+
+    def worker(flight: SingleFlight):
+        async def write(results):
+            await asyncio.sleep(0.05)  # langsamer L2-Write im Hintergrund
+            l2["k"] = results
+
+        async def fetch():
+            scrapes.append(flight)
+            await asyncio.sleep(0.02)
+            results = [{"id": "1"}]
+            flight.hold_lease("k", asyncio.ensure_future(write(results)))
+            return results
+
+        async def poll():
+            return l2.get("k")
+
+        return flight.do("k", fetch, poll=poll)
+
+    async def run():
+        a = SingleFlight(leases, lease_ttl_secs=5, poll_interval_secs=0.01)
+        b = SingleFlight(leases, lease_ttl_secs=5, poll_interval_secs=0.01)
+        first = asyncio.ensure_future(worker(a))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, worker(b))
+        await asyncio.sleep(0.01)
+        return results
+
+    results = asyncio.run(run())
+    assert results == [[{"id": "1"}], [{"id": "1"}]]
+    assert len(scrapes) == 1
+    assert not leases.held
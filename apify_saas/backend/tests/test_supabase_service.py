@@ -0,0 +1,14 @@
+from app.services.supabase_service import stable_ad_id
+
+def test_stable_ad_id_ignores_metrics():
+    ad = {"page_profile_uri": "https://fb.com/brand", "start_date": "2024-05-01", "days_active": 3,
+          "efficiency_score": 1.5, "snapshot": {"body": {"text": "Copy"},
+                                                "images": [{"original_image_url": "https://img/1.jpg?oh=a&oe=1"}]}}
+    later = {**ad, "days_active": 9, "efficiency_score": 7.0,
+             "snapshot": {**ad["snapshot"], "images": [{"original_image_url": "https://img/1.jpg?oh=b&oe=2"}]}}
+    other = {**ad, "snapshot": {**ad["snapshot"], "body": {"text": "Other copy"}}}
+    assert stable_ad_id(ad) == stable_ad_id(later)
+    assert stable_ad_id(ad) != stable_ad_id(other)
+
+    tiktok = {"authorMeta": {"id": "42"}, "webVideoUrl": "https://tiktok.com/v/1", "text": "hi", "createTime": 1, "playCount": 7}
+    assert stable_ad_id(tiktok) == stable_ad_id({**tiktok, "playCount": 9000})
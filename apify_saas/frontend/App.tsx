@@ -590,6 +590,7 @@ const ResultsPage = ({ user, refreshUser, onOpenModal }: { user: User, refreshUs
     const [isCustomLimit, setIsCustomLimit] = useState(false);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState('');
+    const [loadingMore, setLoadingMore] = useState(false);
     const [formatFilter, setFormatFilter] = useState<'all' | 'video' | 'image'>('all');
     const [sortBy, setSortBy] = useState<'newest' | 'likes' | 'reach_views' | 'spend_shares'>('newest');
     const [viewMode, setViewMode] = useState<'condensed' | 'details'>(() => {
@@ -636,6 +637,21 @@ const ResultsPage = ({ user, refreshUser, onOpenModal }: { user: User, refreshUs
         }
     };
 
+    const handleLoadMore = async () => {
+        if (!result || !result.nextCursor) return;
+        setLoadingMore(true);
+        setError('');
+        try {
+            const next = await api.loadMore(result);
+            localStorage.setItem(`search_${next.id}`, JSON.stringify(next));
+            setResult(next);
+        } catch (err: any) {
+            setError(err.message || 'Could not load more results.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const transformedMetaAds = useMemo(() => {
         if (!result || !result.metaAds) return [];
         const ads = result.metaAds;
@@ -822,6 +838,18 @@ const ResultsPage = ({ user, refreshUser, onOpenModal }: { user: User, refreshUs
                     ))}
                 </div>
                 {displayedAds.length === 0 && <div className="text-center py-20 text-gray-500">No results match your filters</div>}
+                {result.nextCursor && (
+                    <div className="flex flex-col items-center pt-2 pb-8">
+                        <button
+                            onClick={handleLoadMore}
+                            disabled={loadingMore}
+                            className="bg-white border border-gray-200 hover:bg-gray-50 text-gray-700 px-6 py-2.5 rounded-lg font-semibold text-sm shadow-sm transition-all disabled:opacity-50 flex items-center"
+                        >
+                            {loadingMore && <Loader2 className="animate-spin w-4 h-4 mr-2" />} Load more
+                        </button>
+                        {error && <p className="text-sm text-red-600 mt-2">{error}</p>}
+                    </div>
+                )}
             </div>
         </div>
     );
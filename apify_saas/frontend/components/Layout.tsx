@@ -2,6 +2,7 @@ import React from 'react';
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import { LayoutDashboard, Search, CreditCard, LogOut, Menu, X, User as UserIcon, Zap, Bookmark } from 'lucide-react';
 import { User } from '../types';
+import { api } from '../services/api';
 
 interface LayoutProps {
   children: React.ReactNode;
@@ -25,6 +26,7 @@ const Layout: React.FC<LayoutProps> = ({ children, user }) => {
   };
 
   const handleLogout = () => {
+    api.logout();
     navigate('/login');
   };
 
@@ -1,6 +1,5 @@
 /// <reference types="vite/client" />
 import { SearchParams, SearchResult, User, MetaAd, TikTokAd, SavedAd, SearchHistoryItem } from '../types';
-import { MOCK_USER } from './mockData';
 // @ts-ignore
 import { cleanAndTransformData } from '../adAdapter';
 
@@ -12,6 +11,58 @@ class ApiService {
   private user: User | null = null;
   private token: string | null = null;
 
+  private _authHeaders(extra: Record<string, string> = {}): Record<string, string> {
+    const token = this.token || localStorage.getItem('adspy_token');
+    return token ? { ...extra, Authorization: `Bearer ${token}` } : extra;
+  }
+
+  private _storeSession(data: any) {
+    this.token = data.access_token;
+    localStorage.setItem('adspy_token', data.access_token);
+    if (data.refresh_token) localStorage.setItem('adspy_refresh_token', data.refresh_token);
+  }
+
+  // Access Token abgelaufen: einmal mit dem Refresh Token erneuern
+  private async _refreshSession(): Promise<boolean> {
+    const refreshToken = localStorage.getItem('adspy_refresh_token');
+    if (!refreshToken) return false;
+    try {
+        const response = await fetch(`${API_URL}/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        });
+        if (!response.ok) return false;
+        this._storeSession(await response.json());
+        return true;
+    } catch (e) {
+        return false;
+    }
+  }
+
+  // fetch mit Auth-Header; bei 401 Token erneuern und wiederholen, sonst abmelden und zum Login
+  private async _fetch(url: string, init: RequestInit = {}): Promise<Response> {
+    const send = () => fetch(url, { ...init, headers: this._authHeaders((init.headers as Record<string, string>) || {}) });
+    let response = await send();
+    if (response.status === 401) {
+        if (await this._refreshSession()) response = await send();
+        if (response.status === 401) {
+            this.logout();
+            window.location.hash = '#/login';
+            throw new Error('Session expired, please log in again');
+        }
+    }
+    return response;
+  }
+
+  logout() {
+    this.user = null;
+    this.token = null;
+    localStorage.removeItem('adspy_token');
+    localStorage.removeItem('adspy_refresh_token');
+    localStorage.removeItem('adspy_user_id');
+  }
+
   private _getLocalHistory(): SearchHistoryItem[] {
     try {
       const stored = localStorage.getItem('adspy_local_history');
@@ -41,17 +92,12 @@ class ApiService {
         }
 
         const data = await response.json();
-        this.token = data.access_token;
+        this._storeSession(data);
         localStorage.setItem('adspy_user_id', data.user.id);
 
-        this.user = {
-            ...MOCK_USER,
-            id: data.user.id,
-            email: data.user.email,
-        };
-
-        await this.getUser();
-        return this.user!;
+        const user = await this.getUser();
+        if (!user) throw new Error('Could not load your profile');
+        return user;
     } catch (e: any) {
         console.error("Login Error:", e);
         throw new Error(e.message || "Login failed");
@@ -60,35 +106,22 @@ class ApiService {
 
   async getUser(): Promise<User | null> {
     const storedId = localStorage.getItem('adspy_user_id');
-    if (!storedId) return null;
+    if (!storedId || !localStorage.getItem('adspy_token')) return null;
 
-    try {
-        const response = await fetch(`${API_URL}/user/me?user_id=${storedId}`);
-        let profileData = {};
-        
-        if (response.ok) {
-            profileData = await response.json();
-        }
-
-        const localHistory = this._getLocalHistory();
-
-        this.user = { 
-            ...MOCK_USER, 
-            ...profileData, 
-            id: storedId,
-            searchHistory: localHistory.length > 0 ? localHistory : (MOCK_USER.searchHistory || [])
-        };
-        
-        return this.user;
-    } catch (e) {
-        const localHistory = this._getLocalHistory();
-        this.user = { 
-            ...MOCK_USER, 
-            id: storedId, 
-            searchHistory: localHistory.length > 0 ? localHistory : MOCK_USER.searchHistory 
-        };
-        return this.user;
+    const response = await this._fetch(`${API_URL}/user/me`);
+    if (!response.ok) {
+        // Kurzer Backend-Fehler: bekannten User behalten statt abzumelden
+        if (this.user) return this.user;
+        throw new Error('Could not load your profile');
     }
+
+    const profileData = await response.json();
+    this.user = {
+        ...profileData,
+        id: storedId,
+        searchHistory: this._getLocalHistory()
+    };
+    return this.user;
   }
 
   async runSearch(params: SearchParams): Promise<SearchResult> {
@@ -96,7 +129,7 @@ class ApiService {
 
     const cleanCountry = (!params.country || params.country === 'ALL') ? 'US' : params.country;
 
-    const response = await fetch(`${API_URL}/search/?user_id=${this.user.id}`, {
+    const response = await this._fetch(`${API_URL}/search/`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -150,17 +183,42 @@ class ApiService {
       status: 'completed',
       metaAds: cleanedMetaAds,
       tikTokAds: params.platform !== 'meta' ? rawAdList : [],
-      cost: params.limit
+      cost: params.limit,
+      nextCursor: responseBody.meta?.next_cursor || null
+    };
+  }
+
+  // Folgeseite aus dem Cache des Backends anhängen (keine Credits)
+  async loadMore(result: SearchResult): Promise<SearchResult> {
+    if (!result.nextCursor) return result;
+
+    const response = await this._fetch(`${API_URL}/search/page?cursor=${encodeURIComponent(result.nextCursor)}`);
+
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        // 410: Ergebnisse abgelaufen oder erneuert -> neu suchen
+        throw new Error(typeof err.detail === 'string' ? err.detail : "Could not load more results");
+    }
+
+    const responseBody = await response.json();
+    const rawAdList = responseBody.data || [];
+    const isMeta = result.params.platform !== 'tiktok';
+
+    return {
+      ...result,
+      metaAds: isMeta ? [...result.metaAds, ...cleanAndTransformData(rawAdList.map((item: any) => ({ data: item })))] : result.metaAds,
+      tikTokAds: !isMeta ? [...result.tikTokAds, ...rawAdList] : result.tikTokAds,
+      nextCursor: responseBody.meta?.next_cursor || null
     };
   }
 
   async saveAd(ad: MetaAd | TikTokAd, type: 'meta' | 'tiktok'): Promise<SavedAd> {
     if (!this.user) throw new Error("Login required");
 
-    await fetch(`${API_URL}/user/saved-ads`, {
+    await this._fetch(`${API_URL}/user/saved-ads`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id: this.user.id, type, data: ad })
+        body: JSON.stringify({ type, data: ad })
     });
 
     const savedAd: SavedAd = {
@@ -173,7 +231,7 @@ class ApiService {
 
   async removeSavedAd(id: string): Promise<void> {
       if (!this.user) return;
-      await fetch(`${API_URL}/user/saved-ads/${id}?user_id=${this.user.id}`, { method: 'DELETE' });
+      await this._fetch(`${API_URL}/user/saved-ads/${id}`, { method: 'DELETE' });
       this.user.savedAds = this.user.savedAds.filter(ad => ad.id !== id);
   }
 
@@ -167,4 +167,5 @@ export interface SearchResult {
   metaAds: MetaAd[];
   tikTokAds: TikTokAd[];
   cost: number;
+  nextCursor?: string | null; // Folgeseite über /search/page (kostenlos)
 }
\ No newline at end of file